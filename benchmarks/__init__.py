@@ -0,0 +1,30 @@
+"""Worker pipeline benchmarks: ``python -m benchmarks``.
+
+    python -m dental_agents.synth --doctors 50 --patients 20000   # once
+    python -m benchmarks run
+    python -m benchmarks run --events 20000 --engine asyncio --compare
+    python -m benchmarks compare --threshold 5
+    python -m benchmarks show
+
+Runs against the database in ``.env`` (DB_*), which should be a scratch copy
+loaded with the synthetic clinic data: the benchmark enqueues real
+``agent_events`` rows built from its appointments and cases, lets a worker
+process them, and deletes its rows afterwards. It refuses to start while
+other events are ready, since a live queue would both skew the numbers and
+be drained by the benchmark worker.
+
+Measured (see cases.py):
+
+* ``throughput.<EventType>.events_per_s`` -- a backlog of one event type
+  drained by a fresh worker process;
+* ``claim.p50_ms`` / ``p95_ms`` / ``p99_ms`` -- one ``claim_batch`` call
+  against a full queue;
+* ``e2e.p50_ms`` / ``p95_ms`` / ``p99_ms`` -- enqueue (commit + wake-up ping)
+  to DONE, at a steady ``--rate``, observed by polling every
+  ``POLL_INTERVAL`` seconds;
+* ``memory.worker_peak_mb`` -- peak RSS of the worker processes.
+
+Each run is appended to ``benchmarks/history.json``; ``compare`` checks the
+newest run against the previous one (or ``--baseline``) and exits 1 if any
+metric got worse by more than ``--threshold`` percent.
+"""
@@ -0,0 +1,205 @@
+"""CLI for the benchmark suite; see benchmarks/__init__.py."""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+
+from dental_agents.config import WorkerConfig
+from dental_agents.handlers import handled_types
+
+from . import cases, history
+
+
+def git_revision() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def cmd_run(args) -> int:
+    unhandled = sorted(set(args.types) - set(handled_types()))
+    if unhandled:
+        print(f"ERROR: no handler for {', '.join(unhandled)}; the worker would never claim them", file=sys.stderr)
+        return 2
+    run_id = uuid.uuid4().hex[:8]
+    base = WorkerConfig.from_env()
+    cfg = cases.bench_config(base, run_id, args.engine, args.wake_port)
+    conn, poll_conn = cases.open_connections()
+    metrics: dict[str, float | None] = {}
+    peaks: list[float] = []
+    try:
+        q = cases.BenchQueue(conn, run_id, cases.Fixtures(conn))
+        busy = q.ready_elsewhere()
+        if busy and not args.allow_busy:
+            print(f"ERROR: {busy} events are queued or in flight; drain the queue or pass --allow-busy", file=sys.stderr)
+            return 2
+        try:
+            for event_type in args.types:
+                rates = []
+                for _ in range(args.repeat):
+                    rate, peak = cases.throughput(q, cfg, event_type, args.events)
+                    rates.append(rate)
+                    if peak is not None:
+                        peaks.append(peak)
+                rates.sort()
+                metrics[f"throughput.{event_type}.events_per_s"] = round(rates[len(rates) // 2], 1)
+                print(f"throughput {event_type:<24} {rates[len(rates) // 2]:>10.1f} events/s")
+
+            claims = cases.claim_latency(q, args.types, args.events, base.batch_size, base.lease_seconds)
+            for k, v in cases.latency_stats(claims).items():
+                metrics[f"claim.{k}"] = v
+            print("claim      " + "  ".join(f"{k}={metrics[f'claim.{k}']}" for k in ("p50_ms", "p95_ms", "p99_ms")))
+
+            if args.e2e_events:
+                lat, peak = cases.end_to_end(q, poll_conn, cfg, args.types, args.e2e_events, args.rate)
+                if peak is not None:
+                    peaks.append(peak)
+                for k, v in cases.latency_stats(lat).items():
+                    metrics[f"e2e.{k}"] = v
+                print(
+                    "e2e        "
+                    + "  ".join(f"{k}={metrics.get(f'e2e.{k}')}" for k in ("p50_ms", "p95_ms", "p99_ms"))
+                    + f"  (poll resolution {cases.POLL_INTERVAL * 1000:.0f}ms)"
+                )
+        finally:
+            q.cleanup()
+    except cases.BenchError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 2
+    finally:
+        poll_conn.close()
+        conn.close()
+
+    metrics["memory.worker_peak_mb"] = max(peaks) if peaks else None
+    print(f"memory     worker peak {metrics['memory.worker_peak_mb']} MiB")
+    run = {
+        "run_id": run_id,
+        "at": datetime.now().isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "params": {
+            "engine": args.engine,
+            "events": args.events,
+            "e2e_events": args.e2e_events,
+            "rate": args.rate,
+            "repeat": args.repeat,
+            "batch_size": base.batch_size,
+            "types": list(args.types),
+        },
+        "metrics": metrics,
+    }
+    if args.label:
+        run["label"] = args.label
+    if not args.no_save:
+        history.append(run, args.history)
+        print(f"saved run {run_id} to {args.history}")
+    if args.compare:
+        runs = history.load(args.history)
+        if len(runs) < 2:
+            print("no earlier run to compare with")
+            return 0
+        return _compare(runs[-2], run, args.threshold)
+    return 0
+
+
+def _compare(baseline: dict, current: dict, threshold: float) -> int:
+    if baseline.get("params") != current.get("params"):
+        print("warning: runs used different parameters; numbers may not be comparable")
+    deltas = history.compare(baseline, current)
+    print(f"{baseline.get('run_id')} ({baseline.get('git')}) -> {current.get('run_id')} ({current.get('git')}), + is better")
+    for line in history.report(deltas, threshold):
+        print(line)
+    regressions = [d for d in deltas if d.regressed(threshold)]
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {threshold:g}%")
+        return 1
+    return 0
+
+
+def cmd_compare(args) -> int:
+    runs = history.load(args.history)
+    try:
+        current = history.find(runs, args.current)
+        baseline = history.find(runs, args.baseline) if args.baseline else history.previous(runs, current)
+    except KeyError as e:
+        print(f"ERROR: {e.args[0]}", file=sys.stderr)
+        return 2
+    return _compare(baseline, current, args.threshold)
+
+
+def cmd_show(args) -> int:
+    for run in history.load(args.history)[-args.last:]:
+        m = run.get("metrics", {})
+        tput = sum(v for k, v in m.items() if k.startswith("throughput.") and v)
+        print(
+            f"{run.get('run_id')}  {run.get('at')}  {run.get('git') or '-':<8}  "
+            f"sum throughput={tput:.0f}/s  claim p95={m.get('claim.p95_ms')}ms  "
+            f"e2e p95={m.get('e2e.p95_ms')}ms  peak={m.get('memory.worker_peak_mb')}MiB  {run.get('label', '')}"
+        )
+    return 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m benchmarks")
+    p.add_argument("--history", default=str(history.HISTORY_FILE))
+    sub = p.add_subparsers(dest="command", required=True)
+
+    r = sub.add_parser("run", help="run the suite and append the results to the history")
+    r.add_argument("--types", nargs="+", default=list(cases.DEFAULT_TYPES), help="event types to benchmark")
+    r.add_argument("--events", type=int, default=5000, help="backlog size per throughput/claim run")
+    r.add_argument("--e2e-events", type=int, default=500, help="events for the latency run (0 skips it)")
+    r.add_argument("--rate", type=float, default=50.0, help="e2e enqueue rate, events/s")
+    r.add_argument("--repeat", type=int, default=3, help="throughput runs per type (median is kept)")
+    r.add_argument("--engine", choices=("sync", "asyncio"), default="sync")
+    r.add_argument("--wake-port", type=int, default=47899, help="wake-up port of the benchmark worker")
+    r.add_argument("--label", help="free-text note stored with the run")
+    r.add_argument("--allow-busy", action="store_true", help="run even if other events are queued")
+    r.add_argument("--no-save", action="store_true", help="do not write the history file")
+    r.add_argument("--compare", action="store_true", help="compare with the previous run afterwards")
+    r.add_argument("--threshold", type=float, default=10.0, help="regression threshold, percent")
+    r.set_defaults(func=cmd_run)
+
+    c = sub.add_parser("compare", help="compare two runs from the history")
+    c.add_argument("--baseline", help="run_id or index (default: the run before --current)")
+    c.add_argument("--current", default="-1", help="run_id or index (default: the newest)")
+    c.add_argument("--threshold", type=float, default=10.0, help="regression threshold, percent")
+    c.set_defaults(func=cmd_compare)
+
+    s = sub.add_parser("show", help="list recent runs")
+    s.add_argument("--last", type=int, default=20)
+    s.set_defaults(func=cmd_show)
+
+    args = p.parse_args(argv)
+    if getattr(args, "repeat", 1) < 1:
+        p.error("--repeat must be at least 1")
+    return args
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    args = parse_args(argv)
+    started = time.perf_counter()
+    code = args.func(args)
+    if args.command == "run":
+        print(f"done in {time.perf_counter() - started:.0f}s")
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+"""Benchmark scenarios: fixtures, throughput, claim and end-to-end latency."""
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing as mp
+import socket
+import sys
+import threading
+import time
+from dataclasses import replace
+
+from dental_agents import db
+from dental_agents.config import WorkerConfig
+from dental_agents.db import in_clause
+from dental_agents.dbcheck import percentiles
+from dental_agents.handlers import handled_types
+from dental_agents.queue import claim_batch, mark_done
+from dental_agents.wakeup import WAKE_HOST
+
+log = logging.getLogger("benchmarks.cases")
+
+DEFAULT_TYPES = ("AppointmentCreated", "AppointmentCompleted", "AppointmentCancelled")
+POLL_INTERVAL = 0.01
+INSERT_BATCH = 1000
+DRAIN_TIMEOUT = 600.0
+
+INSERT_SQL = """
+    INSERT INTO agent_events (event_type, payload_json, status, priority, max_attempts, correlation_id)
+    VALUES (%s, %s, 'NEW', 100, 7, %s)
+"""
+
+
+class BenchError(RuntimeError):
+    pass
+
+
+def rss_mb(peak: bool = False) -> float | None:
+    """Resident set size of this process in MiB (None if unknown here)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        resource = None
+    if resource is not None:
+        if not peak:
+            try:
+                with open("/proc/self/statm") as f:
+                    return round(int(f.read().split()[1]) * resource.getpagesize() / 2**20, 1)
+            except OSError:
+                pass
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return round(maxrss / (2**20 if sys.platform == "darwin" else 2**10), 1)
+    try:
+        import psutil  # optional
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return round((info.peak_wset if peak else info.rss) / 2**20, 1)
+
+
+def latency_stats(samples_ms: list[float]) -> dict[str, float]:
+    if not samples_ms:
+        return {}
+    stats = percentiles(samples_ms)
+    return {f"{k}_ms": round(stats[k], 3) for k in ("p50", "p95", "p99")}
+
+
+# -- fixtures ------------------------------------------------------------------
+
+
+class Fixtures:
+    """Payloads built from the synthetic dataset, cycled as needed."""
+
+    def __init__(self, conn, size: int = 5000):
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT id, appointment_uid, patient_id, doctor_id, scheduled_date, scheduled_time, type,
+                       operatory_id, linked_case_id
+                FROM appointments
+                ORDER BY id DESC
+                LIMIT %s
+                """,
+                (size,),
+            )
+            self.appointments = cur.fetchall()
+            cur.execute("SELECT id FROM cases ORDER BY id DESC LIMIT %s", (size,))
+            self.cases = [r[0] for r in cur.fetchall()]
+        finally:
+            cur.close()
+        conn.rollback()
+        if not self.appointments:
+            raise BenchError("no appointments found; load data first with python -m dental_agents.synth")
+
+    def payload(self, event_type: str, i: int) -> dict:
+        a = self.appointments[i % len(self.appointments)]
+        if event_type == "AppointmentCreated":
+            return {
+                "appointmentId": a[0], "appointmentUid": a[1], "patientId": a[2], "doctorId": a[3],
+                "date": str(a[4]), "time": str(a[5]), "type": a[6], "operatoryId": a[7],
+            }
+        if event_type == "AppointmentCompleted":
+            return {"appointmentId": a[0], "patientId": a[2], "doctorId": a[3], "type": a[6], "linkedCaseId": a[8]}
+        if event_type == "AppointmentCancelled":
+            return {"appointmentId": a[0], "doctorId": a[3], "date": str(a[4])}
+        if event_type in ("CaseUpdated", "CaseGenerateSummary"):
+            if not self.cases:
+                raise BenchError(f"no cases found for {event_type}")
+            case_id = self.cases[i % len(self.cases)]
+            if event_type == "CaseUpdated":
+                return {"caseDbId": case_id, "stage": "IN_TREATMENT"}
+            return {"caseId": case_id, "visitIds": []}
+        if event_type == "AgentRunRequested":
+            return {"agent": ("appointment", "inventory", "revenue")[i % 3]}
+        raise BenchError(f"no fixture for event type {event_type}")
+
+
+# -- queue helpers -------------------------------------------------------------
+
+
+class BenchQueue:
+    """Enqueues tagged events and removes them afterwards."""
+
+    def __init__(self, conn, run_id: str, fixtures: Fixtures):
+        self.conn = conn
+        self.tag = f"bench:{run_id}:"
+        self.fixtures = fixtures
+        self.seq = 0
+
+    def ready_elsewhere(self) -> int:
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT COUNT(*) FROM agent_events
+                WHERE status IN ('NEW', 'PENDING', 'PROCESSING')
+                  AND (correlation_id IS NULL OR correlation_id NOT LIKE 'bench:%%')
+                """
+            )
+            return int(cur.fetchone()[0])
+        finally:
+            cur.close()
+            self.conn.rollback()
+
+    def enqueue(self, event_type: str, n: int) -> None:
+        cur = self.conn.cursor()
+        try:
+            for start in range(0, n, INSERT_BATCH):
+                rows = []
+                for _ in range(min(INSERT_BATCH, n - start)):
+                    payload = self.fixtures.payload(event_type, self.seq)
+                    # unique per row, so --ordered does not serialize the backlog
+                    rows.append((event_type, json.dumps(payload), f"{self.tag}{self.seq}"))
+                    self.seq += 1
+                cur.executemany(INSERT_SQL, rows)
+                self.conn.commit()
+        finally:
+            cur.close()
+
+    def enqueue_one(self, event_type: str) -> int:
+        cur = self.conn.cursor()
+        try:
+            payload = self.fixtures.payload(event_type, self.seq)
+            cur.execute(INSERT_SQL, (event_type, json.dumps(payload), f"{self.tag}{self.seq}"))
+            self.seq += 1
+            self.conn.commit()
+            return cur.lastrowid
+        finally:
+            cur.close()
+
+    def outstanding(self) -> int:
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                "SELECT COUNT(*) FROM agent_events WHERE correlation_id LIKE %s AND status <> 'DONE'",
+                (self.tag + "%",),
+            )
+            return int(cur.fetchone()[0])
+        finally:
+            cur.close()
+            self.conn.rollback()
+
+    def cleanup(self) -> None:
+        cur = self.conn.cursor()
+        try:
+            while True:
+                cur.execute(
+                    "SELECT id FROM agent_events WHERE correlation_id LIKE %s LIMIT 5000", (self.tag + "%",)
+                )
+                ids = [r[0] for r in cur.fetchall()]
+                if not ids:
+                    break
+                cur.execute(f"DELETE FROM agent_handler_runs WHERE event_id IN ({in_clause(ids)})", ids)
+                cur.execute(f"DELETE FROM agent_events WHERE id IN ({in_clause(ids)})", ids)
+                self.conn.commit()
+        finally:
+            cur.close()
+
+
+# -- worker child process ------------------------------------------------------
+
+
+def _worker_child(cfg: WorkerConfig, stop, ready, results) -> None:
+    from dental_agents import worker
+
+    logging.basicConfig(level=logging.WARNING)
+    wake = threading.Event() if not cfg.wake_port else None
+    ready.set()
+    try:
+        worker.run(cfg, stop=stop, wake=wake)
+    finally:
+        results.put({"peak_mb": rss_mb(peak=True)})
+
+
+class WorkerProcess:
+    """One benchmark worker in its own process (fresh pool, clean RSS)."""
+
+    def __init__(self, cfg: WorkerConfig):
+        ctx = mp.get_context("spawn")
+        self.stop = ctx.Event()
+        self.ready = ctx.Event()
+        self.results = ctx.Queue()
+        self.proc = ctx.Process(
+            target=_worker_child, args=(cfg, self.stop, self.ready, self.results), name="bench-worker", daemon=True
+        )
+        self.peak_mb: float | None = None
+
+    def __enter__(self) -> "WorkerProcess":
+        self.proc.start()
+        if not self.ready.wait(60):
+            raise BenchError("benchmark worker did not start")
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop.set()
+        try:
+            self.peak_mb = self.results.get(timeout=60).get("peak_mb")
+        except Exception:
+            self.peak_mb = None
+        self.proc.join(10)
+        if self.proc.is_alive():
+            self.proc.terminate()
+
+
+def bench_config(base: WorkerConfig, run_id: str, engine: str, wake_port: int) -> WorkerConfig:
+    return replace(
+        base,
+        worker_id=f"bench-{run_id}",
+        engine=engine,
+        wake_port=wake_port,
+        metrics_port=0,
+        archive_after_days=0,
+        profile_mode="off",
+    )
+
+
+# -- scenarios -----------------------------------------------------------------
+
+
+def throughput(q: BenchQueue, cfg: WorkerConfig, event_type: str, n: int) -> tuple[float, float | None]:
+    """Drain ``n`` events of one type; returns ``(events/s, worker peak MiB)``."""
+    q.enqueue(event_type, n)
+    worker = WorkerProcess(cfg)
+    with worker:
+        started = time.perf_counter()
+        deadline = started + DRAIN_TIMEOUT
+        while q.outstanding():
+            if time.perf_counter() > deadline:
+                raise BenchError(f"{event_type}: backlog not drained within {DRAIN_TIMEOUT:.0f}s")
+            time.sleep(POLL_INTERVAL * 5)
+        elapsed = time.perf_counter() - started
+    q.cleanup()
+    return n / elapsed, worker.peak_mb
+
+
+def claim_latency(q: BenchQueue, event_types, n: int, batch: int, lease_seconds: int) -> list[float]:
+    """Time ``claim_batch`` against a backlog of ``n`` mixed events."""
+    for i, event_type in enumerate(event_types):
+        q.enqueue(event_type, n // len(event_types) + (1 if i < n % len(event_types) else 0))
+    samples = []
+    conn = q.conn
+    worker_id = f"bench-claim-{q.tag.split(':')[1]}"
+    while True:
+        started = time.perf_counter()
+        events = claim_batch(conn, worker_id, batch, lease_seconds, event_types=handled_types())
+        samples.append((time.perf_counter() - started) * 1000)
+        if not events:
+            break
+        mark_done(conn, [ev.id for ev in events], worker_id)
+    q.cleanup()
+    # the last (empty) claim is not representative
+    return samples[:-1] or samples
+
+
+def end_to_end(
+    q: BenchQueue, poll_conn, cfg: WorkerConfig, event_types, n: int, rate: float
+) -> tuple[list[float], float | None]:
+    """Enqueue at ``rate``/s with wake-up pings; latency until seen DONE."""
+    pending: dict[int, float] = {}
+    lock = threading.Lock()
+    latencies: list[float] = []
+    producing = threading.Event()
+    producing.set()
+
+    def poll() -> None:
+        cur = poll_conn.cursor()
+        try:
+            while producing.is_set() or pending:
+                with lock:
+                    ids = list(pending)[:1000]
+                if ids:
+                    cur.execute(
+                        f"SELECT id FROM agent_events WHERE status = 'DONE' AND id IN ({in_clause(ids)})", ids
+                    )
+                    seen = time.perf_counter()
+                    done = [r[0] for r in cur.fetchall()]
+                    poll_conn.rollback()
+                    with lock:
+                        for i in done:
+                            latencies.append((seen - pending.pop(i)) * 1000)
+                time.sleep(POLL_INTERVAL)
+        finally:
+            cur.close()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    worker = WorkerProcess(cfg)
+    poller = threading.Thread(target=poll, name="bench-e2e-poll", daemon=True)
+    try:
+        with worker:
+            # let the idle backoff reach its ceiling, as on a quiet clinic day
+            time.sleep(min(cfg.poll_max, 2.0))
+            poller.start()
+            interval = 1.0 / rate if rate > 0 else 0.0
+            next_at = time.perf_counter()
+            for i in range(n):
+                event_type = event_types[i % len(event_types)]
+                enqueued = time.perf_counter()
+                event_id = q.enqueue_one(event_type)
+                with lock:
+                    pending[event_id] = enqueued
+                sock.sendto(b"!", (WAKE_HOST, cfg.wake_port))
+                next_at += interval
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+            producing.clear()
+            poller.join(DRAIN_TIMEOUT)
+    finally:
+        producing.clear()
+        sock.close()
+    if pending:
+        log.warning("%s events not DONE when the e2e run ended", len(pending))
+    q.cleanup()
+    return latencies, worker.peak_mb
+
+
+def open_connections() -> tuple:
+    """Enqueue/claim connection and e2e poll connection."""
+    db.configure_pool(2)
+    return db.connect(), db.connect()
@@ -0,0 +1,100 @@
+"""Benchmark history file and regression comparison."""
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+HISTORY_FILE = Path(__file__).resolve().parent / "history.json"
+
+# metric name suffix -> True if bigger is better
+DIRECTIONS = {
+    "_per_s": True,
+    "_ms": False,
+    "_mb": False,
+}
+
+
+def higher_is_better(metric: str) -> bool | None:
+    for suffix, higher in DIRECTIONS.items():
+        if metric.endswith(suffix):
+            return higher
+    return None
+
+
+def load(path: str | os.PathLike = HISTORY_FILE) -> list[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            runs = json.load(f)
+    except FileNotFoundError:
+        return []
+    if not isinstance(runs, list):
+        raise ValueError(f"{path}: expected a JSON list of runs")
+    return runs
+
+
+def append(run: dict, path: str | os.PathLike = HISTORY_FILE) -> None:
+    runs = load(path)
+    runs.append(run)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(runs, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def find(runs: list[dict], ref: str) -> dict:
+    """A run by ``run_id`` or by list index (``-1`` is the newest)."""
+    for run in runs:
+        if run.get("run_id") == ref:
+            return run
+    try:
+        return runs[int(ref)]
+    except (ValueError, IndexError):
+        raise KeyError(f"no run {ref!r} in history") from None
+
+
+def previous(runs: list[dict], run: dict) -> dict:
+    """The run recorded just before ``run`` (one of ``runs``)."""
+    index = next(i for i, r in enumerate(runs) if r is run)
+    if index == 0:
+        raise KeyError(f"no run before {run.get('run_id')!r} in history")
+    return runs[index - 1]
+
+
+@dataclass(frozen=True)
+class Delta:
+    metric: str
+    baseline: float
+    current: float
+    # positive means worse, in percent of the baseline
+    worse_pct: float
+
+    def regressed(self, threshold_pct: float) -> bool:
+        return self.worse_pct > threshold_pct
+
+
+def compare(baseline: dict, current: dict) -> list[Delta]:
+    out = []
+    base_metrics = baseline.get("metrics", {})
+    for metric, value in sorted(current.get("metrics", {}).items()):
+        base = base_metrics.get(metric)
+        higher = higher_is_better(metric)
+        if base is None or value is None or higher is None:
+            continue
+        if base == 0:
+            worse = 0.0 if value == base else (100.0 if (value < base) == higher else -100.0)
+        else:
+            change = (value - base) / abs(base) * 100.0
+            worse = -change if higher else change
+        out.append(Delta(metric, float(base), float(value), worse))
+    return out
+
+
+def report(deltas: list[Delta], threshold_pct: float) -> list[str]:
+    lines = []
+    for d in deltas:
+        flag = "REGRESSION" if d.regressed(threshold_pct) else ("better" if d.worse_pct < -threshold_pct else "")
+        lines.append(f"  {d.metric:<45} {d.baseline:>12.2f} -> {d.current:>12.2f}  {-d.worse_pct:+7.1f}%  {flag}")
+    return lines
@@ -0,0 +1,6 @@
+"""Python agents for the dental clinic backend.
+
+server.js writes events into the ``agent_events`` outbox (``enqueueEventDb``);
+``python -m dental_agents.worker`` drains that outbox and dispatches every
+event to the handler registered for its ``event_type``.
+"""
@@ -0,0 +1,272 @@
+"""Retention for ``agent_events``: move old DONE/DEAD rows out of the live table.
+
+Every appointment, completion and case edit leaves a DONE row with a LONGTEXT
+payload, so without retention the table (and ``idx_status_available``) only
+grows. Rows finished more than ``archive_after_days`` ago are moved, in
+chunks of ``archive_chunk`` rows with one short transaction each, into
+
+* ``table`` mode: monthly tables ``agent_events_archive_YYYYMM`` (by
+  ``created_at``); tables older than ``archive_keep_months`` are dropped, or
+* ``jsonl`` mode: gzip files ``<archive_dir>/agent_events-YYYY-MM.jsonl.gz``.
+
+Runs inside the worker (one process per pool) every ``archive_interval``
+seconds, or from cron: ``python -m dental_agents.archive``.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import replace
+
+import mysql.connector
+
+from . import db
+from .config import WorkerConfig
+from .db import in_clause
+from .idempotency import forget
+
+log = logging.getLogger("dental_agents.archive")
+
+ARCHIVE_PREFIX = "agent_events_archive_"
+
+# Columns present in both the server.js and schema_query.sql definitions.
+ARCHIVE_COLUMNS = (
+    "id",
+    "event_type",
+    "payload_json",
+    "status",
+    "attempts",
+    "max_attempts",
+    "priority",
+    "last_error",
+    "created_at",
+    "updated_at",
+)
+
+ARCHIVE_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+      id BIGINT UNSIGNED NOT NULL,
+      event_type VARCHAR(64) NOT NULL,
+      payload_json LONGTEXT NULL,
+      status VARCHAR(16) NOT NULL,
+      attempts INT NOT NULL DEFAULT 0,
+      max_attempts INT NOT NULL DEFAULT 0,
+      priority INT NOT NULL DEFAULT 100,
+      last_error TEXT NULL,
+      created_at DATETIME NOT NULL,
+      updated_at DATETIME NOT NULL,
+      archived_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+      PRIMARY KEY (id),
+      KEY idx_event_type (event_type),
+      KEY idx_created_at (created_at)
+    ) ENGINE=InnoDB ROW_FORMAT=COMPRESSED
+"""
+
+# updated_at is set by the UPDATE that makes a row DONE or DEAD, so it is
+# the finishing time (available_at is only when the last attempt could
+# start). Served by idx_status_updated.
+SELECT_CHUNK_SQL = """
+    SELECT id, DATE_FORMAT(created_at, '%%Y%%m')
+    FROM agent_events
+    WHERE status IN ('DONE', 'DEAD')
+      AND updated_at < NOW() - INTERVAL %s DAY
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+
+def archive_table(month: str) -> str:
+    return f"{ARCHIVE_PREFIX}{month}"
+
+
+def _move_to_tables(cur, by_month: dict[str, list[int]]) -> None:
+    cols = ", ".join(ARCHIVE_COLUMNS)
+    for month, ids in by_month.items():
+        table = archive_table(month)
+        cur.execute(
+            f"INSERT IGNORE INTO {table} ({cols}) SELECT {cols} FROM agent_events WHERE id IN ({in_clause(ids)})",
+            tuple(ids),
+        )
+
+
+def _write_jsonl(cur, by_month: dict[str, list[int]], archive_dir: str) -> None:
+    os.makedirs(archive_dir, exist_ok=True)
+    cols = ", ".join(ARCHIVE_COLUMNS)
+    for month, ids in by_month.items():
+        cur.execute(f"SELECT {cols} FROM agent_events WHERE id IN ({in_clause(ids)})", tuple(ids))
+        path = os.path.join(archive_dir, f"agent_events-{month[:4]}-{month[4:]}.jsonl.gz")
+        # appending a new gzip member keeps the file a valid .gz stream
+        with gzip.open(path, "at", encoding="utf-8") as fh:
+            for row in cur.fetchall():
+                rec = dict(zip(ARCHIVE_COLUMNS, row))
+                for k in ("created_at", "updated_at"):
+                    if isinstance(rec[k], (dt.date, dt.datetime)):
+                        rec[k] = rec[k].isoformat(sep=" ")
+                fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+
+
+def archive_once(conn, cfg: WorkerConfig, stop=None, max_chunks: int = 10_000) -> int:
+    """Move every eligible row, one chunk per transaction. Returns rows moved."""
+    ensured: set[str] = set()
+    moved = 0
+    cur = conn.cursor()
+    try:
+        for _ in range(max_chunks):
+            if stop is not None and stop.is_set():
+                break
+            conn.start_transaction()
+            cur.execute(SELECT_CHUNK_SQL, (int(cfg.archive_after_days), int(cfg.archive_chunk)))
+            rows = cur.fetchall()
+            if not rows:
+                conn.commit()
+                break
+            by_month: dict[str, list[int]] = defaultdict(list)
+            for event_id, month in rows:
+                by_month[month].append(event_id)
+
+            if cfg.archive_mode == "jsonl":
+                # written before the DELETE commits: a crash in between can
+                # duplicate rows in the file, never lose them
+                _write_jsonl(cur, by_month, cfg.archive_dir)
+            else:
+                missing = [archive_table(m) for m in by_month if archive_table(m) not in ensured]
+                if missing:
+                    # DDL commits implicitly: release the chunk, create the
+                    # tables, and select the chunk again
+                    conn.rollback()
+                    for table in missing:
+                        cur.execute(ARCHIVE_DDL.format(table=table))
+                        ensured.add(table)
+                    continue
+                _move_to_tables(cur, by_month)
+
+            ids = [r[0] for r in rows]
+            cur.execute(f"DELETE FROM agent_events WHERE id IN ({in_clause(ids)})", tuple(ids))
+            forget(cur, ids)
+            conn.commit()
+            moved += len(ids)
+            if len(rows) < cfg.archive_chunk:
+                break
+            # let the claim path in between chunks
+            time.sleep(cfg.archive_pause)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    if moved:
+        log.info("archived %s agent_events rows (%s mode)", moved, cfg.archive_mode)
+    return moved
+
+
+def drop_old_archives(conn, keep_months: int, today: dt.date | None = None) -> list[str]:
+    """Drop monthly archive tables older than ``keep_months`` (0 keeps all)."""
+    if keep_months <= 0:
+        return []
+    today = today or dt.date.today()
+    idx = today.year * 12 + today.month - 1 - keep_months
+    oldest_kept = f"{idx // 12:04d}{idx % 12 + 1:02d}"
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT TABLE_NAME FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME LIKE %s
+            """,
+            (ARCHIVE_PREFIX.replace("_", r"\_") + "%",),
+        )
+        names = [r[0] for r in cur.fetchall()]
+        dropped = []
+        for name in sorted(names):
+            month = name[len(ARCHIVE_PREFIX):]
+            if len(month) == 6 and month.isdigit() and month < oldest_kept:
+                cur.execute(f"DROP TABLE IF EXISTS {name}")
+                dropped.append(name)
+        conn.commit()
+    finally:
+        cur.close()
+    if dropped:
+        log.info("dropped archive tables: %s", ", ".join(dropped))
+    return dropped
+
+
+def run_retention(conn, cfg: WorkerConfig, stop=None) -> int:
+    moved = archive_once(conn, cfg, stop=stop)
+    if cfg.archive_mode != "jsonl":
+        drop_old_archives(conn, cfg.archive_keep_months)
+    return moved
+
+
+class Archiver:
+    """Background retention thread for the worker."""
+
+    def __init__(self, cfg: WorkerConfig, stop):
+        self.cfg = cfg
+        self.stop = stop
+        self._halt = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="agent-archive", daemon=True)
+
+    def start(self) -> "Archiver":
+        if self.cfg.archive_after_days > 0:
+            self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._halt.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=30)
+
+    def _loop(self) -> None:
+        # stagger the first run so restarts do not all archive at once
+        self._halt.wait(min(60.0, self.cfg.archive_interval))
+        while not self._halt.is_set():
+            conn = None
+            try:
+                conn = db.connect()
+                run_retention(conn, self.cfg, stop=self._halt)
+            except (mysql.connector.Error, OSError) as e:
+                log.error("archival failed: %s", e)
+            finally:
+                if conn is not None:
+                    conn.close()
+            self._halt.wait(self.cfg.archive_interval)
+
+
+def main(argv=None) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    env = WorkerConfig.from_env()
+    p = argparse.ArgumentParser(prog="python -m dental_agents.archive")
+    p.add_argument("--after-days", type=int, default=env.archive_after_days or 30)
+    p.add_argument("--mode", choices=("table", "jsonl"), default=env.archive_mode)
+    p.add_argument("--dir", default=env.archive_dir, help="jsonl mode: output directory")
+    p.add_argument("--chunk", type=int, default=env.archive_chunk)
+    p.add_argument("--keep-months", type=int, default=env.archive_keep_months)
+    args = p.parse_args(argv)
+    cfg = replace(
+        env,
+        archive_after_days=max(1, args.after_days),
+        archive_mode=args.mode,
+        archive_dir=args.dir,
+        archive_chunk=max(1, args.chunk),
+        archive_keep_months=args.keep_months,
+    )
+    conn = db.connect()
+    try:
+        moved = run_retention(conn, cfg)
+    finally:
+        conn.close()
+    print(f"archived {moved} rows")
+
+
+if __name__ == "__main__":
+    main()
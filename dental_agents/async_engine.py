@@ -0,0 +1,265 @@
+"""``--engine asyncio``: many in-flight events per process.
+
+Most handlers spend their time waiting on MySQL, SMTP/HTTP (``requests``) or
+an LLM. This engine keeps up to ``max_inflight`` events running on one event
+loop, capped per ``event_type`` by ``type_limits``. mysql-connector is
+blocking, so every DB call -- claiming, sync handlers, ``db.run`` from async
+handlers, DONE/FAILED updates -- goes to a thread pool whose threads each hold
+their own connection from the process pool (db.py), handing it back every
+``CONN_RECHECK_SECONDS`` so it gets health-checked and recycled.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+
+from . import db, metrics, profiling
+from .config import WorkerConfig
+from .coalesce import coalesce
+from .events import PayloadError
+from .handlers import handled_types, is_async
+from .idempotency import run_once
+from .leases import LeaseKeeper
+from .queue import Event, claim_batch, mark_done
+from .retry import fail_event
+from .wakeup import IdleBackoff
+from .worker import drop_invalid, error_text, find_handler, make_scheduler, run_handler
+
+log = logging.getLogger("dental_agents.async_engine")
+
+CONN_RECHECK_SECONDS = 60.0
+
+
+class ThreadDb:
+    """``db`` argument for async handlers: each ``run`` is one transaction."""
+
+    def __init__(self, engine: "AsyncEngine"):
+        self._engine = engine
+
+    async def run(self, fn, *args):
+        return await self._engine.to_thread(self._engine.in_transaction, fn, *args)
+
+    async def run_once(self, event: Event, name: str, fn, *args):
+        return await self.run(run_once, event, name, fn, *args)
+
+
+class AsyncEngine:
+    def __init__(self, cfg: WorkerConfig, stop, wake, keeper: LeaseKeeper):
+        self.cfg = cfg
+        self.stop = stop
+        self.keeper = keeper
+        self.idle = IdleBackoff(cfg.poll_min, cfg.poll_max, wake)
+        self.sched = make_scheduler(cfg)
+        self.executor = ThreadPoolExecutor(max_workers=cfg.db_threads, thread_name_prefix="agent-db")
+        self.inflight: set[asyncio.Task] = set()
+        self.done_ids: list[int] = []
+        self._sems: dict[str, asyncio.Semaphore] = {}
+        self._local = threading.local()
+        self._conns: set = set()
+        self._conns_lock = threading.Lock()
+
+    # -- runs on executor threads ------------------------------------------
+
+    def thread_conn(self):
+        conn = getattr(self._local, "conn", None)
+        now = time.monotonic()
+        if conn is not None and now - self._local.since > CONN_RECHECK_SECONDS:
+            self.drop_thread_conn(broken=False)
+            conn = None
+        if conn is None:
+            conn = db.connect()
+            self._local.conn = conn
+            self._local.since = now
+            with self._conns_lock:
+                self._conns.add(conn)
+        return conn
+
+    def drop_thread_conn(self, broken: bool = True) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._conns_lock:
+            self._conns.discard(conn)
+        if broken:
+            db.discard(conn)
+        else:
+            conn.close()
+
+    def guarded(self, fn, *args):
+        try:
+            return fn(*args)
+        except db.CONNECTION_ERRORS:
+            self.drop_thread_conn()
+            raise
+
+    def in_transaction(self, fn, *args):
+        conn = self.thread_conn()
+        try:
+            result = fn(conn, *args)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+
+    # -- runs on the event loop --------------------------------------------
+
+    async def to_thread(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.guarded, fn, *args)
+
+    def _sem(self, event_type: str) -> asyncio.Semaphore:
+        sem = self._sems.get(event_type)
+        if sem is None:
+            limit = self.cfg.type_limits.get(event_type, self.cfg.default_type_limit)
+            sem = self._sems[event_type] = asyncio.Semaphore(limit)
+        return sem
+
+    async def _run_event(self, ev: Event) -> None:
+        try:
+            await self._run_limited(ev)
+        finally:
+            self.keeper.release(ev.all_ids)
+            if self.sched is not None:
+                self.sched.finished(ev)
+
+    async def _run_limited(self, ev: Event) -> None:
+        async with self._sem(ev.event_type):
+            started = time.perf_counter()
+            try:
+                handler = find_handler(ev)
+                if is_async(handler):
+                    with profiling.profile_event(ev, sql=False):
+                        await handler(ev, ThreadDb(self))
+                else:
+                    await self.to_thread(lambda: run_handler(self.thread_conn(), ev))
+            except Exception as e:
+                log.exception("event %s (%s) failed", ev.id, ev.event_type)
+                elapsed = time.perf_counter() - started
+                msg = error_text(e)
+                permanent = isinstance(e, PayloadError)
+                try:
+                    status = await self.to_thread(
+                        lambda: fail_event(self.thread_conn(), ev, self.cfg.worker_id, msg, permanent)
+                    )
+                    metrics.record_outcome(ev, status.lower(), elapsed)
+                except mysql.connector.Error as e2:
+                    log.error("could not mark event %s failed: %s", ev.id, e2)
+                return
+        metrics.record_outcome(ev, "done", time.perf_counter() - started)
+        self.done_ids.extend(ev.all_ids)
+
+    async def _flush(self) -> None:
+        done, self.done_ids = self.done_ids, []
+        if not done:
+            return
+        try:
+            await self.to_thread(lambda: mark_done(self.thread_conn(), done, self.cfg.worker_id))
+        except mysql.connector.Error as e:
+            log.error("could not mark %s events done: %s", len(done), e)
+            self.done_ids[:0] = done
+
+    async def _claim(self, limit: int) -> list[Event]:
+        cfg = self.cfg
+        plan = self.sched.plan(limit) if self.sched is not None else None
+        if plan is not None and not plan:
+            return []
+        slices = [sl for _, sl in plan] if plan is not None else None
+        handled = handled_types()
+        try:
+            events = await self.to_thread(
+                lambda: claim_batch(
+                    self.thread_conn(),
+                    cfg.worker_id,
+                    limit,
+                    cfg.lease_seconds,
+                    slices=slices,
+                    ordered=cfg.ordered,
+                    event_types=handled,
+                )
+            )
+        except mysql.connector.Error as e:
+            log.error("claim failed: %s", e)
+            return []
+        metrics.CLAIM_BATCH.observe(value=len(events))
+        if self.sched is not None:
+            self.sched.claimed(plan, events)
+        if events:
+            claimed = events
+
+            def prepare(conn):
+                merged = coalesce(conn, cfg.worker_id, cfg.lease_seconds, claimed, cfg.ordered, handled)
+                return drop_invalid(conn, merged, cfg.worker_id)
+
+            events = await self.to_thread(lambda: prepare(self.thread_conn()))
+        for ev in events:
+            self.keeper.track(ev.all_ids)
+        if self.sched is None:
+            return events
+        for ev in events:
+            self.sched.started(ev)
+        return self.sched.order(events)
+
+    async def run(self) -> None:
+        cfg = self.cfg
+        log.info(
+            "asyncio worker %s started (max_inflight=%s, db_threads=%s)",
+            cfg.worker_id,
+            cfg.max_inflight,
+            cfg.db_threads,
+        )
+        while not self.stop.is_set():
+            free = cfg.max_inflight - len(self.inflight)
+            events = await self._claim(min(free, cfg.batch_size)) if free > 0 else []
+            for ev in events:
+                task = asyncio.create_task(self._run_event(ev))
+                self.inflight.add(task)
+                task.add_done_callback(self.inflight.discard)
+            await self._flush()
+            if free <= 0:
+                await asyncio.wait(self.inflight, return_when=asyncio.FIRST_COMPLETED)
+            elif not events:
+                await asyncio.to_thread(self.idle.wait)
+            else:
+                self.idle.reset()
+                # let freshly created tasks start before claiming again
+                await asyncio.sleep(0)
+
+        if self.inflight:
+            log.info("draining %s in-flight events", len(self.inflight))
+            await asyncio.gather(*self.inflight, return_exceptions=True)
+        await self._flush()
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+        with self._conns_lock:
+            for conn in self._conns:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._conns.clear()
+        log.info("asyncio worker %s stopped", self.cfg.worker_id)
+
+
+class _AnyStop:
+    def __init__(self, *flags):
+        self.flags = flags
+
+    def is_set(self) -> bool:
+        return any(f.is_set() for f in self.flags)
+
+
+def run(cfg: WorkerConfig, stop, wake, keeper: LeaseKeeper) -> None:
+    from .worker import _stop
+
+    engine = AsyncEngine(cfg, _AnyStop(_stop, stop), wake, keeper)
+    try:
+        asyncio.run(engine.run())
+    finally:
+        engine.close()
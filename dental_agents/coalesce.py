@@ -0,0 +1,164 @@
+"""Coalescing of bursty events that only ask for a recomputation.
+
+server.js emits ``CaseUpdated`` for every stage change and every attachment
+upload, so a doctor uploading 20 X-rays queues 20 identical recomputations of
+one case. For event types listed in ``COALESCE_KEYS``, events sharing the
+same payload key are folded into one handler call:
+
+* duplicates inside a claimed batch are merged, and
+* still-pending rows with the same key are leased along with them.
+
+The merged event overlays the payloads oldest to newest and lists every
+contributing row under ``__triggers`` (built lazily, see ``Event.payload``);
+all of its ids are marked DONE by one UPDATE.
+
+Dormant for now: no module registers a ``CaseUpdated`` handler yet (see
+``handlers.HANDLER_MODULES``), and workers only claim types they can
+handle, so nothing here runs until that handler ships.
+"""
+from __future__ import annotations
+
+import logging
+
+import mysql.connector
+
+from .db import in_clause
+from .queue import Event, order_gate
+
+log = logging.getLogger("dental_agents.coalesce")
+
+# event_type -> payload key identifying the entity being recomputed
+COALESCE_KEYS: dict[str, str] = {
+    "CaseUpdated": "caseDbId",
+}
+
+
+def coalesce_key(ev: Event) -> tuple[str, str] | None:
+    field = COALESCE_KEYS.get(ev.event_type)
+    if field is None:
+        return None
+    value = ev.payload.get(field)
+    if value is None or value == "":
+        return None
+    return ev.event_type, str(value)
+
+
+def _absorb_pending(
+    conn,
+    worker_id: str,
+    lease_seconds: int,
+    event_type: str,
+    keys: list[str],
+    ordered: bool,
+    handled: tuple[str, ...] | None = None,
+) -> list[tuple[str, Event]]:
+    """Lease pending rows matching ``keys``; returns ``(key, event)`` pairs.
+
+    The key comes back from MySQL, so absorbed payloads are not parsed here.
+    """
+    field = COALESCE_KEYS[event_type]
+    gate, gate_params = order_gate(ordered, other_types_only=True, event_types=handled)
+    cur = conn.cursor()
+    try:
+        conn.start_transaction()
+        cur.execute(
+            f"""
+            SELECT id, event_type, payload_json, attempts, max_attempts, priority,
+                   JSON_UNQUOTE(JSON_EXTRACT(payload_json, %s))
+            FROM agent_events
+            WHERE event_type = %s
+              AND status IN ('NEW', 'PENDING')
+              AND available_at <= NOW()
+              AND JSON_UNQUOTE(JSON_EXTRACT(payload_json, %s)) IN ({in_clause(keys)})
+              {gate}
+            ORDER BY id ASC
+            FOR UPDATE SKIP LOCKED
+            """,
+            (f"$.{field}", event_type, f"$.{field}", *keys, *gate_params),
+        )
+        rows = cur.fetchall()
+        if rows:
+            ids = [r[0] for r in rows]
+            cur.execute(
+                f"""
+                UPDATE agent_events
+                SET status = 'PROCESSING',
+                    locked_by = %s,
+                    locked_until = NOW() + INTERVAL %s SECOND,
+                    attempts = attempts + 1
+                WHERE id IN ({in_clause(ids)})
+                """,
+                (worker_id, int(lease_seconds), *ids),
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return [
+        (r[6], Event(id=r[0], event_type=r[1], raw_payload=r[2], attempts=r[3] + 1, max_attempts=r[4], priority=r[5]))
+        for r in rows
+    ]
+
+
+def _merge(group: list[Event]) -> Event:
+    group.sort(key=lambda ev: ev.id)
+    if len(group) == 1:
+        return group[0]
+    head = group[-1]
+    # Event.payload builds the overlaid payload and __triggers on first use
+    return Event(
+        id=head.id,
+        event_type=head.event_type,
+        attempts=max(ev.attempts for ev in group),
+        max_attempts=head.max_attempts,
+        priority=min(ev.priority for ev in group),
+        coalesced_ids=[ev.id for ev in group[:-1]],
+        merged=group,
+    )
+
+
+def coalesce(
+    conn,
+    worker_id: str,
+    lease_seconds: int,
+    events: list[Event],
+    ordered: bool = False,
+    handled: tuple[str, ...] | None = None,
+) -> list[Event]:
+    """Fold ``events`` (already leased by ``worker_id``) by coalesce key.
+
+    In ordered mode a pending row is only absorbed if no unfinished event of
+    another type for the same entity comes before it.
+    """
+    groups: dict[tuple[str, str], list[Event]] = {}
+    out: list[Event] = []
+    for ev in events:
+        key = coalesce_key(ev)
+        if key is None:
+            out.append(ev)
+        else:
+            groups.setdefault(key, []).append(ev)
+    if not groups:
+        return events
+
+    by_type: dict[str, list[str]] = {}
+    for event_type, value in groups:
+        by_type.setdefault(event_type, []).append(value)
+    try:
+        for event_type, values in by_type.items():
+            for value, ev in _absorb_pending(conn, worker_id, lease_seconds, event_type, values, ordered, handled):
+                key = (event_type, value)
+                if key in groups:
+                    groups[key].append(ev)
+    except mysql.connector.Error as e:
+        # the claimed batch is still ours; merge what we have
+        log.error("could not absorb pending events: %s", e)
+
+    for group in groups.values():
+        merged = _merge(group)
+        if merged.coalesced_ids:
+            log.info("coalesced %s %s events into %s", len(group), merged.event_type, merged.id)
+        out.append(merged)
+    return out
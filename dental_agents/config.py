@@ -0,0 +1,153 @@
+"""Environment-driven settings shared by the worker and its tools.
+
+Variable names match server.js (DB_HOST, DB_PORT, ...) so both sides can read
+the same ``.env`` file.
+"""
+from __future__ import annotations
+
+import os
+import socket
+from dataclasses import dataclass, field
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_limits(spec: str | None) -> dict[str, int]:
+    """Parse ``"CaseGenerateSummary=4,AgentRunRequested=1"`` into a dict."""
+    limits: dict[str, int] = {}
+    for part in (spec or "").split(","):
+        name, sep, value = part.partition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            limits[name.strip()] = max(1, int(value))
+        except ValueError:
+            continue
+    return limits
+
+
+def default_worker_id() -> str:
+    # locked_by is VARCHAR(64)
+    return f"{socket.gethostname()}:{os.getpid()}"[:64]
+
+
+@dataclass(frozen=True)
+class DbConfig:
+    host: str = "127.0.0.1"
+    port: int = 3306
+    user: str = "root"
+    password: str = ""
+    database: str = "dental_clinic"
+    # per-process pool, see db.py; 0 lets the worker size it from its threads
+    pool_size: int = 0
+    pool_recycle: float = 1800.0
+    pool_timeout: float = 5.0
+
+    @classmethod
+    def from_env(cls) -> "DbConfig":
+        return cls(
+            host=os.getenv("DB_HOST", "127.0.0.1"),
+            port=env_int("DB_PORT", 3306),
+            user=os.getenv("DB_USER", "root"),
+            password=os.getenv("DB_PASSWORD", ""),
+            database=os.getenv("DB_NAME", "dental_clinic"),
+            pool_size=env_int("AGENT_DB_POOL_SIZE", 0),
+            pool_recycle=env_float("AGENT_DB_POOL_RECYCLE", 1800.0),
+            pool_timeout=env_float("AGENT_DB_POOL_TIMEOUT", 5.0),
+        )
+
+
+@dataclass(frozen=True)
+class WorkerConfig:
+    worker_id: str
+    batch_size: int = 20
+    # short lease, kept alive by the heartbeat in leases.py
+    lease_seconds: int = 30
+    reap_interval: float = 10.0
+    reap_batch: int = 500
+    # idle backoff between empty claims, see wakeup.py
+    poll_min: float = 0.05
+    poll_max: float = 5.0
+    wake_port: int = 47800
+    # "sync" runs one event at a time; "asyncio" keeps many in flight.
+    engine: str = "sync"
+    max_inflight: int = 200
+    db_threads: int = 16
+    type_limits: dict[str, int] = field(default_factory=dict)
+    default_type_limit: int = 50
+    # JSON lane table or "off"; None means lanes.DEFAULT_LANES
+    lanes_spec: str | None = None
+    # per-correlation_id ordering, see queue.ORDER_GATE_SQL
+    ordered: bool = False
+    # retention, see archive.py; archive_after_days=0 disables it
+    archive_after_days: int = 30
+    archive_interval: float = 3600.0
+    archive_mode: str = "table"
+    archive_dir: str = "agent_events_archive"
+    archive_chunk: int = 1000
+    archive_pause: float = 0.05
+    archive_keep_months: int = 0
+    # /metrics endpoint, see metrics.py; metrics_port=0 disables it
+    metrics_port: int = 9464
+    metrics_sample_interval: float = 15.0
+    # handler profiling, see profiling.py
+    profile_mode: str = "off"
+    profile_rate: float = 0.01
+    profile_slow_ms: float = 5000.0
+    profile_dir: str = "agent_profiles"
+    # schedule index API for server.js, see schedule_api.py; schedule_port=0 disables it
+    schedule_port: int = 9470
+    schedule_sync_interval: float = 2.0
+    schedule_days: int = 60
+
+    @classmethod
+    def from_env(cls) -> "WorkerConfig":
+        return cls(
+            worker_id=os.getenv("AGENT_WORKER_ID") or default_worker_id(),
+            batch_size=env_int("AGENT_BATCH_SIZE", 20),
+            lease_seconds=env_int("AGENT_LEASE_SECONDS", 30),
+            reap_interval=env_float("AGENT_REAP_INTERVAL", 10.0),
+            reap_batch=env_int("AGENT_REAP_BATCH", 500),
+            poll_min=env_float("AGENT_POLL_MIN", 0.05),
+            poll_max=env_float("AGENT_POLL_MAX", 5.0),
+            wake_port=env_int("AGENT_WAKE_PORT", 47800),
+            engine=os.getenv("AGENT_ENGINE", "sync"),
+            max_inflight=env_int("AGENT_MAX_INFLIGHT", 200),
+            db_threads=env_int("AGENT_DB_THREADS", 16),
+            type_limits=parse_limits(os.getenv("AGENT_TYPE_LIMITS")),
+            default_type_limit=env_int("AGENT_DEFAULT_TYPE_LIMIT", 50),
+            lanes_spec=os.getenv("AGENT_LANES"),
+            ordered=os.getenv("AGENT_ORDERED", "").lower() in ("1", "true", "yes"),
+            archive_after_days=env_int("AGENT_ARCHIVE_AFTER_DAYS", 30),
+            archive_interval=env_float("AGENT_ARCHIVE_INTERVAL", 3600.0),
+            archive_mode=os.getenv("AGENT_ARCHIVE_MODE", "table"),
+            archive_dir=os.getenv("AGENT_ARCHIVE_DIR", "agent_events_archive"),
+            archive_chunk=env_int("AGENT_ARCHIVE_CHUNK", 1000),
+            archive_pause=env_float("AGENT_ARCHIVE_PAUSE", 0.05),
+            archive_keep_months=env_int("AGENT_ARCHIVE_KEEP_MONTHS", 0),
+            metrics_port=env_int("AGENT_METRICS_PORT", 9464),
+            metrics_sample_interval=env_float("AGENT_METRICS_SAMPLE_INTERVAL", 15.0),
+            profile_mode=os.getenv("AGENT_PROFILE", "off"),
+            profile_rate=env_float("AGENT_PROFILE_RATE", 0.01),
+            profile_slow_ms=env_float("AGENT_PROFILE_SLOW_MS", 5000.0),
+            profile_dir=os.getenv("AGENT_PROFILE_DIR", "agent_profiles"),
+            schedule_port=env_int("AGENT_SCHEDULE_PORT", 9470),
+            schedule_sync_interval=env_float("AGENT_SCHEDULE_SYNC_INTERVAL", 2.0),
+            schedule_days=env_int("AGENT_SCHEDULE_DAYS", 60),
+        )
@@ -0,0 +1,237 @@
+"""MySQL access for the Python agents.
+
+Connections come from one ``MySQLConnectionPool`` per process, so a unit of
+work costs a queue checkout instead of a TCP + auth handshake:
+
+* session setup runs once per physical connection (``init_command``), and
+  the pool does not reset the session on return, so it sticks;
+* the pool pings a connection when it is checked out and reconnects it if
+  the server dropped it; loops therefore keep a connection while busy and
+  return it when they go idle, instead of calling ``is_connected()`` (one
+  more round trip) every iteration;
+* connections older than ``pool_recycle`` are reconnected on checkout, well
+  inside MySQL's ``wait_timeout``;
+* ``discard`` drops a connection that hit a connection-level error so the
+  next checkout starts from a fresh one.
+
+``conn.close()`` returns a connection to the pool.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+
+import mysql.connector
+from mysql.connector import errors, pooling
+
+from . import metrics, profiling
+from .config import DbConfig
+
+log = logging.getLogger("dental_agents.db")
+
+# Same session zone as the server.js pool, so NOW()/CURDATE() agree.
+SESSION_TIME_ZONE = "+05:30"
+
+# mysql-connector refuses larger pools
+MAX_POOL_SIZE = pooling.CNX_POOL_MAXSIZE
+DEFAULT_POOL_SIZE = 2
+
+# The connection itself is unusable; anything else (syntax, constraint) is
+# the statement's fault and the connection can go back to the pool.
+CONNECTION_ERRORS = (errors.InterfaceError, errors.OperationalError)
+
+_pool: pooling.MySQLConnectionPool | None = None
+_pool_lock = threading.Lock()
+_pool_size = 0
+_pool_cfg: DbConfig | None = None
+# connection_id -> monotonic time the physical connection was opened
+_born: dict[int, float] = {}
+_born_lock = threading.Lock()
+
+
+def configure_pool(size: int, cfg: DbConfig | None = None) -> None:
+    """Set this process's pool size before the first ``connect``.
+
+    ``AGENT_DB_POOL_SIZE`` wins over ``size`` when set.
+    """
+    global _pool_size, _pool_cfg
+    cfg = cfg or DbConfig.from_env()
+    wanted = cfg.pool_size or size
+    if wanted > MAX_POOL_SIZE:
+        log.warning("pool size %s capped at %s", wanted, MAX_POOL_SIZE)
+    with _pool_lock:
+        if _pool is not None:
+            log.warning("connection pool already open; size change ignored")
+            return
+        _pool_size = max(1, min(MAX_POOL_SIZE, wanted))
+        _pool_cfg = cfg
+
+
+def _get_pool() -> pooling.MySQLConnectionPool:
+    global _pool, _pool_cfg
+    with _pool_lock:
+        if _pool is None:
+            cfg = _pool_cfg = _pool_cfg or DbConfig.from_env()
+            size = _pool_size or cfg.pool_size or DEFAULT_POOL_SIZE
+            # opens every connection up front
+            _pool = pooling.MySQLConnectionPool(
+                pool_name=f"dental_agents_{os.getpid()}",
+                pool_size=max(1, min(MAX_POOL_SIZE, size)),
+                pool_reset_session=False,
+                host=cfg.host,
+                port=cfg.port,
+                user=cfg.user,
+                password=cfg.password,
+                database=cfg.database,
+                autocommit=False,
+                init_command=f"SET time_zone = '{SESSION_TIME_ZONE}'",
+            )
+            log.info("connection pool opened (%s connections)", _pool.pool_size)
+        return _pool
+
+
+def connect(cfg: DbConfig | None = None):
+    """Check a connection out of the process pool.
+
+    Waits up to ``pool_timeout`` seconds for a free connection, then raises
+    ``mysql.connector.errors.PoolError``.
+    """
+    if cfg is not None and _pool is None:
+        configure_pool(cfg.pool_size or DEFAULT_POOL_SIZE, cfg)
+    pool = _get_pool()
+    deadline = time.monotonic() + (_pool_cfg.pool_timeout if _pool_cfg else 5.0)
+    while True:
+        try:
+            conn = pool.get_connection()
+            break
+        except errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.01)
+    metrics.DB_ROUNDTRIPS.inc()  # checkout ping
+    _recycle_if_stale(conn)
+    return CountingConnection(conn)
+
+
+def connect_unpooled(cfg: DbConfig | None = None, **options):
+    """A standalone connection, for one-off tools that must not open the pool.
+
+    ``options`` go to ``mysql.connector.connect`` (e.g. ``allow_local_infile``).
+    """
+    cfg = cfg or DbConfig.from_env()
+    return mysql.connector.connect(
+        host=cfg.host,
+        port=cfg.port,
+        user=cfg.user,
+        password=cfg.password,
+        database=cfg.database,
+        autocommit=False,
+        init_command=f"SET time_zone = '{SESSION_TIME_ZONE}'",
+        **options,
+    )
+
+
+def _recycle_if_stale(conn) -> None:
+    now = time.monotonic()
+    with _born_lock:
+        born = _born.setdefault(conn.connection_id, now)
+    if now - born < (_pool_cfg.pool_recycle if _pool_cfg else 1800.0):
+        return
+    old_id = conn.connection_id
+    conn.reconnect(attempts=1)
+    with _born_lock:
+        _born.pop(old_id, None)
+        _born[conn.connection_id] = now
+
+
+def discard(conn) -> None:
+    """Return ``conn`` to the pool disconnected, so its next user reconnects.
+
+    For loops that hit a connection-level error; safe on ``None``.
+    """
+    if conn is None:
+        return
+    raw = conn.raw if isinstance(conn, CountingConnection) else conn
+    try:
+        raw.disconnect()
+    except Exception:
+        pass
+    try:
+        raw.close()
+    except Exception:
+        pass
+
+
+class CountingCursor:
+    """Cursor proxy that counts each ``execute`` as one DB round trip.
+
+    While an event is being profiled on this thread the statement is also
+    timed (see profiling.py).
+    """
+
+    def __init__(self, cur):
+        self._cur = cur
+
+    def _call(self, method, statement, *args, **kwargs):
+        metrics.DB_ROUNDTRIPS.inc()
+        trace = profiling.sql_trace()
+        if trace is None:
+            return method(statement, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return method(statement, *args, **kwargs)
+        finally:
+            profiling.record_sql(trace, statement, time.perf_counter() - started)
+
+    def execute(self, statement, *args, **kwargs):
+        return self._call(self._cur.execute, statement, *args, **kwargs)
+
+    def executemany(self, statement, *args, **kwargs):
+        return self._call(self._cur.executemany, statement, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+
+class CountingConnection:
+    """Connection proxy feeding ``agent_db_roundtrips_total``."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self._conn.cursor(*args, **kwargs))
+
+    def commit(self):
+        metrics.DB_ROUNDTRIPS.inc()
+        self._conn.commit()
+
+    def rollback(self):
+        metrics.DB_ROUNDTRIPS.inc()
+        self._conn.rollback()
+
+    def close(self):
+        """Return the connection to the pool, rolling back anything open."""
+        try:
+            if self._conn.in_transaction:
+                self.rollback()
+        except mysql.connector.Error:
+            pass
+        self._conn.close()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def in_clause(values) -> str:
+    """Placeholder list for ``WHERE x IN (...)``; ``values`` must be non-empty."""
+    return ", ".join(["%s"] * len(values))
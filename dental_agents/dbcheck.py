@@ -0,0 +1,337 @@
+"""Database diagnostics: ``python -m dental_agents.dbcheck``.
+
+    python -m dental_agents.dbcheck
+    python -m dental_agents.dbcheck --env-file ../Backend/.env --samples 200
+    python -m dental_agents.dbcheck --connect-budget-ms 50 --query-budget-ms 5 --strict
+
+Checks, in order:
+
+* connect latency -- ``--samples`` fresh connections (TCP + auth + session
+  setup), p50/p95/p99/max;
+* round-trip latency -- ``SELECT 1`` on one connection;
+* indexes -- every ``KEY``/``UNIQUE KEY``/``PRIMARY KEY`` declared in
+  ``schema_query.sql`` must exist with the same columns, under its own name
+  or as any index leading with those columns;
+* hot queries -- the worker's claim query and the server's suggest-slots
+  scan, notifications feed and dashboard counts are timed and EXPLAINed;
+  full table scans, unused indexes, filesorts and temporary tables are
+  reported.
+
+Exits 1 when a p95 is over its budget or an index is missing (with
+``--strict`` also on a full scan), 2 when the database is unreachable.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass, replace
+from datetime import date
+from pathlib import Path
+
+import mysql.connector
+from dotenv import load_dotenv
+
+from .config import DbConfig
+from .db import connect_unpooled
+from .migrate import index_satisfied
+from .queue import ClaimSlice
+
+SCHEMA_FILE = Path(__file__).resolve().parent.parent / "schema_query.sql"
+
+
+@dataclass(frozen=True)
+class HotQuery:
+    name: str
+    sql: str
+    params: tuple
+    # a full scan that cannot be indexed away (e.g. column-to-column compare)
+    scan_ok: bool = False
+
+
+def hot_queries(today: str) -> list[HotQuery]:
+    claim_sql, claim_params = ClaimSlice(20).sql("PENDING")
+    return [
+        HotQuery("worker claim", claim_sql, claim_params),
+        HotQuery(
+            "suggest-slots scan",
+            """
+            SELECT scheduled_time, scheduled_end_time, predicted_duration_min, status, operatory_id
+            FROM appointments
+            WHERE scheduled_date = %s
+              AND status NOT IN ('Cancelled')
+              AND (doctor_id = %s OR operatory_id = %s)
+            """,
+            (today, 1, 1),
+        ),
+        HotQuery(
+            "notifications feed",
+            """
+            SELECT id, channel, type, title, message, status, scheduled_at, read_at, created_at
+            FROM notifications
+            WHERE (
+              user_id = %s
+              OR (user_id IS NULL AND user_role = %s)
+              OR (user_id IS NULL AND user_role IS NULL)
+            )
+            ORDER BY id DESC
+            LIMIT 200
+            """,
+            (1, "Patient"),
+        ),
+        HotQuery(
+            "dashboard: appointments today",
+            """
+            SELECT COUNT(*) FROM appointments
+            WHERE scheduled_date = %s AND status IN ('Confirmed','Checked in','Completed')
+            """,
+            (today,),
+        ),
+        HotQuery(
+            "dashboard: low stock",
+            "SELECT COUNT(*) FROM inventory_items WHERE stock <= reorder_threshold",
+            (),
+            scan_ok=True,
+        ),
+        HotQuery(
+            "dashboard: revenue today",
+            "SELECT COALESCE(SUM(amount),0) FROM invoices WHERE paid_date = %s AND status = 'Paid'",
+            (today,),
+        ),
+        HotQuery("dashboard: case pipeline", "SELECT stage, COUNT(*) FROM cases GROUP BY stage", ()),
+        HotQuery(
+            "dashboard: new patients",
+            "SELECT COUNT(*) FROM users WHERE role = 'Patient' AND DATE(created_at) = %s",
+            (today,),
+        ),
+    ]
+
+
+# -- measurements --------------------------------------------------------------
+
+
+def percentiles(samples_ms: list[float]) -> dict[str, float]:
+    """Nearest-rank p50/p95/p99 and max."""
+    if not samples_ms:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(samples_ms)
+
+    def rank(p: float) -> float:
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    return {"p50": rank(50), "p95": rank(95), "p99": rank(99), "max": ordered[-1]}
+
+
+def time_connects(cfg: DbConfig, samples: int) -> list[float]:
+    out = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        conn = connect_unpooled(cfg)
+        out.append((time.perf_counter() - started) * 1000)
+        conn.close()
+    return out
+
+
+def time_query(conn, sql: str, params: tuple, samples: int) -> list[float]:
+    out = []
+    cur = conn.cursor()
+    try:
+        for _ in range(samples):
+            started = time.perf_counter()
+            cur.execute(sql, params)
+            cur.fetchall()
+            out.append((time.perf_counter() - started) * 1000)
+            # releases the claim query's row locks
+            conn.rollback()
+    finally:
+        cur.close()
+    return out
+
+
+# -- schema indexes ------------------------------------------------------------
+
+_TABLE_RE = re.compile(r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?\s*\((.*?)\)\s*ENGINE", re.I | re.S)
+_KEY_RE = re.compile(r"^\s*(PRIMARY\s+KEY|UNIQUE\s+KEY\s+`?(\w+)`?|KEY\s+`?(\w+)`?)\s*\(([^)]*)\)", re.I | re.M)
+
+
+def expected_indexes(schema_sql: str) -> dict[tuple[str, str], tuple[str, ...]]:
+    """``(table, index) -> columns`` for every index declared in the schema."""
+    out: dict[tuple[str, str], tuple[str, ...]] = {}
+    for table, body in _TABLE_RE.findall(schema_sql):
+        for m in _KEY_RE.finditer(body):
+            name = "PRIMARY" if m.group(1).upper().startswith("PRIMARY") else (m.group(2) or m.group(3))
+            cols = tuple(re.sub(r"\(\d+\)|`|\s+(ASC|DESC)\b", "", c, flags=re.I).strip().lower() for c in m.group(4).split(","))
+            out[(table.lower(), name)] = cols
+    return out
+
+
+def actual_indexes(conn) -> dict[tuple[str, str], tuple[str, ...]]:
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT table_name, index_name, column_name
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE()
+            ORDER BY table_name, index_name, seq_in_index
+            """
+        )
+        out: dict[tuple[str, str], list[str]] = {}
+        for table, index, column in cur.fetchall():
+            out.setdefault((str(table).lower(), str(index)), []).append(str(column).lower())
+    finally:
+        cur.close()
+    return {k: tuple(v) for k, v in out.items()}
+
+
+def check_indexes(expected, actual) -> list[str]:
+    """Same rule as the migrations (``migrate.index_satisfied``): an index
+    under another name that starts with the declared columns counts."""
+    by_table: dict[str, dict[str, tuple[str, ...]]] = {}
+    for (table, index), cols in actual.items():
+        by_table.setdefault(table, {})[index] = cols
+    problems = []
+    for (table, index), cols in sorted(expected.items()):
+        existing = by_table.get(table, {})
+        if index_satisfied(existing, index, cols):
+            continue
+        found = existing.get(index)
+        if found is None:
+            problems.append(f"missing index {table}.{index} ({', '.join(cols)})")
+        else:
+            problems.append(f"index {table}.{index} is ({', '.join(found)}), schema says ({', '.join(cols)})")
+    return problems
+
+
+# -- EXPLAIN -------------------------------------------------------------------
+
+
+def explain(conn, q: HotQuery) -> list[dict]:
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("EXPLAIN " + q.sql, q.params)
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+    conn.rollback()
+    return rows
+
+
+def plan_findings(q: HotQuery, rows: list[dict]) -> tuple[list[str], list[str]]:
+    """``(scans, notes)`` for one EXPLAIN."""
+    scans: list[str] = []
+    notes: list[str] = []
+    for r in rows:
+        table = r.get("table") or "?"
+        extra = r.get("Extra") or ""
+        if r.get("type") == "ALL" and not q.scan_ok:
+            scans.append(f"full scan of {table} (~{r.get('rows')} rows)")
+        if not r.get("key") and r.get("possible_keys"):
+            notes.append(f"{table}: no index used (possible: {r['possible_keys']})")
+        if "filesort" in extra:
+            notes.append(f"{table}: filesort")
+        if "temporary" in extra:
+            notes.append(f"{table}: temporary table")
+    return scans, notes
+
+
+# -- CLI -----------------------------------------------------------------------
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m dental_agents.dbcheck")
+    p.add_argument("--env-file", help="load DB_* settings from this .env (overrides the environment)")
+    p.add_argument("--host")
+    p.add_argument("--port", type=int)
+    p.add_argument("--user")
+    p.add_argument("--password")
+    p.add_argument("--database")
+    p.add_argument("--samples", type=int, default=50, help="connections and queries to time")
+    p.add_argument("--connect-budget-ms", type=float, default=200.0, help="p95 budget for a new connection")
+    p.add_argument("--query-budget-ms", type=float, default=20.0, help="p95 budget for SELECT 1 and each hot query")
+    p.add_argument("--schema", default=str(SCHEMA_FILE))
+    p.add_argument("--strict", action="store_true", help="also fail on full table scans")
+    return p.parse_args(argv)
+
+
+def db_config(args) -> DbConfig:
+    if args.env_file:
+        load_dotenv(args.env_file, override=True)
+    cfg = DbConfig.from_env()
+    overrides = {k: getattr(args, k) for k in ("host", "port", "user", "password", "database")}
+    return replace(cfg, **{k: v for k, v in overrides.items() if v is not None})
+
+
+def fmt(stats: dict[str, float]) -> str:
+    return "  ".join(f"{k}={v:.2f}ms" for k, v in stats.items())
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    cfg = db_config(args)
+    samples = max(1, args.samples)
+    failures: list[str] = []
+    print(f"database {cfg.user}@{cfg.host}:{cfg.port}/{cfg.database}")
+
+    try:
+        connect = percentiles(time_connects(cfg, samples))
+        conn = connect_unpooled(cfg)
+    except mysql.connector.Error as e:
+        print(f"ERROR: cannot connect: {e}", file=sys.stderr)
+        return 2
+    try:
+        print(f"connect      {fmt(connect)}")
+        if connect["p95"] > args.connect_budget_ms:
+            failures.append(f"connect p95 {connect['p95']:.2f}ms > {args.connect_budget_ms:g}ms")
+        ping = percentiles(time_query(conn, "SELECT 1", (), samples))
+        print(f"SELECT 1     {fmt(ping)}")
+        if ping["p95"] > args.query_budget_ms:
+            failures.append(f"SELECT 1 p95 {ping['p95']:.2f}ms > {args.query_budget_ms:g}ms")
+
+        print("\nindexes")
+        try:
+            with open(args.schema, encoding="utf-8") as f:
+                expected = expected_indexes(f.read())
+        except OSError as e:
+            print(f"  cannot read {args.schema}: {e}", file=sys.stderr)
+            expected = {}
+        problems = check_indexes(expected, actual_indexes(conn))
+        for problem in problems:
+            print(f"  {problem}")
+        if not problems:
+            print(f"  all {len(expected)} indexes from {os.path.basename(args.schema)} present")
+        failures.extend(problems)
+
+        print("\nhot queries")
+        for q in hot_queries(date.today().isoformat()):
+            try:
+                stats = percentiles(time_query(conn, q.sql, q.params, samples))
+                scans, notes = plan_findings(q, explain(conn, q))
+            except mysql.connector.Error as e:
+                print(f"  {q.name}: ERROR {e}")
+                failures.append(f"{q.name}: {e}")
+                continue
+            print(f"  {q.name:<30} {fmt(stats)}")
+            for line in scans + notes:
+                print(f"      {line}")
+            if stats["p95"] > args.query_budget_ms:
+                failures.append(f"{q.name} p95 {stats['p95']:.2f}ms > {args.query_budget_ms:g}ms")
+            if args.strict:
+                failures.extend(f"{q.name}: {s}" for s in scans)
+    finally:
+        conn.close()
+
+    if failures:
+        print(f"\nFAILED ({len(failures)}):")
+        for f in failures:
+            print(f"  {f}")
+        return 1
+    print("\nOK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""Appointment duration predictions per (doctor, appointment type).
+
+For each (doctor, type) the model keeps the last ``SAMPLE_WINDOW`` observed
+durations (``actual_end_at`` minus ``actual_start_at``, else check-in, else
+the scheduled start) in a sorted list, so median and p80 are index lookups
+and a new observation is a ``bisect`` insert. Predictions are cached per key
+until the key sees a new sample; a lookup is one dict access.
+
+* ``warm_up`` loads every key in one query: MySQL ranks each key's recent
+  completions with a window function and only the newest ``SAMPLE_WINDOW``
+  per key come back;
+* ``observe_appointment`` adds one completion (AppointmentCompleted);
+* a key with fewer than ``MIN_SAMPLES`` falls back to the clinic-wide
+  samples for the type, then to ``DEFAULT_DURATION_MIN``.
+
+Bookings use ``Prediction.minutes``: p80 rounded up to the 5-minute cell,
+so four in five visits fit the slot without padding every booking to the
+longest case.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+
+from .schedule import CELL_MINUTES, DEFAULT_DURATION_MIN
+
+log = logging.getLogger("dental_agents.durations")
+
+SAMPLE_WINDOW = 100
+MIN_SAMPLES = 5
+HISTORY_DAYS = 365
+# outside this range the timestamps are wrong (forgotten "complete" clicks)
+MIN_MINUTES = 5
+MAX_MINUTES = 480
+
+DURATION_EXPR = """
+    TIMESTAMPDIFF(
+      MINUTE,
+      COALESCE(actual_start_at, actual_checkin_at, TIMESTAMP(scheduled_date, scheduled_time)),
+      actual_end_at
+    )
+"""
+
+WARM_SQL = f"""
+    SELECT doctor_id, type, minutes
+    FROM (
+      SELECT doctor_id, type, {DURATION_EXPR} AS minutes,
+             ROW_NUMBER() OVER (PARTITION BY doctor_id, type ORDER BY actual_end_at DESC, id DESC) AS rn
+      FROM appointments
+      WHERE status = 'Completed'
+        AND actual_end_at >= NOW() - INTERVAL %s DAY
+        AND {DURATION_EXPR} BETWEEN %s AND %s
+    ) recent
+    WHERE rn <= %s
+    ORDER BY rn DESC
+"""
+
+ONE_SQL = f"""
+    SELECT doctor_id, type, {DURATION_EXPR} AS minutes
+    FROM appointments
+    WHERE id = %s AND status = 'Completed' AND actual_end_at IS NOT NULL
+"""
+
+
+def type_key(appointment_type: str | None) -> str:
+    return (appointment_type or "General").strip().casefold()
+
+
+@dataclass(frozen=True)
+class Prediction:
+    median: float
+    p80: float
+    samples: int
+    # "doctor", "clinic" or "default"
+    source: str
+
+    @property
+    def minutes(self) -> int:
+        return max(CELL_MINUTES, math.ceil(self.p80 / CELL_MINUTES) * CELL_MINUTES)
+
+
+DEFAULT_PREDICTION = Prediction(DEFAULT_DURATION_MIN, DEFAULT_DURATION_MIN, 0, "default")
+
+
+class Samples:
+    """The newest ``window`` durations, also kept sorted."""
+
+    __slots__ = ("recent", "ordered", "window")
+
+    def __init__(self, window: int = SAMPLE_WINDOW):
+        self.window = window
+        self.recent: deque[int] = deque()
+        self.ordered: list[int] = []
+
+    def add(self, minutes: int) -> None:
+        if len(self.recent) >= self.window:
+            oldest = self.recent.popleft()
+            del self.ordered[bisect_left(self.ordered, oldest)]
+        self.recent.append(minutes)
+        insort(self.ordered, minutes)
+
+    def __len__(self) -> int:
+        return len(self.ordered)
+
+    def quantile(self, q: float) -> float:
+        """Nearest-rank quantile."""
+        n = len(self.ordered)
+        return float(self.ordered[max(0, math.ceil(q * n) - 1)])
+
+    def median(self) -> float:
+        n = len(self.ordered)
+        mid = n // 2
+        return float(self.ordered[mid]) if n % 2 else (self.ordered[mid - 1] + self.ordered[mid]) / 2
+
+
+class DurationModel:
+    def __init__(self, window: int = SAMPLE_WINDOW, min_samples: int = MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        # (doctor_id, type_key) and (None, type_key) for the clinic-wide samples
+        self._samples: dict[tuple[int | None, str], Samples] = {}
+        self._cache: dict[tuple[int | None, str], Prediction] = {}
+        self.warmed_at: datetime | None = None
+
+    @property
+    def warm(self) -> bool:
+        return self.warmed_at is not None
+
+    def _add(self, doctor_id: int | None, kind: str, minutes: int) -> None:
+        for key in ((doctor_id, kind), (None, kind)):
+            samples = self._samples.get(key)
+            if samples is None:
+                # the clinic-wide key pools every doctor, so it gets a bigger window
+                samples = self._samples[key] = Samples(self.window * (1 if key[0] is not None else 10))
+            samples.add(minutes)
+            self._cache.pop(key, None)
+
+    def observe(self, doctor_id: int, appointment_type: str | None, minutes: int) -> None:
+        if not MIN_MINUTES <= minutes <= MAX_MINUTES:
+            return
+        with self._lock:
+            self._add(doctor_id, type_key(appointment_type), int(minutes))
+
+    def observe_appointment(self, conn, appointment_id: int) -> None:
+        if not self.warm:
+            return
+        cur = conn.cursor()
+        try:
+            cur.execute(ONE_SQL, (appointment_id,))
+            row = cur.fetchone()
+        finally:
+            cur.close()
+        if row is not None and row[2] is not None:
+            self.observe(row[0], row[1], int(row[2]))
+
+    def _predict(self, key: tuple[int | None, str]) -> Prediction | None:
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        samples = self._samples.get(key)
+        if samples is None or len(samples) < self.min_samples:
+            return None
+        pred = Prediction(
+            samples.median(), samples.quantile(0.8), len(samples), "doctor" if key[0] is not None else "clinic"
+        )
+        self._cache[key] = pred
+        return pred
+
+    def predict(self, doctor_id: int | None, appointment_type: str | None) -> Prediction:
+        kind = type_key(appointment_type)
+        with self._lock:
+            return self._predict((doctor_id, kind)) or self._predict((None, kind)) or DEFAULT_PREDICTION
+
+    def warm_up(self, conn) -> None:
+        cur = conn.cursor()
+        try:
+            cur.execute(WARM_SQL, (HISTORY_DAYS, MIN_MINUTES, MAX_MINUTES, self.window))
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+        conn.rollback()
+        fresh = DurationModel(self.window, self.min_samples)
+        # oldest first, so each key's deque ends with the newest sample
+        for doctor_id, appointment_type, minutes in rows:
+            fresh._add(doctor_id, type_key(appointment_type), int(minutes))
+        with self._lock:
+            self._samples, self._cache = fresh._samples, {}
+            self.warmed_at = datetime.now()
+        log.info("duration model warm: %s samples, %s keys", len(rows), len(fresh._samples))
+
+
+MODEL = DurationModel()
@@ -0,0 +1,214 @@
+"""Typed payload models for the events server.js emits.
+
+``enqueueEventDb`` stores free-form JSON with a ``__meta`` block. Instead of
+every handler digging through dicts, the worker validates each payload
+right after claiming (``Event.validate``) and handlers read the result from
+``Event.model``: one of the slotted dataclasses below (or None for event
+types without a model). A payload that fails validation will not get better
+on retry, so the worker marks such events DEAD there, before any handler
+runs.
+
+Payloads are decoded lazily: ``Event.payload`` parses ``payload_json`` on
+first access with orjson when it is installed (stdlib json otherwise), so
+events that are only folded into a coalesced group by key are never parsed
+in Python.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from typing import Any
+
+try:  # optional fast backend
+    import orjson as _orjson
+except ImportError:  # pragma: no cover - depends on environment
+    _orjson = None
+
+
+def loads(raw):
+    if _orjson is not None:
+        return _orjson.loads(raw)
+    if isinstance(raw, (bytes, bytearray)):
+        raw = raw.decode("utf-8")
+    return json.loads(raw)
+
+
+class PayloadError(ValueError):
+    """Payload is missing a required field or has one of the wrong type."""
+
+
+def _int(p: dict, key: str, required: bool = True) -> int | None:
+    value = p.get(key)
+    if value is None or value == "":
+        if required:
+            raise PayloadError(f"missing {key}")
+        return None
+    if isinstance(value, bool):
+        raise PayloadError(f"{key} must be an integer")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise PayloadError(f"{key} must be an integer, got {value!r}") from None
+
+
+def _str(p: dict, key: str, default: str | None = None) -> str | None:
+    value = p.get(key)
+    if value is None or value == "":
+        return default
+    return str(value)
+
+
+def _req_str(p: dict, key: str) -> str:
+    value = _str(p, key)
+    if value is None:
+        raise PayloadError(f"missing {key}")
+    return value
+
+
+@dataclass(slots=True)
+class Meta:
+    created_by_user_id: int | None = None
+    created_at: str | None = None
+
+    @classmethod
+    def from_payload(cls, p: dict) -> "Meta":
+        m = p.get("__meta")
+        if not isinstance(m, dict):
+            return cls()
+        return cls(created_by_user_id=_int(m, "createdByUserId", required=False), created_at=_str(m, "createdAt"))
+
+
+@dataclass(slots=True)
+class AppointmentCreated:
+    appointment_id: int
+    patient_id: int
+    doctor_id: int
+    date: str
+    time: str
+    type: str = "General"
+    appointment_uid: str | None = None
+    operatory_id: int | None = None
+    meta: Meta = field(default_factory=Meta)
+
+    @classmethod
+    def from_payload(cls, p: dict) -> "AppointmentCreated":
+        return cls(
+            appointment_id=_int(p, "appointmentId"),
+            patient_id=_int(p, "patientId"),
+            doctor_id=_int(p, "doctorId"),
+            date=_req_str(p, "date"),
+            time=_req_str(p, "time"),
+            type=_str(p, "type", "General"),
+            appointment_uid=_str(p, "appointmentUid"),
+            operatory_id=_int(p, "operatoryId", required=False),
+            meta=Meta.from_payload(p),
+        )
+
+
+@dataclass(slots=True)
+class AppointmentCompleted:
+    appointment_id: int
+    patient_id: int | None = None
+    doctor_id: int | None = None
+    type: str = "General"
+    linked_case_id: int | None = None
+    meta: Meta = field(default_factory=Meta)
+
+    @classmethod
+    def from_payload(cls, p: dict) -> "AppointmentCompleted":
+        return cls(
+            appointment_id=_int(p, "appointmentId"),
+            patient_id=_int(p, "patientId", required=False),
+            doctor_id=_int(p, "doctorId", required=False),
+            type=_str(p, "type", "General"),
+            linked_case_id=_int(p, "linkedCaseId", required=False),
+            meta=Meta.from_payload(p),
+        )
+
+
+@dataclass(slots=True)
+class AppointmentCancelled:
+    appointment_id: int
+    doctor_id: int | None = None
+    date: str | None = None
+    meta: Meta = field(default_factory=Meta)
+
+    @classmethod
+    def from_payload(cls, p: dict) -> "AppointmentCancelled":
+        return cls(
+            appointment_id=_int(p, "appointmentId"),
+            doctor_id=_int(p, "doctorId", required=False),
+            date=_str(p, "date"),
+            meta=Meta.from_payload(p),
+        )
+
+
+# The Case* and AgentRunRequested models below are not used yet: no handler
+# module registers these types, so workers do not claim them (see
+# handlers.HANDLER_MODULES). They document the payloads server.js sends.
+
+
+@dataclass(slots=True)
+class CaseUpdated:
+    case_id: int
+    stage: str | None = None
+    next_action: str | None = None
+    # event ids folded into this one by coalesce.py (empty when not coalesced)
+    trigger_ids: list[int] = field(default_factory=list)
+    meta: Meta = field(default_factory=Meta)
+
+    @classmethod
+    def from_payload(cls, p: dict) -> "CaseUpdated":
+        triggers = p.get("__triggers") or []
+        return cls(
+            case_id=_int(p, "caseDbId"),
+            stage=_str(p, "stage"),
+            next_action=_str(p, "nextAction"),
+            trigger_ids=[t["eventId"] for t in triggers if isinstance(t, dict) and "eventId" in t],
+            meta=Meta.from_payload(p),
+        )
+
+
+@dataclass(slots=True)
+class CaseGenerateSummary:
+    case_id: int
+    visit_ids: list[int] = field(default_factory=list)
+    meta: Meta = field(default_factory=Meta)
+
+    @classmethod
+    def from_payload(cls, p: dict) -> "CaseGenerateSummary":
+        visits = p.get("visitIds") or []
+        if not isinstance(visits, list):
+            raise PayloadError("visitIds must be a list")
+        try:
+            visit_ids = [int(v) for v in visits]
+        except (TypeError, ValueError):
+            raise PayloadError("visitIds must be integers") from None
+        return cls(case_id=_int(p, "caseId"), visit_ids=visit_ids, meta=Meta.from_payload(p))
+
+
+@dataclass(slots=True)
+class AgentRunRequested:
+    agent: str
+    meta: Meta = field(default_factory=Meta)
+
+    @classmethod
+    def from_payload(cls, p: dict) -> "AgentRunRequested":
+        return cls(agent=_req_str(p, "agent").lower(), meta=Meta.from_payload(p))
+
+
+MODELS: dict[str, Any] = {
+    "AppointmentCreated": AppointmentCreated,
+    "AppointmentCompleted": AppointmentCompleted,
+    "AppointmentCancelled": AppointmentCancelled,
+    "CaseUpdated": CaseUpdated,
+    "CaseGenerateSummary": CaseGenerateSummary,
+    "AgentRunRequested": AgentRunRequested,
+}
+
+
+def decode(event_type: str, payload: dict):
+    model = MODELS.get(event_type)
+    if model is None:
+        return None
+    return model.from_payload(payload)
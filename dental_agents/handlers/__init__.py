@@ -0,0 +1,124 @@
+"""Handler registry keyed by ``agent_events.event_type``.
+
+A handler is either
+
+* ``fn(conn, event)`` -- runs inside the worker's transaction; the worker
+  commits after it returns and rolls back if it raises, or
+* ``async fn(event, db)`` -- for handlers that mostly wait on SMTP/HTTP/LLM
+  calls. ``await db.run(fn, *args)`` runs ``fn(conn, *args)`` as one
+  transaction; ``await db.run_once(event, name, fn, *args)`` does the same
+  but at most once per event (see idempotency.py). Under ``--engine asyncio``
+  many of these run concurrently.
+
+``event.model`` is the validated payload model from events.py (``None`` for
+types without one); ``event.payload`` is the raw decoded dict.
+
+Handler modules are imported lazily: ``HANDLER_MODULES`` maps each
+``event_type`` to the module that registers its handler, and that module is
+imported the first time the type is claimed. Only types listed here (or
+registered directly) are claimed; rows of other types stay queued until a
+worker that has their handler picks them up. Keep heavy imports (reportlab,
+LLM clients) inside the handler modules -- better still, inside the handler
+functions -- so worker start-up and every spawned child stay fast
+(``python -m dental_agents.worker --profile-startup`` shows import costs).
+
+Sync handlers are made idempotent by the worker, keyed by ``name`` given to
+``register`` (default: the function's dotted path). Keep the name stable.
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib
+import inspect
+import logging
+import threading
+from typing import Callable
+
+log = logging.getLogger("dental_agents.handlers")
+
+Handler = Callable[..., None]
+
+HANDLERS: dict[str, Handler] = {}
+
+# event_type -> module that registers its handler when imported. CaseUpdated,
+# CaseGenerateSummary and AgentRunRequested have no handler module yet; their
+# rows stay queued, and coalescing (coalesce.py) and the summaries/bulk lanes
+# (lanes.py) are dormant until one is added here.
+HANDLER_MODULES: dict[str, str] = {
+    "AppointmentCreated": "dental_agents.handlers.appointments",
+    "AppointmentCompleted": "dental_agents.handlers.appointments",
+    "AppointmentCancelled": "dental_agents.handlers.appointments",
+}
+
+_imported: set[str] = set()
+_import_lock = threading.Lock()
+
+
+def register(event_type: str, name: str | None = None):
+    def deco(fn: Handler) -> Handler:
+        if name:
+            fn.handler_key = name
+        HANDLERS[event_type] = fn
+        return fn
+
+    return deco
+
+
+def _load_module(module: str) -> None:
+    with _import_lock:
+        if module in _imported:
+            return
+        # import errors propagate: the event fails and is retried, and the
+        # import is attempted again next time
+        importlib.import_module(module)
+        _imported.add(module)
+
+
+def get_handler(event_type: str) -> Handler | None:
+    handler = HANDLERS.get(event_type)
+    if handler is None:
+        module = HANDLER_MODULES.get(event_type)
+        if module is not None and module not in _imported:
+            _load_module(module)
+            handler = HANDLERS.get(event_type)
+    return handler
+
+
+def handled_types() -> tuple[str, ...]:
+    """Event types this process can handle; the worker claims only these."""
+    return tuple(sorted(set(HANDLER_MODULES) | set(HANDLERS)))
+
+
+def preload() -> None:
+    """Import every handler module now (used by --profile-startup)."""
+    for module in dict.fromkeys(HANDLER_MODULES.values()):
+        _load_module(module)
+
+
+def is_async(handler: Handler) -> bool:
+    return inspect.iscoroutinefunction(handler)
+
+
+class InlineDb:
+    """``db`` argument for async handlers run by the sync worker."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def run(self, fn, *args):
+        try:
+            result = fn(self.conn, *args)
+            self.conn.commit()
+            return result
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    async def run_once(self, event, name: str, fn, *args):
+        from ..idempotency import run_once
+
+        return await self.run(run_once, event, name, fn, *args)
+
+
+def run_async_inline(handler: Handler, conn, event) -> None:
+    asyncio.run(handler(event, InlineDb(conn)))
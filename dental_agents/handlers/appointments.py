@@ -0,0 +1,34 @@
+"""Appointment agent: keeps the schedule index and duration model current.
+
+Each event re-reads its appointment row, so the index sees the stored
+times, duration and status rather than what the payload said at enqueue
+time. In a process that does not serve the schedule API neither is ever
+warmed and these handlers only validate and complete the event.
+
+With ``AGENT_ASSIGN_OPERATORIES=1`` AppointmentCreated also gives the
+booking's day's appointments without a room one (see operatories.py).
+"""
+from __future__ import annotations
+
+from .. import durations, operatories, schedule
+from . import register
+
+
+@register("AppointmentCreated")
+def appointment_created(conn, ev) -> None:
+    moved = []
+    if operatories.ENABLED:
+        moved = list(operatories.assign_day(conn, schedule.as_date(ev.model.date)))
+    schedule.INDEX.refresh(conn, [ev.model.appointment_id, *moved])
+
+
+@register("AppointmentCompleted")
+def appointment_completed(conn, ev) -> None:
+    # frees the rest of the chair time if the visit ended early
+    schedule.INDEX.refresh(conn, [ev.model.appointment_id])
+    durations.MODEL.observe_appointment(conn, ev.model.appointment_id)
+
+
+@register("AppointmentCancelled")
+def appointment_cancelled(conn, ev) -> None:
+    schedule.INDEX.remove(ev.model.appointment_id)
@@ -0,0 +1,62 @@
+"""Exactly-once side effects for handlers.
+
+Delivery is at-least-once: an expired lease or a double click on "retry
+failed events" can run the same ``AppointmentCompleted`` twice, which would
+deduct inventory or create an invoice twice. Before a handler runs, the
+worker inserts ``(event_id, handler)`` into ``agent_handler_runs`` in the
+handler's own transaction. The marker commits together with the handler's
+writes, so a second run finds it and becomes a no-op; a concurrent duplicate
+blocks on the marker's row lock until the first commits or rolls back.
+
+The table is created by migration 0005_agent_handler_runs. Sync handlers
+get this automatically. Async handlers wrap their write
+transaction in ``await db.run_once(event, name, fn, *args)``.
+"""
+from __future__ import annotations
+
+import logging
+
+from .db import in_clause
+from .queue import Event
+
+log = logging.getLogger("dental_agents.idempotency")
+
+
+def handler_key(handler) -> str:
+    key = getattr(handler, "handler_key", None) or f"{handler.__module__}.{handler.__qualname__}"
+    return key[:128]
+
+
+def begin(conn, event_ids: list[int], name: str) -> bool:
+    """Insert the markers inside the current transaction.
+
+    Returns False if every id already has a marker, i.e. the work is done.
+    If only some do (a coalesced group that absorbed new rows), the handler
+    runs again; handlers that can coalesce are recomputations anyway.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"INSERT IGNORE INTO agent_handler_runs (event_id, handler) VALUES {', '.join(['(%s, %s)'] * len(event_ids))}",
+            tuple(v for event_id in event_ids for v in (event_id, name)),
+        )
+        return cur.rowcount > 0
+    finally:
+        cur.close()
+
+
+def run_once(conn, ev: Event, name: str, fn, *args):
+    """Call ``fn(conn, *args)`` unless ``name`` already handled ``ev``.
+
+    The caller commits; the marker is part of that transaction.
+    """
+    if not begin(conn, ev.all_ids, name):
+        log.info("event %s already handled by %s; skipping", ev.id, name)
+        return None
+    return fn(conn, *args)
+
+
+def forget(cur, event_ids: list[int]) -> None:
+    """Drop markers for archived events (runs in the caller's transaction)."""
+    if event_ids:
+        cur.execute(f"DELETE FROM agent_handler_runs WHERE event_id IN ({in_clause(event_ids)})", tuple(event_ids))
@@ -0,0 +1,148 @@
+"""Named lanes per ``event_type`` with weighted fair claiming.
+
+Without lanes a bulk ``AgentRunRequested`` backfill can fill every claim
+batch and starve ``AppointmentCreated``. Each lane owns some event types and
+has a ``weight`` (its share of each claim batch while it has work) and a
+``concurrency`` budget (events of the lane leased and unfinished at once in
+this process). A lane with an empty queue gives its share to the busy lanes
+but keeps a one-row probe, so it gets its full share back on the next claim
+as soon as work arrives.
+
+Both engines account an event from claim to completion. The asyncio engine
+runs a lane's events concurrently up to the budget; the sync engine runs
+one event at a time, so there the budget caps how many of the lane's events
+one claim batch may hold.
+
+Lanes come from ``AGENT_LANES`` as JSON, e.g.
+``[{"name": "bulk", "event_types": ["AgentRunRequested"], "weight": 1,
+"concurrency": 1}]``; ``AGENT_LANES=off`` disables them. Event types not
+listed in any lane go to the ``default`` lane.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass
+
+from .queue import ClaimSlice, Event
+
+log = logging.getLogger("dental_agents.lanes")
+
+DEFAULT_LANE = "default"
+
+
+@dataclass(frozen=True)
+class LaneSpec:
+    name: str
+    event_types: tuple[str, ...] = ()
+    weight: int = 1
+    concurrency: int = 16
+
+
+# "summaries" and "bulk" are dormant until CaseGenerateSummary and
+# AgentRunRequested get handlers: claim_batch skips slices whose types no
+# handler covers, so today only "interactive" and "default" ever claim.
+DEFAULT_LANES: tuple[LaneSpec, ...] = (
+    LaneSpec(
+        "interactive",
+        ("AppointmentCreated", "AppointmentCompleted", "AppointmentCancelled", "CaseUpdated"),
+        weight=8,
+        concurrency=64,
+    ),
+    LaneSpec("summaries", ("CaseGenerateSummary",), weight=2, concurrency=8),
+    LaneSpec("bulk", ("AgentRunRequested",), weight=1, concurrency=2),
+    LaneSpec(DEFAULT_LANE, (), weight=2, concurrency=16),
+)
+
+
+def parse_lanes(spec: str | None) -> tuple[LaneSpec, ...]:
+    if spec is None or not spec.strip():
+        return DEFAULT_LANES
+    if spec.strip().lower() in ("off", "none", "0"):
+        return ()
+    try:
+        items = json.loads(spec)
+        lanes = tuple(
+            LaneSpec(
+                name=str(it["name"]),
+                event_types=tuple(str(t) for t in it.get("event_types", ())),
+                weight=max(1, int(it.get("weight", 1))),
+                concurrency=max(1, int(it.get("concurrency", 16))),
+            )
+            for it in items
+        )
+    except (ValueError, TypeError, KeyError) as e:
+        log.error("invalid AGENT_LANES (%s); using default lanes", e)
+        return DEFAULT_LANES
+    if not any(lane.name == DEFAULT_LANE for lane in lanes):
+        lanes += (LaneSpec(DEFAULT_LANE),)
+    return lanes
+
+
+class Lane:
+    def __init__(self, spec: LaneSpec, rank: int):
+        self.spec = spec
+        self.rank = rank
+        self.inflight = 0
+        self.credit = 0.0
+        self.busy = True
+
+    @property
+    def name(self) -> str:
+        return self.spec.name
+
+    def spare(self) -> int:
+        return max(0, self.spec.concurrency - self.inflight)
+
+
+class LaneScheduler:
+    def __init__(self, specs: tuple[LaneSpec, ...]):
+        # rank 0 = heaviest lane; used to order work inside a batch
+        ordered = sorted(specs, key=lambda s: -s.weight)
+        self.lanes = [Lane(s, i) for i, s in enumerate(ordered)]
+        self._by_type = {t: lane for lane in self.lanes for t in lane.spec.event_types}
+        self._default = next(lane for lane in self.lanes if lane.name == DEFAULT_LANE)
+        self._listed = tuple(self._by_type)
+
+    def lane_for(self, event_type: str) -> Lane:
+        return self._by_type.get(event_type, self._default)
+
+    def plan(self, batch_size: int) -> list[tuple[Lane, ClaimSlice]]:
+        """Split one claim batch between lanes by weight."""
+        open_lanes = [lane for lane in self.lanes if lane.spare() > 0]
+        if not open_lanes:
+            return []
+        busy = [lane for lane in open_lanes if lane.busy] or open_lanes
+        quotas = {lane: min(1, lane.spare()) for lane in open_lanes if lane not in busy}
+        room = max(0, batch_size - sum(quotas.values()))
+        total = sum(lane.spec.weight for lane in busy)
+        for lane in busy:
+            lane.credit += room * lane.spec.weight / total
+            quotas[lane] = min(int(lane.credit), lane.spare())
+        return [(lane, self._slice(lane, n)) for lane, n in quotas.items() if n > 0]
+
+    def _slice(self, lane: Lane, limit: int) -> ClaimSlice:
+        if lane is self._default:
+            return ClaimSlice(limit, exclude_types=self._listed)
+        return ClaimSlice(limit, event_types=lane.spec.event_types)
+
+    def claimed(self, plan: list[tuple[Lane, ClaimSlice]], events: list[Event]) -> None:
+        got: dict[Lane, int] = {}
+        for ev in events:
+            lane = self.lane_for(ev.event_type)
+            got[lane] = got.get(lane, 0) + 1
+        for lane, sl in plan:
+            n = got.get(lane, 0)
+            lane.busy = n >= sl.limit
+            # a lane that ran dry does not bank credit for later
+            lane.credit = max(0.0, lane.credit - n) if lane.busy else 0.0
+
+    def order(self, events: list[Event]) -> list[Event]:
+        return sorted(events, key=lambda ev: (self.lane_for(ev.event_type).rank, ev.priority, ev.id))
+
+    def started(self, ev: Event) -> None:
+        self.lane_for(ev.event_type).inflight += 1
+
+    def finished(self, ev: Event) -> None:
+        lane = self.lane_for(ev.event_type)
+        lane.inflight = max(0, lane.inflight - 1)
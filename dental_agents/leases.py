@@ -0,0 +1,141 @@
+"""Lease heartbeat and reaper for ``agent_events`` rows in PROCESSING.
+
+Claims set ``locked_until = NOW() + lease_seconds``. While a handler runs,
+the heartbeat thread keeps pushing ``locked_until`` forward for every event
+this worker holds, so long summary generations or PDF exports never overrun
+their lease and the lease itself can stay short.
+
+The same thread does the periodic housekeeping:
+
+* reaping -- rows still PROCESSING after ``locked_until`` belong to a worker
+  that crashed or hung; they go back to NEW in small batches so another
+  worker picks them up within a few seconds (or to DEAD if that was their
+  last attempt, so a poison event cannot crash workers forever), and
+* promoting FAILED rows whose ``next_retry_at`` is due (retry.py).
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+import mysql.connector
+
+from . import db, metrics
+from .db import in_clause
+from .retry import promote_due_retries
+
+log = logging.getLogger("dental_agents.leases")
+
+# Served by idx_locked_until.
+REAP_SQL = """
+    UPDATE agent_events
+    SET status = IF(attempts >= max_attempts, 'DEAD', 'NEW'),
+        available_at = NOW(),
+        last_error = CONCAT('lease expired; was locked by ', COALESCE(locked_by, '?')),
+        locked_by = NULL,
+        locked_until = NULL
+    WHERE locked_until < NOW()
+      AND status = 'PROCESSING'
+    ORDER BY locked_until ASC
+    LIMIT %s
+"""
+
+
+def extend_leases(conn, worker_id: str, ids: list[int], lease_seconds: int) -> int:
+    if not ids:
+        return 0
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            UPDATE agent_events
+            SET locked_until = NOW() + INTERVAL %s SECOND
+            WHERE status = 'PROCESSING'
+              AND locked_by = %s
+              AND id IN ({in_clause(ids)})
+            """,
+            (int(lease_seconds), worker_id, *ids),
+        )
+        conn.commit()
+        return cur.rowcount
+    finally:
+        cur.close()
+
+
+def reap_expired(conn, batch: int = 500, max_batches: int = 20) -> int:
+    """Return expired PROCESSING rows to NEW, ``batch`` rows per statement."""
+    total = 0
+    cur = conn.cursor()
+    try:
+        for _ in range(max_batches):
+            cur.execute(REAP_SQL, (int(batch),))
+            n = cur.rowcount
+            conn.commit()
+            total += n
+            if n < batch:
+                break
+    finally:
+        cur.close()
+    if total:
+        log.warning("reclaimed %s events with expired leases", total)
+    return total
+
+
+class LeaseKeeper:
+    """Tracks the event ids this worker holds and keeps their leases alive."""
+
+    def __init__(self, worker_id: str, lease_seconds: int, reap_interval: float, reap_batch: int, stop):
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.interval = max(1.0, lease_seconds / 3)
+        self.reap_interval = reap_interval
+        self.reap_batch = reap_batch
+        self.stop = stop
+        self._held: set[int] = set()
+        self._lock = threading.Lock()
+        self._halt = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="agent-lease", daemon=True)
+
+    def track(self, ids) -> None:
+        with self._lock:
+            self._held.update(ids)
+            metrics.INFLIGHT.set(value=len(self._held))
+
+    def release(self, ids) -> None:
+        with self._lock:
+            self._held.difference_update(ids)
+            metrics.INFLIGHT.set(value=len(self._held))
+
+    def held(self) -> list[int]:
+        with self._lock:
+            return list(self._held)
+
+    def start(self) -> "LeaseKeeper":
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._halt.set()
+        self._thread.join(timeout=5)
+
+    def _loop(self) -> None:
+        tick = min(self.interval, self.reap_interval) if self.reap_interval > 0 else self.interval
+        next_beat = next_reap = 0.0
+        while not self._halt.is_set():
+            now = time.monotonic()
+            conn = None
+            try:
+                conn = db.connect()
+                if now >= next_beat:
+                    extend_leases(conn, self.worker_id, self.held(), self.lease_seconds)
+                    next_beat = now + self.interval
+                if self.reap_interval > 0 and now >= next_reap and not self.stop.is_set():
+                    metrics.REAPED.inc(amount=reap_expired(conn, self.reap_batch))
+                    metrics.RETRIES_PROMOTED.inc(amount=promote_due_retries(conn, self.reap_batch))
+                    next_reap = now + self.reap_interval
+                conn.close()
+            except mysql.connector.Error as e:
+                log.error("lease heartbeat failed: %s", e)
+                db.discard(conn)
+            self._halt.wait(tick)
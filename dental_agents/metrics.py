@@ -0,0 +1,251 @@
+"""In-process metrics and a local ``/metrics`` endpoint (Prometheus text format).
+
+Counters and histograms are updated incrementally by the worker as it
+claims, handles and completes events; a scrape only formats what is already
+in memory. Queue depth cannot be counted that way -- server.js inserts the
+rows -- so a background thread samples it every ``metrics_sample_interval``
+seconds: the unfinished rows per (event_type, status) are counted from the
+covering ``idx_status_type`` (finished DONE/DEAD rows are never read), and
+the oldest ready event is one ``MIN`` per ready status on
+``idx_status_available``. Scrape frequency never turns into table scans.
+
+The endpoint listens on ``127.0.0.1:AGENT_METRICS_PORT`` (0 disables it). In
+``--processes`` mode child *n* listens on ``port + n``.
+
+DB round trips per event = ``rate(agent_db_roundtrips_total)`` /
+``rate(agent_events_total)``.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import mysql.connector
+
+log = logging.getLogger("dental_agents.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+BATCH_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self._lock = threading.Lock()
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.label_names, k)} {v:g}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels, value: float) -> None:
+        with self._lock:
+            self._values[labels] = float(value)
+
+    def replace(self, values: dict[tuple, float]) -> None:
+        with self._lock:
+            self._values = dict(values)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._values: dict[tuple, list[float]] = {}
+
+    def observe(self, *labels, value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        out = self.header()
+        for key, row in items:
+            cumulative = 0.0
+            for bound, n in zip((*self.buckets, "+Inf"), row[:-1]):
+                cumulative += n
+                le = bound if bound == "+Inf" else f"{bound:g}"
+                out.append(f"{self.name}_bucket{_labels((*self.label_names, 'le'), (*key, le))} {cumulative:g}")
+            out.append(f"{self.name}_sum{_labels(self.label_names, key)} {row[-1]:g}")
+            out.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative:g}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for m in self.metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+QUEUE_DEPTH = REGISTRY.add(Gauge("agent_queue_depth", "Unfinished agent_events rows (sampled; DONE and DEAD not counted).", ("event_type", "status")))
+OLDEST_READY_AGE = REGISTRY.add(Gauge("agent_oldest_ready_age_seconds", "Age of the oldest claimable event (sampled)."))
+CLAIM_BATCH = REGISTRY.add(Histogram("agent_claim_batch_size", "Rows leased per claim.", buckets=BATCH_BUCKETS))
+HANDLER_SECONDS = REGISTRY.add(
+    Histogram("agent_handler_duration_seconds", "Handler wall time per event.", ("event_type",))
+)
+EVENTS = REGISTRY.add(
+    Counter("agent_events_total", "Events finished, by outcome (done/failed/dead/lost).", ("event_type", "outcome"))
+)
+COALESCED = REGISTRY.add(Counter("agent_events_coalesced_total", "Rows folded into another event.", ("event_type",)))
+REAPED = REGISTRY.add(Counter("agent_leases_reaped_total", "Expired PROCESSING rows returned to the queue."))
+RETRIES_PROMOTED = REGISTRY.add(Counter("agent_retries_promoted_total", "FAILED rows requeued by the retry scan."))
+DB_ROUNDTRIPS = REGISTRY.add(Counter("agent_db_roundtrips_total", "Statements, commits and rollbacks sent to MySQL."))
+SLOW_EVENTS = REGISTRY.add(
+    Counter("agent_slow_events_total", "Events over the --profile-slow-ms threshold.", ("event_type",))
+)
+INFLIGHT = REGISTRY.add(Gauge("agent_inflight_events", "Events currently held by this process."))
+
+
+def record_outcome(ev, outcome: str, seconds: float | None = None) -> None:
+    EVENTS.inc(ev.event_type, outcome)
+    if ev.coalesced_ids:
+        COALESCED.inc(ev.event_type, amount=len(ev.coalesced_ids))
+    if seconds is not None:
+        HANDLER_SECONDS.observe(ev.event_type, value=seconds)
+
+
+# Index-only range scan of idx_status_type (status, event_type).
+SAMPLE_SQL = """
+    SELECT event_type, status, COUNT(*)
+    FROM agent_events
+    WHERE status IN ('NEW', 'PENDING', 'PROCESSING', 'FAILED')
+    GROUP BY event_type, status
+"""
+
+# One index dive per status: MIN over idx_status_available with status fixed.
+OLDEST_SQL = """
+    SELECT TIMESTAMPDIFF(SECOND, MIN(oldest), NOW())
+    FROM (
+      SELECT MIN(available_at) AS oldest FROM agent_events WHERE status = 'NEW' AND available_at <= NOW()
+      UNION ALL
+      SELECT MIN(available_at) FROM agent_events WHERE status = 'PENDING' AND available_at <= NOW()
+    ) ready
+"""
+
+
+def sample_queue(conn) -> None:
+    cur = conn.cursor()
+    try:
+        cur.execute(SAMPLE_SQL)
+        QUEUE_DEPTH.replace({(t, s): n for t, s, n in cur.fetchall()})
+        cur.execute(OLDEST_SQL)
+        row = cur.fetchone()
+        OLDEST_READY_AGE.set(value=max(0, row[0] or 0) if row else 0)
+        conn.commit()
+    finally:
+        cur.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):  # noqa: N802 - http.server API
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args):
+        pass
+
+
+class MetricsServer:
+    def __init__(self, port: int, sample_interval: float, host: str = "127.0.0.1"):
+        self.port = port
+        self.host = host
+        self.sample_interval = sample_interval
+        self._httpd: ThreadingHTTPServer | None = None
+        self._halt = threading.Event()
+
+    def start(self) -> "MetricsServer":
+        if not self.port:
+            return self
+        try:
+            self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        except OSError as e:
+            log.warning("metrics port %s:%s unavailable (%s)", self.host, self.port, e)
+            return self
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="agent-metrics", daemon=True).start()
+        if self.sample_interval > 0:
+            threading.Thread(target=self._sample_loop, name="agent-metrics-sampler", daemon=True).start()
+        log.info("metrics on http://%s:%s/metrics", self.host, self.port)
+        return self
+
+    def _sample_loop(self) -> None:
+        from . import db
+
+        while not self._halt.is_set():
+            conn = None
+            try:
+                conn = db.connect()
+                sample_queue(conn)
+                conn.close()
+            except mysql.connector.Error as e:
+                log.error("queue sampling failed: %s", e)
+                db.discard(conn)
+            self._halt.wait(self.sample_interval)
+
+    def close(self) -> None:
+        self._halt.set()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
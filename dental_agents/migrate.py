@@ -0,0 +1,400 @@
+"""Versioned schema migrations: ``python -m dental_agents.migrate``.
+
+    python -m dental_agents.migrate status
+    python -m dental_agents.migrate up
+    python -m dental_agents.migrate up --to 3 --dry-run
+
+Migrations live in ``dental_agents/migrations`` as ``NNNN_name.sql`` or
+``NNNN_name.py`` and run in version order, each exactly once; the
+``schema_migrations`` table records the version, name, SHA-256 of the file
+and how long it took. Editing a file that has already been applied is an
+error -- add a new migration instead.
+
+``.sql`` files are split on ``;`` at the end of a line. ``.py`` files define
+``up(conn)`` and use the helpers below, which look at information_schema
+first, so a migration that died half way (DDL commits as it goes) can simply
+be run again. ALTERs are issued with ``ALGORITHM=INSTANT`` or
+``ALGORITHM=INPLACE, LOCK=NONE``; MySQL refuses rather than silently locking
+the table if it cannot honour that.
+
+server.js and the worker only compare ``MAX(version)`` with the newest file
+at startup (``check``); applying migrations is an explicit step, run by
+run_agents.bat before the worker starts.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib.util
+import logging
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import mysql.connector
+
+from . import db
+
+log = logging.getLogger("dental_agents.migrate")
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+LOCK_NAME = "dental_agents.migrate"
+LOCK_TIMEOUT = 60
+
+SCHEMA_MIGRATIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+      version INT UNSIGNED NOT NULL,
+      name VARCHAR(200) NOT NULL,
+      checksum CHAR(64) NOT NULL,
+      applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      execution_ms INT UNSIGNED NOT NULL DEFAULT 0,
+      PRIMARY KEY (version)
+    ) ENGINE=InnoDB
+"""
+
+_FILE_RE = re.compile(r"^(\d{4})_(\w+)\.(sql|py)$")
+
+# ER_ALTER_OPERATION_NOT_SUPPORTED(_REASON): the requested algorithm/lock
+# cannot be used for this change.
+_NOT_SUPPORTED = (1845, 1846)
+_NO_SUCH_TABLE = 1146
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    path: Path
+    checksum: str
+
+    @property
+    def kind(self) -> str:
+        return self.path.suffix[1:]
+
+
+def file_checksum(data: bytes) -> str:
+    # run_agents.bat checkouts may have CRLF line endings
+    return hashlib.sha256(data.replace(b"\r\n", b"\n")).hexdigest()
+
+
+def discover(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    found: dict[int, Migration] = {}
+    for path in sorted(directory.iterdir()):
+        m = _FILE_RE.match(path.name)
+        if not m:
+            continue
+        version = int(m.group(1))
+        if version in found:
+            raise MigrationError(f"two migrations numbered {version}: {found[version].path.name}, {path.name}")
+        found[version] = Migration(version, m.group(2), path, file_checksum(path.read_bytes()))
+    return [found[v] for v in sorted(found)]
+
+
+def code_version(migrations: list[Migration] | None = None) -> int:
+    migrations = discover() if migrations is None else migrations
+    return migrations[-1].version if migrations else 0
+
+
+# -- schema_migrations -----------------------------------------------------------
+
+
+def applied(conn) -> dict[int, tuple[str, str]]:
+    """``version -> (name, checksum)``; empty if nothing was ever applied."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT version, name, checksum FROM schema_migrations")
+        return {int(v): (n, c) for v, n, c in cur.fetchall()}
+    except mysql.connector.Error as e:
+        if e.errno == _NO_SUCH_TABLE:
+            return {}
+        raise
+    finally:
+        cur.close()
+        conn.rollback()
+
+
+def db_version(conn) -> int:
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+        return int(cur.fetchone()[0])
+    except mysql.connector.Error as e:
+        if e.errno == _NO_SUCH_TABLE:
+            return 0
+        raise
+    finally:
+        cur.close()
+        conn.rollback()
+
+
+def check(conn) -> tuple[int, int]:
+    """Startup check: ``(database version, newest migration in the code)``."""
+    return db_version(conn), code_version()
+
+
+def verify(migrations: list[Migration], done: dict[int, tuple[str, str]]) -> list[str]:
+    by_version = {m.version: m for m in migrations}
+    problems = []
+    for version, (name, checksum) in sorted(done.items()):
+        m = by_version.get(version)
+        if m is None:
+            problems.append(f"{version:04d}_{name} is applied but not in {MIGRATIONS_DIR.name}/ (code older than database?)")
+        elif m.checksum != checksum:
+            problems.append(f"{m.path.name} changed after it was applied (checksum {checksum[:12]} -> {m.checksum[:12]})")
+    return problems
+
+
+# -- running -------------------------------------------------------------------
+
+
+def split_statements(sql: str) -> list[str]:
+    statements, current = [], []
+    for line in sql.splitlines():
+        if line.strip().startswith("--") and not current:
+            continue
+        current.append(line)
+        if line.rstrip().endswith(";"):
+            statement = "\n".join(current).strip().rstrip(";").strip()
+            if statement:
+                statements.append(statement)
+            current = []
+    tail = "\n".join(current).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+def _run_file(conn, m: Migration) -> None:
+    if m.kind == "sql":
+        cur = conn.cursor()
+        try:
+            for statement in split_statements(m.path.read_text(encoding="utf-8")):
+                cur.execute(statement)
+            conn.commit()
+        finally:
+            cur.close()
+        return
+    spec = importlib.util.spec_from_file_location(f"dental_agents.migrations.m{m.version:04d}", m.path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.up(conn)
+    conn.commit()
+
+
+def up(conn, target: int | None = None, dry_run: bool = False) -> list[Migration]:
+    """Apply pending migrations up to ``target``; returns what ran (or would)."""
+    migrations = discover()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+        if cur.fetchone()[0] != 1:
+            raise MigrationError("another migration run holds the lock")
+        try:
+            cur.execute(SCHEMA_MIGRATIONS_DDL)
+            done = applied(conn)
+            problems = verify(migrations, done)
+            if problems:
+                raise MigrationError("; ".join(problems))
+            todo = [m for m in migrations if m.version not in done and (target is None or m.version <= target)]
+            for m in todo:
+                if dry_run:
+                    log.info("would apply %s", m.path.name)
+                    continue
+                log.info("applying %s", m.path.name)
+                started = time.perf_counter()
+                _run_file(conn, m)
+                elapsed_ms = int((time.perf_counter() - started) * 1000)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum, execution_ms) VALUES (%s, %s, %s, %s)",
+                    (m.version, m.name, m.checksum, elapsed_ms),
+                )
+                conn.commit()
+                log.info("applied %s in %sms", m.path.name, elapsed_ms)
+            return todo
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cur.fetchall()
+    finally:
+        cur.close()
+
+
+# -- helpers for .py migrations --------------------------------------------------
+
+
+def _query(conn, sql: str, params: tuple = ()) -> list[tuple]:
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+def table_exists(conn, table: str) -> bool:
+    return bool(
+        _query(
+            conn,
+            "SELECT 1 FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+            (table,),
+        )
+    )
+
+
+def column_exists(conn, table: str, column: str) -> bool:
+    return bool(
+        _query(
+            conn,
+            """
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+            """,
+            (table, column),
+        )
+    )
+
+
+def indexes(conn, table: str) -> dict[str, tuple[str, ...]]:
+    rows = _query(
+        conn,
+        """
+        SELECT index_name, column_name FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        ORDER BY index_name, seq_in_index
+        """,
+        (table,),
+    )
+    out: dict[str, list[str]] = {}
+    for index, column in rows:
+        out.setdefault(str(index), []).append(str(column).lower())
+    return {k: tuple(v) for k, v in out.items()}
+
+
+def execute(conn, sql: str) -> None:
+    cur = conn.cursor()
+    try:
+        cur.execute(sql)
+    finally:
+        cur.close()
+
+
+def alter_online(conn, table: str, change: str) -> None:
+    """``ALTER TABLE`` without blocking writes: INSTANT, else INPLACE/LOCK=NONE."""
+    try:
+        execute(conn, f"ALTER TABLE {table} {change}, ALGORITHM=INSTANT")
+    except mysql.connector.Error as e:
+        if e.errno not in _NOT_SUPPORTED:
+            raise
+        execute(conn, f"ALTER TABLE {table} {change}, ALGORITHM=INPLACE, LOCK=NONE")
+
+
+def add_column(conn, table: str, column: str, definition: str) -> None:
+    """Add ``column`` at the end of ``table`` unless it is already there.
+
+    Trailing columns are an INSTANT change on every MySQL 8.0, so no
+    ``AFTER``: column order means nothing to the code.
+    """
+    if not column_exists(conn, table, column):
+        alter_online(conn, table, f"ADD COLUMN {column} {definition}")
+
+
+def index_satisfied(existing: dict[str, tuple[str, ...]], name: str, columns: tuple[str, ...]) -> bool:
+    """Whether ``existing`` (``indexes()`` of one table) already serves ``name``.
+
+    True if ``name`` is on exactly ``columns``, or if no index is called
+    ``name`` and another one starts with ``columns`` (older databases carry
+    the same index under server.js's names). dbcheck applies the same rule.
+    """
+    wanted = tuple(c.lower() for c in columns)
+    if name in existing:
+        return existing[name] == wanted
+    return any(cols[: len(wanted)] == wanted for cols in existing.values())
+
+
+def ensure_index(conn, table: str, name: str, columns: tuple[str, ...], unique: bool = False) -> None:
+    """Create ``name`` unless ``index_satisfied`` says it is already there.
+
+    An index called ``name`` on other columns is replaced in the same ALTER.
+    """
+    existing = indexes(conn, table)
+    if index_satisfied(existing, name, columns):
+        return
+    kind = "UNIQUE KEY" if unique else "KEY"
+    change = f"ADD {kind} {name} ({', '.join(columns)})"
+    if name in existing:
+        change = f"DROP INDEX {name}, {change}"
+    execute(conn, f"ALTER TABLE {table} {change}, ALGORITHM=INPLACE, LOCK=NONE")
+
+
+def enum_values(conn, table: str, column: str) -> list[str]:
+    rows = _query(
+        conn,
+        """
+        SELECT column_type FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """,
+        (table, column),
+    )
+    if not rows:
+        return []
+    return re.findall(r"'((?:[^']|'')*)'", str(rows[0][0]))
+
+
+def extend_enum(conn, table: str, column: str, values: tuple[str, ...], tail: str) -> None:
+    """Append missing ``values`` to an ENUM column.
+
+    Existing members keep their position -- appending is an INSTANT change,
+    reordering would rebuild the table. ``tail`` is the rest of the column
+    definition, e.g. ``"NOT NULL DEFAULT 'NEW'"``.
+    """
+    current = enum_values(conn, table, column)
+    missing = [v for v in values if v not in current]
+    if not missing:
+        return
+    members = ", ".join("'" + v.replace("'", "''") + "'" for v in current + missing)
+    alter_online(conn, table, f"MODIFY COLUMN {column} ENUM({members}) {tail}")
+
+
+# -- CLI -----------------------------------------------------------------------
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    p = argparse.ArgumentParser(prog="python -m dental_agents.migrate")
+    sub = p.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="applied and pending migrations")
+    p_up = sub.add_parser("up", help="apply pending migrations")
+    p_up.add_argument("--to", type=int, help="stop after this version")
+    p_up.add_argument("--dry-run", action="store_true")
+    args = p.parse_args(argv)
+
+    conn = db.connect()
+    try:
+        if args.command == "up":
+            try:
+                ran = up(conn, target=args.to, dry_run=args.dry_run)
+            except MigrationError as e:
+                print(f"ERROR: {e}", file=sys.stderr)
+                return 1
+            print(f"{'would apply' if args.dry_run else 'applied'} {len(ran)} migration(s); schema at {db_version(conn)}")
+            return 0
+        migrations = discover()
+        done = applied(conn)
+        for m in migrations:
+            print(f"{'applied' if m.version in done else 'pending':<8} {m.path.name}")
+        problems = verify(migrations, done)
+        for problem in problems:
+            print(f"ERROR: {problem}", file=sys.stderr)
+        print(f"database at {max(done, default=0)}, code at {code_version(migrations)}")
+        return 1 if problems or len(done) < len(migrations) else 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""agent_events: converge server.js and schema_query.sql definitions.
+
+Databases created from either source (or an older server.js) end up with
+every column and index the worker uses, and a status enum with both PENDING
+(server.js inserts) and DEAD (retry/reaper).
+"""
+from dental_agents.migrate import add_column, ensure_index, execute, extend_enum
+
+CREATE = """
+    CREATE TABLE IF NOT EXISTS agent_events (
+      id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+      event_type VARCHAR(64) NOT NULL,
+      payload_json LONGTEXT NULL,
+      status ENUM('NEW','PENDING','PROCESSING','DONE','FAILED','DEAD') NOT NULL DEFAULT 'NEW',
+      priority INT NOT NULL DEFAULT 100,
+      attempts INT NOT NULL DEFAULT 0,
+      max_attempts INT NOT NULL DEFAULT 7,
+      available_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      locked_by VARCHAR(64) NULL,
+      locked_until DATETIME NULL,
+      correlation_id VARCHAR(64) NULL,
+      created_by_user_id BIGINT UNSIGNED NULL,
+      last_error TEXT NULL,
+      expires_at DATETIME NULL,
+      next_retry_at DATETIME NULL,
+      created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+      PRIMARY KEY (id),
+      KEY idx_status_available (status, available_at, priority, id),
+      KEY idx_status_retry (status, next_retry_at),
+      KEY idx_locked_by (locked_by),
+      KEY idx_locked_until (locked_until),
+      KEY idx_correlation (correlation_id),
+      KEY idx_event_type (event_type),
+      KEY idx_created_at (created_at)
+    ) ENGINE=InnoDB
+"""
+
+COLUMNS = (
+    ("available_at", "DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP"),
+    ("locked_by", "VARCHAR(64) NULL"),
+    ("locked_until", "DATETIME NULL"),
+    ("attempts", "INT NOT NULL DEFAULT 0"),
+    ("max_attempts", "INT NOT NULL DEFAULT 7"),
+    ("priority", "INT NOT NULL DEFAULT 100"),
+    ("last_error", "TEXT NULL"),
+    ("expires_at", "DATETIME NULL"),
+    ("next_retry_at", "DATETIME NULL"),
+    ("correlation_id", "VARCHAR(64) NULL"),
+    ("created_by_user_id", "BIGINT UNSIGNED NULL"),
+    ("updated_at", "DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"),
+)
+
+INDEXES = (
+    # server.js used to create this on (status, available_at) only; the
+    # claim query itself walks idx_claim (migration 0008)
+    ("idx_status_available", ("status", "available_at", "priority", "id")),
+    ("idx_status_retry", ("status", "next_retry_at")),
+    ("idx_locked_by", ("locked_by",)),
+    ("idx_locked_until", ("locked_until",)),
+    ("idx_correlation", ("correlation_id",)),
+    ("idx_event_type", ("event_type",)),
+    ("idx_created_at", ("created_at",)),
+)
+
+
+def up(conn):
+    execute(conn, CREATE)
+    for column, definition in COLUMNS:
+        add_column(conn, "agent_events", column, definition)
+    extend_enum(
+        conn,
+        "agent_events",
+        "status",
+        ("NEW", "PENDING", "PROCESSING", "DONE", "FAILED", "DEAD"),
+        "NOT NULL DEFAULT 'NEW'",
+    )
+    for name, columns in INDEXES:
+        ensure_index(conn, "agent_events", name, columns)
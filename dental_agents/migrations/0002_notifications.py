@@ -0,0 +1,74 @@
+"""notifications: the columns and indexes server.js used to ALTER in on boot."""
+from dental_agents.migrate import add_column, ensure_index, execute, extend_enum
+
+CREATE = """
+    CREATE TABLE IF NOT EXISTS notifications (
+      id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+      user_id BIGINT UNSIGNED NULL,
+      user_role VARCHAR(16) NULL,
+      channel ENUM('IN_APP','EMAIL','SMS','WHATSAPP','CALL') NOT NULL DEFAULT 'IN_APP',
+      type VARCHAR(64) NULL,
+      title VARCHAR(200) NULL,
+      message TEXT NOT NULL,
+      status ENUM('NEW','PENDING','SENT','FAILED','READ') NOT NULL DEFAULT 'NEW',
+      scheduled_at DATETIME NULL,
+      read_at DATETIME NULL,
+      priority INT NOT NULL DEFAULT 100,
+      related_entity_type VARCHAR(40) NULL,
+      related_entity_id BIGINT NULL,
+      template_key VARCHAR(64) NULL,
+      template_vars_json LONGTEXT NULL,
+      meta_json LONGTEXT NULL,
+      created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      sent_at DATETIME NULL,
+      updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+      PRIMARY KEY (id),
+      KEY idx_user (user_id),
+      KEY idx_role (user_role),
+      KEY idx_status (status),
+      KEY idx_type (type),
+      KEY idx_scheduled (scheduled_at),
+      KEY idx_created_at (created_at)
+    ) ENGINE=InnoDB
+"""
+
+COLUMNS = (
+    ("user_role", "VARCHAR(16) NULL"),
+    ("type", "VARCHAR(64) NULL"),
+    ("title", "VARCHAR(200) NULL"),
+    ("scheduled_at", "DATETIME NULL"),
+    ("read_at", "DATETIME NULL"),
+    ("priority", "INT NOT NULL DEFAULT 100"),
+    ("related_entity_type", "VARCHAR(40) NULL"),
+    ("related_entity_id", "BIGINT NULL"),
+    ("template_key", "VARCHAR(64) NULL"),
+    ("template_vars_json", "LONGTEXT NULL"),
+    ("meta_json", "LONGTEXT NULL"),
+    ("sent_at", "DATETIME NULL"),
+    ("updated_at", "DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"),
+)
+
+INDEXES = (
+    ("idx_user", ("user_id",)),
+    ("idx_role", ("user_role",)),
+    ("idx_status", ("status",)),
+    ("idx_type", ("type",)),
+    # server.js called this one idx_scheduled_at; either name satisfies it
+    ("idx_scheduled", ("scheduled_at",)),
+    ("idx_created_at", ("created_at",)),
+)
+
+
+def up(conn):
+    execute(conn, CREATE)
+    for column, definition in COLUMNS:
+        add_column(conn, "notifications", column, definition)
+    extend_enum(
+        conn,
+        "notifications",
+        "status",
+        ("NEW", "PENDING", "SENT", "FAILED", "READ"),
+        "NOT NULL DEFAULT 'NEW'",
+    )
+    for name, columns in INDEXES:
+        ensure_index(conn, "notifications", name, columns)
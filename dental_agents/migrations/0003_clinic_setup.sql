@@ -0,0 +1,55 @@
+-- Tables server.js created on every boot (ensureClinicSetupSchema,
+-- ensureCaseAttachmentsSchema), plus the password-reset columns.
+
+CREATE TABLE IF NOT EXISTS clinic_settings (
+  id TINYINT NOT NULL,
+  clinic_name VARCHAR(120) NULL,
+  clinic_phone VARCHAR(40) NULL,
+  clinic_email VARCHAR(190) NULL,
+  clinic_address TEXT NULL,
+  timezone VARCHAR(64) NOT NULL DEFAULT 'Asia/Kolkata',
+  working_hours_json LONGTEXT NULL,
+  treatment_catalog_json LONGTEXT NULL,
+  note_templates_json LONGTEXT NULL,
+  ai_preferences_json LONGTEXT NULL,
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (id)
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO clinic_settings (id, timezone) VALUES (1, 'Asia/Kolkata');
+
+CREATE TABLE IF NOT EXISTS role_permissions (
+  role ENUM('Admin','Doctor','Assistant','Patient') NOT NULL,
+  permissions_json LONGTEXT NULL,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (role)
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO role_permissions (role, permissions_json) VALUES
+  ('Admin', '{"admin_all":true}'),
+  ('Doctor', '{"doctor_portal":true,"cases":true,"appointments":true}'),
+  ('Assistant', '{"assistant_portal":true,"inventory":true,"appointments":true}'),
+  ('Patient', '{"patient_portal":true,"appointments":true,"billing":true}');
+
+CREATE TABLE IF NOT EXISTS patient_profiles (
+  user_id BIGINT UNSIGNED NOT NULL,
+  medical_history TEXT NULL,
+  allergies TEXT NULL,
+  notes TEXT NULL,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (user_id)
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS case_attachments (
+  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  case_id BIGINT NOT NULL,
+  file_name VARCHAR(255) NOT NULL,
+  file_path TEXT NOT NULL,
+  mime_type VARCHAR(120) NULL,
+  uploaded_by_user_id BIGINT NULL,
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (id),
+  KEY idx_case (case_id),
+  KEY idx_created_at (created_at)
+) ENGINE=InnoDB;
@@ -0,0 +1,7 @@
+"""users.reset_code / reset_expires for forgot-password."""
+from dental_agents.migrate import add_column
+
+
+def up(conn):
+    add_column(conn, "users", "reset_code", "VARCHAR(12) NULL")
+    add_column(conn, "users", "reset_expires", "DATETIME NULL")
@@ -0,0 +1,8 @@
+-- Exactly-once markers, see dental_agents/idempotency.py.
+
+CREATE TABLE IF NOT EXISTS agent_handler_runs (
+  event_id BIGINT UNSIGNED NOT NULL,
+  handler VARCHAR(128) NOT NULL,
+  completed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (event_id, handler)
+) ENGINE=InnoDB;
@@ -0,0 +1,6 @@
+"""appointments.updated_at index for the schedule index's delta sync (schedule.py)."""
+from dental_agents.migrate import ensure_index
+
+
+def up(conn):
+    ensure_index(conn, "appointments", "idx_appt_updated", ("updated_at",))
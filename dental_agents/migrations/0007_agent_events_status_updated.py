@@ -0,0 +1,6 @@
+"""agent_events (status, updated_at) index for archive.py's retention scan."""
+from dental_agents.migrate import ensure_index
+
+
+def up(conn):
+    ensure_index(conn, "agent_events", "idx_status_updated", ("status", "updated_at"))
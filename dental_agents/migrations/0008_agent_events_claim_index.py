@@ -0,0 +1,6 @@
+"""agent_events (status, priority, available_at) index that the claim query walks in order (queue.py)."""
+from dental_agents.migrate import ensure_index
+
+
+def up(conn):
+    ensure_index(conn, "agent_events", "idx_claim", ("status", "priority", "available_at"))
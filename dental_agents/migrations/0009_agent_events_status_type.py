@@ -0,0 +1,6 @@
+"""agent_events (status, event_type) index, covering the metrics queue-depth sample (metrics.py)."""
+from dental_agents.migrate import ensure_index
+
+
+def up(conn):
+    ensure_index(conn, "agent_events", "idx_status_type", ("status", "event_type"))
@@ -0,0 +1,286 @@
+"""Operatory (room) assignment for a day's appointments.
+
+    python -m dental_agents.operatories --date 2026-10-20 --days 7 --dry-run
+
+``appointments.operatory_id`` used to be filled only when the front desk
+picked a room. ``solve`` fills in the appointments of a day that have none,
+with the interval-graph colouring greedy: appointments in start order, each
+into a room that is free for its whole interval (a bitmap AND, see
+schedule.py). In start order any free choice uses no more rooms than the
+peak overlap, so the choice is spent on preferences:
+
+1. the room the same doctor used for the previous appointment that day,
+2. the doctor's usual room (most used over ``PREFERENCE_DAYS``),
+3. the room whose last booking ends closest before the start (keeps
+   rooms packed and leaves whole rooms free for long procedures).
+
+A room that is already set -- by the front desk or an earlier run -- is
+never changed, and checked-in, completed and already-started appointments
+are left alone. The day is read without locks; the one ``UPDATE ... CASE``
+only writes rows whose ``operatory_id`` is still NULL, so a room chosen in
+the meantime wins. Two assigners working on the same day at once can still
+pick the same free room; the booking-time overlap check in server.js
+reports that like any other double booking.
+
+With ``AGENT_ASSIGN_OPERATORIES=1`` the AppointmentCreated handler runs this
+for the booking's day; it is off by default.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from . import schedule
+from .db import in_clause
+
+log = logging.getLogger("dental_agents.operatories")
+
+ENABLED = os.getenv("AGENT_ASSIGN_OPERATORIES", "0").lower() in ("1", "true", "yes")
+PINNED_STATUSES = ("Checked in", "In progress", "Completed")
+PREFERENCE_DAYS = 90
+PREFERENCE_TTL = 3600.0
+
+
+@dataclass(frozen=True)
+class Booking:
+    id: int
+    doctor_id: int
+    start_min: int
+    end_min: int
+    operatory_id: int | None
+    # keeps its current room (or stays without one)
+    pinned: bool = False
+
+
+# -- solver --------------------------------------------------------------------
+
+
+def _place(
+    booking: Booking,
+    masks: dict[int, int],
+    rooms: tuple[int, ...],
+    last_room: dict[int, int],
+    preferred: dict[int, int],
+) -> int | None:
+    want = schedule.span(booking.start_min, booking.end_min)
+    free = [r for r in rooms if not masks[r] & want]
+    if not free:
+        return None
+    for choice in (last_room.get(booking.doctor_id), preferred.get(booking.doctor_id)):
+        if choice in free:
+            return choice
+    before = (1 << (booking.start_min // schedule.CELL_MINUTES)) - 1
+    # latest-ending earlier booking wins; ties go to the lowest room id
+    return max(free, key=lambda r: ((masks[r] & before).bit_length(), -r))
+
+
+def _greedy(
+    bookings: list[Booking], rooms: tuple[int, ...], fixed: dict[int, int], preferred: dict[int, int]
+) -> tuple[dict[int, int], list[int]]:
+    """Place the unpinned ``bookings`` around the ``fixed`` ones; returns (placed, unplaced ids)."""
+    masks = {r: 0 for r in rooms}
+    by_id = {b.id: b for b in bookings}
+    for booking_id, room in fixed.items():
+        b = by_id[booking_id]
+        masks[room] |= schedule.span(b.start_min, b.end_min)
+    placed = dict(fixed)
+    unplaced = []
+    last_room: dict[int, int] = {}
+    for b in sorted(bookings, key=lambda b: (b.start_min, b.end_min, b.id)):
+        if b.pinned:
+            if b.id in fixed:
+                last_room[b.doctor_id] = fixed[b.id]
+            continue
+        room = _place(b, masks, rooms, last_room, preferred)
+        if room is None:
+            unplaced.append(b.id)
+            continue
+        masks[room] |= schedule.span(b.start_min, b.end_min)
+        placed[b.id] = room
+        last_room[b.doctor_id] = room
+    return placed, unplaced
+
+
+def solve(
+    bookings: list[Booking], rooms, preferred: dict[int, int] | None = None
+) -> tuple[dict[int, int | None], list[int]]:
+    """Room per booking id for one day, and the unpinned ids that fit nowhere.
+
+    Pinned bookings keep their room (colliding or not); unplaceable ones
+    stay without a room and the caller logs them.
+    """
+    rooms = tuple(sorted(set(rooms)))
+    if not rooms:
+        return {b.id: b.operatory_id for b in bookings}, []
+    fixed = {b.id: b.operatory_id for b in bookings if b.pinned and b.operatory_id in rooms}
+    placed, unplaced = _greedy(bookings, rooms, fixed, preferred or {})
+    out: dict[int, int | None] = {b.id: placed.get(b.id, b.operatory_id) for b in bookings}
+    return out, unplaced
+
+
+# -- database ------------------------------------------------------------------
+
+DAY_SQL = """
+    SELECT id, doctor_id, operatory_id, scheduled_time, scheduled_end_time, predicted_duration_min, status
+    FROM appointments
+    WHERE scheduled_date = %s AND status NOT IN ('Cancelled')
+"""
+
+PREFERENCE_SQL = """
+    SELECT doctor_id, operatory_id, COUNT(*) AS n
+    FROM appointments
+    WHERE operatory_id IS NOT NULL
+      AND scheduled_date >= CURDATE() - INTERVAL %s DAY
+      AND status NOT IN ('Cancelled')
+    GROUP BY doctor_id, operatory_id
+"""
+
+_preferences: dict[int, int] = {}
+_preferences_at = 0.0
+_preferences_lock = threading.Lock()
+
+
+def preferred_rooms(conn) -> dict[int, int]:
+    """doctor_id -> most used room, refreshed every ``PREFERENCE_TTL`` seconds."""
+    global _preferences, _preferences_at
+    with _preferences_lock:
+        if time.monotonic() - _preferences_at < PREFERENCE_TTL:
+            return _preferences
+    cur = conn.cursor()
+    try:
+        cur.execute(PREFERENCE_SQL, (PREFERENCE_DAYS,))
+        best: dict[int, tuple[int, int]] = {}
+        for doctor_id, room, n in cur.fetchall():
+            if doctor_id not in best or (n, -room) > (best[doctor_id][1], -best[doctor_id][0]):
+                best[doctor_id] = (room, n)
+    finally:
+        cur.close()
+    with _preferences_lock:
+        _preferences = {d: room for d, (room, _n) in best.items()}
+        _preferences_at = time.monotonic()
+        return _preferences
+
+
+def active_rooms(conn) -> tuple[int, ...]:
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT id FROM operatories WHERE is_active = 1")
+        return tuple(r[0] for r in cur.fetchall())
+    finally:
+        cur.close()
+
+
+def load_day(conn, day: date, now: datetime | None = None) -> list[Booking]:
+    """The day's bookings; only those without a room and not yet started are unpinned."""
+    now = now or datetime.now()
+    cur = conn.cursor()
+    try:
+        cur.execute(DAY_SQL, (day,))
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+    out = []
+    for appointment_id, doctor_id, room, start, end, predicted, status in rows:
+        if start is None:
+            continue
+        start_min = schedule.parse_clock(start)
+        end_min = schedule.parse_clock(end) if end is not None else start_min + (
+            int(predicted or 0) or schedule.DEFAULT_DURATION_MIN
+        )
+        started = day < now.date() or (day == now.date() and start_min <= now.hour * 60 + now.minute)
+        out.append(
+            Booking(
+                appointment_id,
+                doctor_id,
+                start_min,
+                max(end_min, start_min + schedule.CELL_MINUTES),
+                room,
+                pinned=room is not None or status in PINNED_STATUSES or started,
+            )
+        )
+    return out
+
+
+def write_changes(conn, changes: dict[int, int | None]) -> int:
+    """Set the rooms in one UPDATE, skipping rows that got a room meanwhile."""
+    if not changes:
+        return 0
+    ids = list(changes)
+    cases = " ".join("WHEN %s THEN %s" for _ in ids)
+    params: list = []
+    for appointment_id in ids:
+        params.extend((appointment_id, changes[appointment_id]))
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            UPDATE appointments SET operatory_id = CASE id {cases} END
+            WHERE id IN ({in_clause(ids)}) AND operatory_id IS NULL
+            """,
+            (*params, *ids),
+        )
+        return cur.rowcount
+    finally:
+        cur.close()
+
+
+def assign_day(conn, day: date, dry_run: bool = False) -> dict[int, int | None]:
+    """Give ``day``'s appointments without a room one (in the caller's transaction)."""
+    bookings = load_day(conn, day)
+    if all(b.pinned for b in bookings):
+        return {}
+    rooms = active_rooms(conn)
+    if not rooms:
+        return {}
+    result, unplaced = solve(bookings, rooms, preferred_rooms(conn))
+    changes = {b.id: result[b.id] for b in bookings if result[b.id] != b.operatory_id}
+    if unplaced:
+        log.warning("%s: no free room for %s appointments: %s", day, len(unplaced), unplaced)
+    if changes and not dry_run:
+        written = write_changes(conn, changes)
+        log.info("%s: assigned rooms for %s of %s appointments", day, written, len(changes))
+    return changes
+
+
+# -- CLI -----------------------------------------------------------------------
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m dental_agents.operatories")
+    p.add_argument("--date", default=date.today().isoformat(), help="first day (YYYY-MM-DD), default today")
+    p.add_argument("--days", type=int, default=1)
+    p.add_argument("--dry-run", action="store_true", help="print the changes without writing them")
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    from . import db
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    args = parse_args(argv)
+    first = date.fromisoformat(args.date)
+    conn = db.connect_unpooled()
+    try:
+        for offset in range(max(1, args.days)):
+            day = first + timedelta(days=offset)
+            changes = assign_day(conn, day, dry_run=args.dry_run)
+            if args.dry_run:
+                conn.rollback()
+                for appointment_id, room in sorted(changes.items()):
+                    print(f"{day} appointment {appointment_id} -> operatory {room}")
+            else:
+                conn.commit()
+            print(f"{day}: {len(changes)} change(s)")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""``--profile``: per-event handler profiling and slow-event capture.
+
+With profiling on, every handler call is timed and every SQL statement it
+runs is timed through the ``db`` cursor proxy. Events slower than
+``profile_slow_ms`` are written to ``profile_dir`` as
+``<id>-<event_type>.json`` (payload, attempts, wall time, SQL statements
+grouped by text, slowest first).
+
+A fraction ``profile_rate`` of events additionally runs under a profiler,
+and when such an event is slow its profile is written next to the JSON:
+
+* ``cprofile`` -- ``<id>-<event_type>.pstats`` (snakeviz, flameprof,
+  ``python -m pstats``). cProfile can only be active on one thread at a
+  time, so concurrent events skip it.
+* ``sample`` -- ``<id>-<event_type>.folded``, collapsed stacks from a
+  thread that samples the handler's stack every ``SAMPLE_INTERVAL`` seconds;
+  feed it to flamegraph.pl or speedscope. Overhead does not depend on how
+  many Python calls the handler makes, so this is the mode to leave on in
+  production with a low rate.
+
+Async handlers under ``--engine asyncio`` interleave with other events on the
+loop thread and run their SQL on pool threads, so for them only the wall
+time and payload are captured.
+"""
+from __future__ import annotations
+
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from . import metrics
+
+log = logging.getLogger("dental_agents.profiling")
+
+MODES = ("off", "cprofile", "sample")
+SAMPLE_INTERVAL = 0.005
+MAX_SQL_RECORDS = 5000
+SQL_TEXT_LIMIT = 300
+
+_local = threading.local()
+_cprofile_lock = threading.Lock()
+_settings: "Settings | None" = None
+
+
+class Settings:
+    def __init__(self, mode: str, rate: float, slow_ms: float, out_dir: str):
+        self.mode = mode
+        self.rate = min(1.0, max(0.0, rate))
+        self.slow_seconds = slow_ms / 1000.0
+        self.out_dir = out_dir
+
+
+def configure(mode: str, rate: float, slow_ms: float, out_dir: str) -> None:
+    """Turn profiling on for this process (``mode="off"`` turns it off)."""
+    global _settings
+    if mode not in MODES:
+        raise ValueError(f"profile mode must be one of {', '.join(MODES)}, got {mode!r}")
+    _settings = Settings(mode, rate, slow_ms, out_dir) if mode != "off" else None
+    if _settings is not None:
+        log.info("profiling %s: rate=%s, slow>=%sms, dir=%s", mode, _settings.rate, slow_ms, out_dir)
+
+
+# -- SQL timing (called from db.CountingCursor) ------------------------------
+
+
+def sql_trace() -> list | None:
+    """Statement log of the event profiled on this thread, if any."""
+    return getattr(_local, "sql", None)
+
+
+def record_sql(trace: list, statement, seconds: float) -> None:
+    if len(trace) < MAX_SQL_RECORDS:
+        trace.append((statement, seconds))
+
+
+def _normalize(statement) -> str:
+    if isinstance(statement, (bytes, bytearray)):
+        statement = statement.decode("utf-8", "replace")
+    return re.sub(r"\s+", " ", str(statement)).strip()[:SQL_TEXT_LIMIT]
+
+
+def summarize_sql(trace: list) -> list[dict]:
+    grouped: dict[str, list[float]] = {}
+    for statement, seconds in trace:
+        grouped.setdefault(_normalize(statement), []).append(seconds)
+    rows = [
+        {"sql": sql, "count": len(times), "total_ms": round(sum(times) * 1000, 3), "max_ms": round(max(times) * 1000, 3)}
+        for sql, times in grouped.items()
+    ]
+    rows.sort(key=lambda r: r["total_ms"], reverse=True)
+    return rows
+
+
+# -- sampling profiler -------------------------------------------------------
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """Samples one thread's Python stack into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._halt = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="agent-profile-sampler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._halt.set()
+        self._thread.join()
+
+    def _loop(self) -> None:
+        while not self._halt.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+# -- per-event wrapper -------------------------------------------------------
+
+
+@contextmanager
+def profile_event(ev, sql: bool = True):
+    """Time (and maybe profile) the handler call for ``ev``.
+
+    ``sql=False`` is for async handlers whose statements run elsewhere; it
+    also skips the profiler, which would mix in other events' frames.
+    """
+    settings = _settings
+    if settings is None:
+        yield
+        return
+    profiler = sampler = None
+    if sql and random.random() < settings.rate:
+        if settings.mode == "cprofile" and _cprofile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+        elif settings.mode == "sample":
+            sampler = StackSampler(threading.get_ident()).start()
+    trace: list | None = [] if sql else None
+    _local.sql = trace
+    started = time.perf_counter()
+    if profiler is not None:
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler (coverage, a debugger) owns the hook
+            _cprofile_lock.release()
+            profiler = None
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _cprofile_lock.release()
+        if sampler is not None:
+            sampler.stop()
+        elapsed = time.perf_counter() - started
+        _local.sql = None
+        if elapsed >= settings.slow_seconds:
+            metrics.SLOW_EVENTS.inc(ev.event_type)
+            try:
+                _dump(settings, ev, elapsed, trace, profiler, sampler)
+            except OSError as e:
+                log.error("could not write profile for event %s: %s", ev.id, e)
+
+
+def _dump(settings: Settings, ev, elapsed: float, trace, profiler, sampler) -> None:
+    os.makedirs(settings.out_dir, exist_ok=True)
+    stem = os.path.join(settings.out_dir, f"{ev.id}-{re.sub(r'[^A-Za-z0-9_.-]', '_', ev.event_type)}")
+    profile_path = None
+    if profiler is not None:
+        profile_path = stem + ".pstats"
+        profiler.dump_stats(profile_path)
+    elif sampler is not None:
+        profile_path = stem + ".folded"
+        with open(profile_path, "w", encoding="utf-8") as f:
+            f.write(sampler.folded())
+    try:
+        payload = ev.payload
+    except ValueError:
+        payload = ev.raw_payload
+    sql_rows = summarize_sql(trace) if trace is not None else None
+    sql_ms = sum(s for _, s in trace) * 1000 if trace else 0.0
+    report = {
+        "event_id": ev.id,
+        "event_type": ev.event_type,
+        "coalesced_ids": list(ev.coalesced_ids),
+        "attempts": ev.attempts,
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "sql_statements": len(trace) if trace is not None else None,
+        "sql_ms": round(sql_ms, 3),
+        "profile": profile_path,
+        "sql": sql_rows,
+        "payload": payload,
+    }
+    with open(stem + ".json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    log.warning(
+        "slow event %s (%s): %.0fms, %s SQL statements in %.0fms; see %s.json",
+        ev.id,
+        ev.event_type,
+        elapsed * 1000,
+        report["sql_statements"] if trace is not None else "?",
+        sql_ms,
+        stem,
+    )
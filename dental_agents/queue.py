@@ -0,0 +1,280 @@
+"""Claiming and completing rows of the ``agent_events`` outbox.
+
+server.js inserts with status ``PENDING`` (``enqueueEventDb``) while
+schema_query.sql defaults to ``NEW``; both count as ready.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any
+
+from . import events
+from .db import in_clause
+
+log = logging.getLogger(__name__)
+
+READY_STATUSES = ("NEW", "PENDING")
+
+# One probe per ready status, each an ordered walk of idx_claim (status,
+# priority, available_at, id): status is a constant, so the index supplies
+# the ORDER BY and the scan stops after LIMIT matching rows -- no filesort of
+# the whole ready set, and FOR UPDATE locks only the rows walked (the LIMIT
+# rows plus any passed over by the other filters) rather than every ready
+# row. SKIP LOCKED then lets concurrent workers each lease a disjoint batch.
+CLAIM_SQL = """
+    SELECT id, event_type, payload_json, attempts, max_attempts, priority, available_at
+    FROM agent_events
+    WHERE status = %s
+      AND available_at <= NOW()
+      {type_filter}
+      {order_gate}
+    ORDER BY priority ASC, available_at ASC, id ASC
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+# Ordered mode (--ordered): a row is claimable only while no earlier row with
+# the same correlation_id is unfinished, so per-entity events run in id order
+# across every worker and lane while different entities run in parallel.
+# FAILED rows waiting for a scheduled retry still hold their place in line.
+# The subquery is a plain consistent read on idx_correlation.
+ORDER_GATE_SQL = """
+      AND (agent_events.correlation_id IS NULL OR NOT EXISTS (
+        SELECT 1 FROM agent_events AS prior
+        WHERE prior.correlation_id = agent_events.correlation_id
+          AND prior.id < agent_events.id
+          {prior_filter}
+          AND (prior.status IN ('NEW', 'PENDING', 'PROCESSING')
+               OR (prior.status = 'FAILED' AND prior.next_retry_at IS NOT NULL))
+      ))
+"""
+
+
+def order_gate(
+    ordered: bool, other_types_only: bool = False, event_types: tuple[str, ...] | None = None
+) -> tuple[str, tuple]:
+    """SQL and params for the ordered-mode gate (empty when not ``ordered``).
+
+    With ``event_types`` only earlier rows of those types hold a place in
+    line; rows no worker handles would otherwise block their entity forever.
+    """
+    if not ordered:
+        return "", ()
+    prior_filter = "AND prior.event_type <> agent_events.event_type" if other_types_only else ""
+    params: tuple = ()
+    if event_types is not None:
+        prior_filter += f" AND prior.event_type IN ({in_clause(event_types)})"
+        params = tuple(event_types)
+    return ORDER_GATE_SQL.format(prior_filter=prior_filter), params
+
+
+@dataclass(frozen=True)
+class ClaimSlice:
+    """Part of a claim restricted to (or excluding) some event types."""
+
+    limit: int
+    event_types: tuple[str, ...] = ()
+    exclude_types: tuple[str, ...] = ()
+
+    def sql(
+        self, status: str, ordered: bool = False, handled: tuple[str, ...] | None = None
+    ) -> tuple[str, tuple]:
+        """The probe for one ready ``status``; ``handled``: the event types
+        this worker has handlers for (None: any)."""
+        if self.event_types:
+            type_filter = f"AND event_type IN ({in_clause(self.event_types)})"
+            params = self.event_types
+        elif self.exclude_types:
+            type_filter = f"AND event_type NOT IN ({in_clause(self.exclude_types)})"
+            params = self.exclude_types
+        else:
+            type_filter, params = "", ()
+        if handled is not None:
+            type_filter += f" AND event_type IN ({in_clause(handled)})"
+            params = (*params, *handled)
+        gate, gate_params = order_gate(ordered, event_types=handled)
+        sql = CLAIM_SQL.format(type_filter=type_filter, order_gate=gate)
+        return sql, (status, *params, *gate_params, int(self.limit))
+
+    def can_match(self, handled: tuple[str, ...] | None) -> bool:
+        if handled is None or not self.event_types:
+            return True
+        return not set(self.event_types).isdisjoint(handled)
+
+
+@dataclass
+class Event:
+    id: int
+    event_type: str
+    raw_payload: str | bytes | None = None
+    attempts: int = 0
+    max_attempts: int = 7
+    priority: int = 100
+    # other rows folded into this one by coalesce.py; completed together
+    coalesced_ids: list[int] = field(default_factory=list)
+    # for a coalesced event: every member, oldest first (see payload)
+    merged: list["Event"] = field(default_factory=list, repr=False)
+    _payload: dict[str, Any] | None = field(default=None, repr=False)
+    _model: Any = field(default=None, repr=False)
+
+    @property
+    def all_ids(self) -> list[int]:
+        return [self.id, *self.coalesced_ids]
+
+    @property
+    def payload(self) -> dict[str, Any]:
+        """Decoded ``payload_json``, parsed on first access.
+
+        For a coalesced event the members' payloads are overlaid oldest to
+        newest (later fields win, an earlier ``stage`` survives) and each
+        member is listed under ``__triggers``.
+        """
+        if self._payload is None:
+            if self.merged:
+                merged: dict[str, Any] = {}
+                for ev in self.merged:
+                    merged.update(ev.payload)
+                merged["__triggers"] = [{"eventId": ev.id, **ev.payload} for ev in self.merged]
+                self._payload = merged
+            else:
+                self._payload = decode_payload(self.raw_payload)
+        return self._payload
+
+    def validate(self) -> None:
+        """Decode the payload model (events.py); raises ``events.PayloadError``.
+
+        The worker calls this right after claiming, so an invalid payload is
+        marked DEAD before any handler runs.
+        """
+        if self._model is None:
+            self._model = events.decode(self.event_type, self.payload)
+
+    @property
+    def model(self):
+        """Validated model from events.py (None for types without one)."""
+        self.validate()
+        return self._model
+
+
+def decode_payload(raw) -> dict[str, Any]:
+    if raw is None or raw == "":
+        return {}
+    try:
+        data = events.loads(raw)
+    except ValueError:
+        log.warning("agent_events payload is not valid JSON; using empty payload")
+        return {}
+    return data if isinstance(data, dict) else {"value": data}
+
+
+def claim_batch(
+    conn,
+    worker_id: str,
+    limit: int,
+    lease_seconds: int,
+    slices: list[ClaimSlice] | None = None,
+    ordered: bool = False,
+    event_types: tuple[str, ...] | None = None,
+) -> list[Event]:
+    """Lease up to ``limit`` ready events in one transaction.
+
+    With ``slices`` (see lanes.py) each slice is selected separately but all
+    rows are leased by the same UPDATE and commit; ``limit`` is then ignored.
+    Each slice probes every ready status and keeps its best ``limit`` rows;
+    rows a probe locked but the merge dropped are released at commit.
+    ``ordered`` applies the per-correlation_id gate (``ORDER_GATE_SQL``).
+    ``event_types`` restricts the claim to types with a handler, so rows for
+    handlers that are not deployed yet stay queued for a worker that has them.
+    """
+    if slices is None:
+        slices = [ClaimSlice(limit)]
+    if event_types is not None and not event_types:
+        return []
+    cur = conn.cursor()
+    try:
+        conn.start_transaction()
+        rows = []
+        for sl in slices:
+            if sl.limit <= 0 or not sl.can_match(event_types):
+                continue
+            found = []
+            for status in READY_STATUSES:
+                sql, params = sl.sql(status, ordered, event_types)
+                cur.execute(sql, params)
+                found.extend(cur.fetchall())
+            # (priority, available_at, id), the probes' own order
+            found.sort(key=lambda r: (r[5], r[6], r[0]))
+            rows.extend(found[: sl.limit])
+        if not rows:
+            conn.commit()
+            return []
+        ids = [r[0] for r in rows]
+        cur.execute(
+            f"""
+            UPDATE agent_events
+            SET status = 'PROCESSING',
+                locked_by = %s,
+                locked_until = NOW() + INTERVAL %s SECOND,
+                attempts = attempts + 1
+            WHERE id IN ({in_clause(ids)})
+            """,
+            (worker_id, int(lease_seconds), *ids),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    return [
+        Event(
+            id=r[0],
+            event_type=r[1],
+            raw_payload=r[2],
+            attempts=r[3] + 1,
+            max_attempts=r[4],
+            priority=r[5],
+        )
+        for r in rows
+    ]
+
+
+# Completion and failure writes only touch rows this worker still holds. A
+# lease that expired mid-handler may have been reaped and re-claimed; the
+# late write must not mark the new owner's row or clear its lock.
+LEASE_GUARD = "AND locked_by = %s AND status = 'PROCESSING'"
+
+
+def report_lost(ids: list[int], updated: int, worker_id: str, what: str) -> None:
+    if updated < len(ids):
+        log.warning(
+            "%s: lease lost on %s of %s events (%s); left to their new owner",
+            worker_id,
+            len(ids) - updated,
+            len(ids),
+            what,
+        )
+
+
+def mark_done(conn, ids: list[int], worker_id: str) -> int:
+    """Mark ``ids`` DONE where ``worker_id`` still holds them; returns rows updated."""
+    if not ids:
+        return 0
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            UPDATE agent_events
+            SET status = 'DONE', locked_by = NULL, locked_until = NULL, last_error = NULL
+            WHERE id IN ({in_clause(ids)}) {LEASE_GUARD}
+            """,
+            (*ids, worker_id),
+        )
+        updated = cur.rowcount
+        conn.commit()
+    finally:
+        cur.close()
+    report_lost(ids, updated, worker_id, "DONE")
+    return updated
@@ -0,0 +1,184 @@
+"""Dead-letter inspection and bulk replay: ``python -m dental_agents.replay``.
+
+    python -m dental_agents.replay stats --status DEAD
+    python -m dental_agents.replay list --type CaseGenerateSummary --error timeout
+    python -m dental_agents.replay requeue --status DEAD --since 2026-10-01 --rate 50
+
+``requeue`` moves matching rows back to NEW with a fresh attempt budget, in
+chunks paced to ``--rate`` events/second, so replaying thousands of events
+after an outage neither saturates MySQL nor floods the SMTP server. It pings
+the workers' wake-up port after each chunk.
+"""
+from __future__ import annotations
+
+import argparse
+import socket
+import sys
+import time
+
+from . import db
+from .config import WorkerConfig
+from .db import in_clause
+from .wakeup import WAKE_HOST
+
+REPLAYABLE = ("FAILED", "DEAD")
+
+
+def build_filter(args) -> tuple[str, list]:
+    statuses = args.status or list(REPLAYABLE)
+    where = [f"status IN ({in_clause(statuses)})"]
+    params: list = list(statuses)
+    if args.type:
+        where.append(f"event_type IN ({in_clause(args.type)})")
+        params.extend(args.type)
+    if args.since:
+        where.append("created_at >= %s")
+        params.append(args.since)
+    if args.until:
+        where.append("created_at < %s")
+        params.append(args.until)
+    if args.error:
+        where.append("last_error LIKE %s")
+        params.append("%" + args.error.replace("\\", "\\\\").replace("%", r"\%").replace("_", r"\_") + "%")
+    if args.correlation_id:
+        where.append("correlation_id = %s")
+        params.append(args.correlation_id)
+    return " AND ".join(where), params
+
+
+def cmd_stats(conn, args) -> None:
+    where, params = build_filter(args)
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT status, event_type, LEFT(COALESCE(last_error, ''), 120) AS err,
+               COUNT(*), MIN(created_at), MAX(created_at)
+        FROM agent_events
+        WHERE {where}
+        GROUP BY status, event_type, err
+        ORDER BY COUNT(*) DESC
+        LIMIT %s
+        """,
+        (*params, args.limit),
+    )
+    rows = cur.fetchall()
+    cur.close()
+    if not rows:
+        print("no matching events")
+        return
+    for status, event_type, err, n, first, last in rows:
+        print(f"{n:>7}  {status:<6} {event_type:<22} {first} .. {last}  {err or '-'}")
+
+
+def cmd_list(conn, args) -> None:
+    where, params = build_filter(args)
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT id, status, event_type, attempts, max_attempts, created_at, LEFT(COALESCE(last_error, ''), 160)
+        FROM agent_events
+        WHERE {where}
+        ORDER BY id ASC
+        LIMIT %s
+        """,
+        (*params, args.limit),
+    )
+    for row in cur.fetchall():
+        event_id, status, event_type, attempts, max_attempts, created_at, err = row
+        print(f"{event_id:>10}  {status:<6} {event_type:<22} {attempts}/{max_attempts}  {created_at}  {err or '-'}")
+    cur.close()
+
+
+def _ping_workers(port: int) -> None:
+    if not port:
+        return
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(b"w", (WAKE_HOST, port))
+    except OSError:
+        pass
+
+
+def cmd_requeue(conn, args) -> None:
+    where, params = build_filter(args)
+    wake_port = WorkerConfig.from_env().wake_port
+    cur = conn.cursor()
+    last_id = 0
+    total = 0
+    started = time.monotonic()
+    try:
+        while args.max is None or total < args.max:
+            chunk = args.chunk if args.max is None else min(args.chunk, args.max - total)
+            cur.execute(
+                f"SELECT id FROM agent_events WHERE {where} AND id > %s ORDER BY id ASC LIMIT %s",
+                (*params, last_id, chunk),
+            )
+            ids = [r[0] for r in cur.fetchall()]
+            conn.commit()
+            if not ids:
+                break
+            last_id = ids[-1]
+            if args.dry_run:
+                total += len(ids)
+                continue
+            cur.execute(
+                f"""
+                UPDATE agent_events
+                SET status = 'NEW', available_at = NOW(), attempts = 0,
+                    next_retry_at = NULL, locked_by = NULL, locked_until = NULL
+                WHERE id IN ({in_clause(ids)})
+                  AND status IN ({in_clause(REPLAYABLE)})
+                """,
+                (*ids, *REPLAYABLE),
+            )
+            conn.commit()
+            total += cur.rowcount
+            _ping_workers(wake_port)
+            print(f"requeued {total} (up to id {last_id})", flush=True)
+            if args.rate > 0:
+                # pace so that total / elapsed stays at or below --rate
+                ahead = total / args.rate - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+    finally:
+        cur.close()
+    verb = "would requeue" if args.dry_run else "requeued"
+    print(f"{verb} {total} events")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m dental_agents.replay")
+    sub = p.add_subparsers(dest="command", required=True)
+    for name in ("stats", "list", "requeue"):
+        sp = sub.add_parser(name)
+        sp.add_argument("--status", action="append", choices=REPLAYABLE, help="default: FAILED and DEAD")
+        sp.add_argument("--type", action="append", help="event_type (repeatable)")
+        sp.add_argument("--since", help="created_at >= (YYYY-MM-DD[ HH:MM:SS])")
+        sp.add_argument("--until", help="created_at < (YYYY-MM-DD[ HH:MM:SS])")
+        sp.add_argument("--error", help="substring of last_error")
+        sp.add_argument("--correlation-id")
+        if name == "requeue":
+            sp.add_argument("--chunk", type=int, default=200, help="rows per UPDATE")
+            sp.add_argument("--rate", type=float, default=100.0, help="max events/second (0 = unpaced)")
+            sp.add_argument("--max", type=int, default=None, help="stop after this many events")
+            sp.add_argument("--dry-run", action="store_true")
+        else:
+            sp.add_argument("--limit", type=int, default=50)
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if getattr(args, "chunk", 1) < 1:
+        print("--chunk must be positive", file=sys.stderr)
+        return 2
+    conn = db.connect()
+    try:
+        {"stats": cmd_stats, "list": cmd_list, "requeue": cmd_requeue}[args.command](conn, args)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Retry scheduling for failed events.
+
+A failed event becomes FAILED with ``next_retry_at`` set by exponential
+backoff with jitter (per ``event_type``); once ``attempts`` reaches
+``max_attempts`` it becomes DEAD instead. The housekeeping thread
+(leases.py) promotes due FAILED rows back to NEW through
+``idx_status_retry (status, next_retry_at)``, so a transient SMTP or LLM
+outage is retried gradually instead of by a thundering herd.
+
+FAILED rows without ``next_retry_at`` (from older workers) are left for the
+admin "retry failed events" button.
+"""
+from __future__ import annotations
+
+import logging
+import random
+from dataclasses import dataclass
+
+from .db import in_clause
+from .queue import LEASE_GUARD, Event, report_lost
+
+log = logging.getLogger("dental_agents.retry")
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    base_seconds: float = 5.0
+    max_seconds: float = 900.0
+    factor: float = 2.0
+
+    def delay(self, attempt: int, rng: random.Random = random) -> float:
+        """Backoff before retry ``attempt`` (1-based), with equal jitter."""
+        ceiling = min(self.max_seconds, self.base_seconds * self.factor ** max(0, attempt - 1))
+        return ceiling / 2 + rng.uniform(0, ceiling / 2)
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+RETRY_POLICIES: dict[str, RetryPolicy] = {
+    # LLM calls: outages tend to last minutes, not seconds
+    "CaseGenerateSummary": RetryPolicy(base_seconds=30.0, max_seconds=3600.0),
+    "AgentRunRequested": RetryPolicy(base_seconds=60.0, max_seconds=3600.0),
+}
+
+# Served by idx_status_retry.
+PROMOTE_SQL = """
+    UPDATE agent_events
+    SET status = 'NEW',
+        available_at = NOW(),
+        next_retry_at = NULL
+    WHERE status = 'FAILED'
+      AND next_retry_at <= NOW()
+    ORDER BY next_retry_at ASC
+    LIMIT %s
+"""
+
+
+def policy_for(event_type: str) -> RetryPolicy:
+    return RETRY_POLICIES.get(event_type, DEFAULT_POLICY)
+
+
+def fail_event(conn, ev: Event, worker_id: str, error: str, permanent: bool = False) -> str:
+    """Record a handler failure for ``ev`` (and its coalesced rows).
+
+    ``permanent`` failures (e.g. an invalid payload) skip the retries.
+    Returns the new status, ``FAILED`` or ``DEAD``, or ``LOST`` if
+    ``worker_id`` no longer held any of the rows.
+    """
+    ids = ev.all_ids
+    cur = conn.cursor()
+    try:
+        if permanent or ev.attempts >= ev.max_attempts:
+            status = "DEAD"
+            cur.execute(
+                f"""
+                UPDATE agent_events
+                SET status = 'DEAD', locked_by = NULL, locked_until = NULL,
+                    next_retry_at = NULL, last_error = %s
+                WHERE id IN ({in_clause(ids)}) {LEASE_GUARD}
+                """,
+                (error[:4000], *ids, worker_id),
+            )
+        else:
+            status = "FAILED"
+            delay = policy_for(ev.event_type).delay(ev.attempts)
+            cur.execute(
+                f"""
+                UPDATE agent_events
+                SET status = 'FAILED', locked_by = NULL, locked_until = NULL,
+                    next_retry_at = NOW() + INTERVAL %s SECOND, last_error = %s
+                WHERE id IN ({in_clause(ids)}) {LEASE_GUARD}
+                """,
+                (int(round(delay)), error[:4000], *ids, worker_id),
+            )
+        updated = cur.rowcount
+        conn.commit()
+    finally:
+        cur.close()
+    report_lost(ids, updated, worker_id, status)
+    if not updated:
+        return "LOST"
+    if status == "DEAD":
+        log.error("event %s (%s) is DEAD after %s attempts", ev.id, ev.event_type, ev.attempts)
+    return status
+
+
+def promote_due_retries(conn, batch: int = 500, max_batches: int = 20) -> int:
+    total = 0
+    cur = conn.cursor()
+    try:
+        for _ in range(max_batches):
+            cur.execute(PROMOTE_SQL, (int(batch),))
+            n = cur.rowcount
+            conn.commit()
+            total += n
+            if n < batch:
+                break
+    finally:
+        cur.close()
+    if total:
+        log.info("requeued %s events for retry", total)
+    return total
@@ -0,0 +1,476 @@
+"""In-memory day schedules for slot suggestions and conflict checks.
+
+Every (doctor, date) and (operatory, date) in a rolling window of
+``AGENT_SCHEDULE_DAYS`` days from today has a ``DaySchedule``: the booked
+intervals by appointment id plus a bitmap of 5-minute cells (one Python
+int, bit ``i`` = minutes ``5*i .. 5*i+5``). An interval occupies every cell
+it touches, so 09:07-09:40 blocks 09:05-09:40 for slot searches.
+
+* a conflict check is one AND of the day's bitmap with the requested span;
+  only when the hit is in a partly covered cell at either end are the
+  day's intervals compared to the minute, so 09:00-09:32 does not clash
+  with a 09:33 start;
+* a slot search ANDs the free cells with themselves shifted ``log2(d)``
+  times (bit ``i`` survives iff cells ``i .. i+d-1`` are all free) and then
+  walks the surviving bits on the step grid, so it costs O(log d + slots)
+  bit operations instead of a query plus a scan of the day.
+
+The index is loaded once from ``appointments`` (``warm``), kept current by
+the appointment handlers (``refresh`` for the ids in each event), and
+re-read by ``sync`` for rows whose ``updated_at`` moved -- this catches
+changes made by other worker processes and by server.js without an event.
+Cancelled appointments are not indexed; a Completed one keeps its chair
+until ``actual_end_at`` when that is on the same day.
+
+``search`` answers "earliest N (doctor, operatory, start)" over many doctors,
+rooms and days at once. A start fits a (doctor, room) pair iff it fits the
+doctor and fits the room, so each doctor's and each room's fit bitmap is
+computed once per day and the pairs are a single AND.
+
+Lookups for a date outside the window return ``None`` so callers can fall
+back to SQL.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Iterable
+
+log = logging.getLogger("dental_agents.schedule")
+
+CELL_MINUTES = 5
+DEFAULT_DURATION_MIN = 30
+DEFAULT_STEP_MIN = 15
+INACTIVE_STATUSES = ("Cancelled",)
+WARM_FETCH = 5000
+
+COLUMNS = """
+    id, doctor_id, operatory_id, scheduled_date, scheduled_time, scheduled_end_time,
+    predicted_duration_min, status, actual_end_at
+"""
+
+
+def parse_clock(value) -> int:
+    """Minutes since midnight from ``"HH:MM[:SS]"``, ``time`` or ``timedelta`` (MySQL TIME)."""
+    if isinstance(value, timedelta):
+        return int(value.total_seconds() // 60)
+    if isinstance(value, (time, datetime)):
+        return value.hour * 60 + value.minute
+    parts = str(value).strip().split(":")
+    try:
+        return int(parts[0]) * 60 + (int(parts[1]) if len(parts) > 1 else 0)
+    except ValueError:
+        raise ValueError(f"not a time of day: {value!r}") from None
+
+
+def clock(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+def as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+# same defaults and variables as fallbackSuggestSlots in server.js
+CLINIC_OPEN_MIN = parse_clock(os.getenv("CLINIC_START", "09:00:00"))
+CLINIC_CLOSE_MIN = parse_clock(os.getenv("CLINIC_END", "18:00:00"))
+
+
+# -- bitmaps -------------------------------------------------------------------
+
+
+def span(start_min: int, end_min: int) -> int:
+    """Bitmap of the cells touched by ``[start_min, end_min)``."""
+    first = max(0, start_min) // CELL_MINUTES
+    last = -(-end_min // CELL_MINUTES)
+    return ((1 << (last - first)) - 1) << first if last > first else 0
+
+
+def whole_cells(start_min: int, end_min: int) -> int:
+    """Bitmap of the cells lying entirely inside ``[start_min, end_min)``."""
+    first = -(-max(0, start_min) // CELL_MINUTES)
+    last = end_min // CELL_MINUTES
+    return ((1 << (last - first)) - 1) << first if last > first else 0
+
+
+def runs_of(free: int, cells: int) -> int:
+    """Bit ``i`` set iff cells ``i .. i+cells-1`` are all set in ``free``."""
+    result, covered = free, 1
+    while covered < cells:
+        step = min(covered, cells - covered)
+        result &= result >> step
+        covered += step
+    return result
+
+
+def bits(mask: int):
+    """Indexes of the set bits, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+_grids: dict[tuple[int, int, int], int] = {}
+
+
+def grid(open_min: int, close_min: int, step_min: int) -> int:
+    """Cells on which a slot may start: ``open_min`` and every ``step_min`` after."""
+    key = (open_min, close_min, step_min)
+    mask = _grids.get(key)
+    if mask is None:
+        mask = 0
+        first = -(-open_min // CELL_MINUTES) * CELL_MINUTES
+        step = max(CELL_MINUTES, step_min // CELL_MINUTES * CELL_MINUTES)
+        for m in range(first, close_min, step):
+            mask |= 1 << (m // CELL_MINUTES)
+        _grids[key] = mask
+    return mask
+
+
+def free_starts(
+    busy: int,
+    duration_min: int,
+    open_min: int = CLINIC_OPEN_MIN,
+    close_min: int = CLINIC_CLOSE_MIN,
+    step_min: int = DEFAULT_STEP_MIN,
+) -> int:
+    """Bitmap of grid cells where ``duration_min`` fits between open and close."""
+    cells = max(1, -(-duration_min // CELL_MINUTES))
+    return runs_of(span(open_min, close_min) & ~busy, cells) & grid(open_min, close_min, step_min)
+
+
+@dataclass(frozen=True)
+class SlotOption:
+    day: date
+    start_min: int
+    doctor_id: int
+    operatory_id: int | None
+    duration_min: int
+
+
+class DaySchedule:
+    __slots__ = ("intervals", "mask")
+
+    def __init__(self):
+        self.intervals: dict[int, tuple[int, int]] = {}
+        self.mask = 0
+
+    def add(self, appointment_id: int, start_min: int, end_min: int) -> None:
+        self.intervals[appointment_id] = (start_min, end_min)
+        self.mask |= span(start_min, end_min)
+
+    def remove(self, appointment_id: int) -> None:
+        if self.intervals.pop(appointment_id, None) is None:
+            return
+        # intervals may overlap (double bookings), so rebuild rather than clear
+        mask = 0
+        for start, end in self.intervals.values():
+            mask |= span(start, end)
+        self.mask = mask
+
+    def overlaps(self, start_min: int, end_min: int, ignore_id: int | None = None) -> bool:
+        """Whether any interval (other than ``ignore_id``) overlaps ``[start_min, end_min)``."""
+        if not self.mask & span(start_min, end_min):
+            return False
+        ignoring = ignore_id is not None and ignore_id in self.intervals
+        # a booking touching a cell the request fully covers overlaps it for sure
+        if not ignoring and self.mask & whole_cells(start_min, end_min):
+            return True
+        return any(
+            start < end_min and end > start_min
+            for appointment_id, (start, end) in self.intervals.items()
+            if appointment_id != ignore_id
+        )
+
+    def busy(self, ignore_id: int | None = None) -> int:
+        if ignore_id is None or ignore_id not in self.intervals:
+            return self.mask
+        mask = 0
+        for appointment_id, (start, end) in self.intervals.items():
+            if appointment_id != ignore_id:
+                mask |= span(start, end)
+        return mask
+
+
+# -- index ---------------------------------------------------------------------
+
+
+class ScheduleIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.doctors: dict[tuple[int, date], DaySchedule] = {}
+        self.operatories: dict[tuple[int, date], DaySchedule] = {}
+        # appointment id -> (doctor_id, operatory_id, date), to move or drop it
+        self._where: dict[int, tuple[int, int | None, date]] = {}
+        self.first_day: date | None = None
+        self.last_day: date | None = None
+        # server time of the last sync; rows updated since are re-read
+        self.synced_to: datetime | None = None
+        # search candidates when the caller names none (reloaded by warm_up)
+        self.doctor_ids: tuple[int, ...] = ()
+        self.operatory_ids: tuple[int, ...] = ()
+
+    @property
+    def warm(self) -> bool:
+        return self.first_day is not None
+
+    def covers(self, day: date) -> bool:
+        return self.first_day is not None and self.first_day <= day <= self.last_day
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    # updates
+
+    def _drop(self, appointment_id: int) -> None:
+        where = self._where.pop(appointment_id, None)
+        if where is None:
+            return
+        doctor_id, operatory_id, day = where
+        for table, key in ((self.doctors, (doctor_id, day)), (self.operatories, (operatory_id, day))):
+            sched = table.get(key)
+            if sched is not None:
+                sched.remove(appointment_id)
+                if not sched.intervals:
+                    del table[key]
+
+    def apply_row(self, row) -> None:
+        """Insert, move or drop one appointment (a ``COLUMNS`` row)."""
+        appointment_id, doctor_id, operatory_id, day, start, end, predicted, status, actual_end = row
+        day = as_date(day)
+        with self._lock:
+            self._drop(appointment_id)
+            if status in INACTIVE_STATUSES or not self.covers(day) or start is None:
+                return
+            start_min = parse_clock(start)
+            if end is not None:
+                end_min = parse_clock(end)
+            else:
+                end_min = start_min + (int(predicted or 0) or DEFAULT_DURATION_MIN)
+            if status == "Completed" and isinstance(actual_end, datetime) and actual_end.date() == day:
+                end_min = max(start_min + CELL_MINUTES, actual_end.hour * 60 + actual_end.minute)
+            if end_min <= start_min:
+                end_min = start_min + DEFAULT_DURATION_MIN
+            self._where[appointment_id] = (doctor_id, operatory_id, day)
+            self.doctors.setdefault((doctor_id, day), DaySchedule()).add(appointment_id, start_min, end_min)
+            if operatory_id is not None:
+                self.operatories.setdefault((operatory_id, day), DaySchedule()).add(appointment_id, start_min, end_min)
+
+    def remove(self, appointment_id: int) -> None:
+        with self._lock:
+            self._drop(appointment_id)
+
+    def refresh(self, conn, appointment_ids) -> None:
+        """Re-read the given appointments (called by the event handlers)."""
+        ids = [int(i) for i in appointment_ids if i is not None]
+        if not ids or not self.warm:
+            return
+        from .db import in_clause
+
+        cur = conn.cursor()
+        try:
+            cur.execute(f"SELECT {COLUMNS} FROM appointments WHERE id IN ({in_clause(ids)})", ids)
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+        found = set()
+        for row in rows:
+            found.add(row[0])
+            self.apply_row(row)
+        for missing in set(ids) - found:
+            self.remove(missing)
+
+    def warm_up(self, conn, days: int, today: date | None = None) -> None:
+        """(Re)load the window ``today .. today + days - 1`` from MySQL."""
+        today = today or date.today()
+        first, last = today, today + timedelta(days=max(1, days) - 1)
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT NOW()")
+            synced_to = cur.fetchone()[0]
+            cur.execute("SELECT id FROM users WHERE role = 'Doctor' ORDER BY id")
+            doctor_ids = tuple(r[0] for r in cur.fetchall())
+            cur.execute("SELECT id FROM operatories WHERE is_active = 1 ORDER BY id")
+            operatory_ids = tuple(r[0] for r in cur.fetchall())
+            cur.execute(
+                f"""
+                SELECT {COLUMNS} FROM appointments
+                WHERE scheduled_date BETWEEN %s AND %s
+                  AND status NOT IN ('Cancelled')
+                """,
+                (first, last),
+            )
+            fresh = ScheduleIndex()
+            fresh.first_day, fresh.last_day = first, last
+            while True:
+                rows = cur.fetchmany(WARM_FETCH)
+                if not rows:
+                    break
+                for row in rows:
+                    fresh.apply_row(row)
+        finally:
+            cur.close()
+        conn.rollback()
+        with self._lock:
+            self.doctors, self.operatories, self._where = fresh.doctors, fresh.operatories, fresh._where
+            self.first_day, self.last_day = first, last
+            self.synced_to = synced_to
+            self.doctor_ids, self.operatory_ids = doctor_ids, operatory_ids
+        log.info("schedule index warm: %s appointments, %s .. %s", len(fresh._where), first, last)
+
+    def sync(self, conn) -> int:
+        """Apply rows changed since the last sync; returns how many."""
+        if not self.warm:
+            return 0
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT NOW()")
+            synced_to = cur.fetchone()[0]
+            # >=: updated_at has whole seconds, re-reading a row is harmless
+            cur.execute(f"SELECT {COLUMNS} FROM appointments WHERE updated_at >= %s", (self.synced_to,))
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+        conn.rollback()
+        for row in rows:
+            self.apply_row(row)
+        self.synced_to = synced_to
+        return len(rows)
+
+    # lookups
+
+    def _busy(self, table, key, day: date, ignore_id: int | None) -> int:
+        sched = table.get((key, day))
+        return sched.busy(ignore_id) if sched is not None else 0
+
+    def _overlaps(self, table, key, day: date, start_min: int, end_min: int, ignore_id: int | None) -> bool:
+        sched = table.get((key, day))
+        return sched is not None and sched.overlaps(start_min, end_min, ignore_id)
+
+    def conflicts(
+        self,
+        doctor_id: int,
+        day: date,
+        start_min: int,
+        duration_min: int,
+        operatory_id: int | None = None,
+        ignore_id: int | None = None,
+    ) -> tuple[bool, bool] | None:
+        """``(doctor busy, operatory busy)`` for the interval, or None if not indexed."""
+        if not self.covers(day):
+            return None
+        end_min = start_min + duration_min
+        with self._lock:
+            doctor = self._overlaps(self.doctors, doctor_id, day, start_min, end_min, ignore_id)
+            room = operatory_id is not None and self._overlaps(
+                self.operatories, operatory_id, day, start_min, end_min, ignore_id
+            )
+        return doctor, room
+
+    def suggest(
+        self,
+        doctor_id: int,
+        day: date,
+        duration_min: int,
+        operatory_id: int | None = None,
+        limit: int = 10,
+        open_min: int = CLINIC_OPEN_MIN,
+        close_min: int = CLINIC_CLOSE_MIN,
+        step_min: int = DEFAULT_STEP_MIN,
+    ) -> list[int] | None:
+        """Earliest ``limit`` start minutes where doctor (and room) are free."""
+        if not self.covers(day):
+            return None
+        with self._lock:
+            busy = self._busy(self.doctors, doctor_id, day, None)
+            if operatory_id is not None:
+                busy |= self._busy(self.operatories, operatory_id, day, None)
+        out = []
+        for cell in bits(free_starts(busy, duration_min, open_min, close_min, step_min)):
+            out.append(cell * CELL_MINUTES)
+            if len(out) >= limit:
+                break
+        return out
+
+    def search(
+        self,
+        first_day: date,
+        last_day: date,
+        duration_for: Callable[[int], int],
+        doctor_ids: Iterable[int] | None = None,
+        operatory_ids: Iterable[int] | None = None,
+        limit: int = 10,
+        open_min: int = CLINIC_OPEN_MIN,
+        close_min: int = CLINIC_CLOSE_MIN,
+        step_min: int = DEFAULT_STEP_MIN,
+        not_before: datetime | None = None,
+    ) -> list[SlotOption] | None:
+        """Earliest ``limit`` feasible (day, start, doctor, room), in that order.
+
+        ``duration_for(doctor_id)`` gives each doctor's duration for the
+        procedure. ``None`` candidates mean every doctor / active room known
+        to the index; with no rooms at all, rooms are not constrained. Days
+        outside the window are skipped; None if none are inside.
+        """
+        first_day = max(first_day, self.first_day) if self.first_day else first_day
+        last_day = min(last_day, self.last_day) if self.last_day else last_day
+        if not self.warm or first_day > last_day:
+            return None
+        doctors = tuple(doctor_ids) if doctor_ids is not None else self.doctor_ids
+        rooms = tuple(operatory_ids) if operatory_ids is not None else self.operatory_ids
+        durations = {d: max(1, int(duration_for(d))) for d in doctors}
+        out: list[SlotOption] = []
+        day = first_day
+        while day <= last_day and len(out) < limit:
+            # starts already in the past today
+            past = 0
+            if not_before is not None and day == not_before.date():
+                past = span(0, not_before.hour * 60 + not_before.minute)
+            with self._lock:
+                doctor_busy = {d: self._busy(self.doctors, d, day, None) for d in doctors}
+                room_busy = {r: self._busy(self.operatories, r, day, None) for r in rooms}
+            # bit i of fits[d]: doctor d can start at cell i in some room
+            room_fits: dict[int, dict[int, int]] = {}
+            fits: dict[int, int] = {}
+            for d in doctors:
+                minutes = durations[d]
+                ok = free_starts(doctor_busy[d], minutes, open_min, close_min, step_min) & ~past
+                if ok and rooms:
+                    per_room = room_fits.get(minutes)
+                    if per_room is None:
+                        per_room = room_fits[minutes] = {
+                            r: free_starts(room_busy[r], minutes, open_min, close_min, step_min) for r in rooms
+                        }
+                    any_room = 0
+                    for r_ok in per_room.values():
+                        any_room |= r_ok
+                    ok &= any_room
+                if ok:
+                    fits[d] = ok
+            starts = 0
+            for ok in fits.values():
+                starts |= ok
+            for cell in bits(starts):
+                for d in doctors:
+                    if not (fits.get(d, 0) >> cell) & 1:
+                        continue
+                    room = None
+                    if rooms:
+                        per_room = room_fits[durations[d]]
+                        room = next(r for r in rooms if (per_room[r] >> cell) & 1)
+                    out.append(SlotOption(day, cell * CELL_MINUTES, d, room, durations[d]))
+                    if len(out) >= limit:
+                        return out
+            day += timedelta(days=1)
+        return out
+
+
+INDEX = ScheduleIndex()
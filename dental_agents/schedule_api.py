@@ -0,0 +1,305 @@
+"""Local JSON API over the schedule index (see schedule.py) for server.js.
+
+    POST /schedule/conflict {"doctorId", "date", "time", "durationMin", "operatoryId"?, "ignoreAppointmentId"?}
+         -> {"conflict": bool, "doctor": bool, "operatory": bool}
+    POST /schedule/suggest  {"doctorId", "date", "durationMin", "operatoryId"?, "limit"?, "stepMin"?,
+                             "open"?, "close"?}
+         -> {"slots": ["09:00:00", ...]}
+    POST /schedule/search   {"from", "to"?, "days"?, "type"?, "durationMin"?, "doctorIds"?, "operatoryIds"?,
+                             "limit"?, "stepMin"?, "open"?, "close"?}
+         -> {"options": [{"date", "time", "doctorId", "operatoryId", "durationMin"}, ...]}
+    POST /schedule/duration {"doctorId"?, "type"?}
+         -> {"durationMin", "median", "p80", "samples", "source"}
+    GET  /schedule/status   -> {"warm", "firstDay", "lastDay", "appointments", "syncedTo"}
+
+Listens on ``127.0.0.1:AGENT_SCHEDULE_PORT`` in the worker (child 0 under
+``--processes``). A date outside the indexed window, or a request before the
+index is warm, gets 503 and server.js runs its SQL fallback instead.
+``search`` covers the part of ``from .. to`` inside the window, skips
+starts that are already past, and returns the earliest options across all
+candidates (every doctor and active operatory when none are named).
+Without ``durationMin`` it books each doctor's predicted duration for
+``type`` (see durations.py).
+
+A background thread warms the index, applies ``schedule.sync`` every
+``schedule_sync_interval`` seconds and reloads the window when the date
+changes. It also reloads the duration model every ``DURATIONS_RELOAD``
+seconds, which picks up completions handled by other worker processes.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import mysql.connector
+
+from . import durations, schedule
+
+log = logging.getLogger("dental_agents.schedule_api")
+
+MAX_BODY = 64 * 1024
+MAX_LIMIT = 200
+MAX_SEARCH_DAYS = 62
+DURATIONS_RELOAD = 3600.0
+
+
+class RequestError(ValueError):
+    """Bad request body; reported as 400."""
+
+
+class NotIndexed(LookupError):
+    """The index cannot answer; reported as 503 so the caller asks MySQL."""
+
+
+def _int(body: dict, key: str, default=None, required: bool = True):
+    value = body.get(key)
+    if value is None or value == "":
+        if required and default is None:
+            raise RequestError(f"{key} required")
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RequestError(f"{key} must be an integer") from None
+
+
+def _date(body: dict, key: str = "date") -> date:
+    try:
+        return schedule.as_date(body[key])
+    except KeyError:
+        raise RequestError(f"{key} required") from None
+    except ValueError:
+        raise RequestError(f"{key} must be YYYY-MM-DD") from None
+
+
+def _clock(body: dict, key: str, default: int | None = None) -> int:
+    value = body.get(key)
+    if value is None or value == "":
+        if default is None:
+            raise RequestError(f"{key} required")
+        return default
+    try:
+        return schedule.parse_clock(value)
+    except ValueError as e:
+        raise RequestError(str(e)) from None
+
+
+def conflict(body: dict) -> dict:
+    found = schedule.INDEX.conflicts(
+        _int(body, "doctorId"),
+        _date(body),
+        _clock(body, "time"),
+        max(1, _int(body, "durationMin", schedule.DEFAULT_DURATION_MIN)),
+        operatory_id=_int(body, "operatoryId", required=False),
+        ignore_id=_int(body, "ignoreAppointmentId", required=False),
+    )
+    if found is None:
+        raise NotIndexed("date not indexed")
+    doctor, room = found
+    return {"conflict": doctor or room, "doctor": doctor, "operatory": room}
+
+
+def suggest(body: dict) -> dict:
+    starts = schedule.INDEX.suggest(
+        _int(body, "doctorId"),
+        _date(body),
+        max(1, _int(body, "durationMin", schedule.DEFAULT_DURATION_MIN)),
+        operatory_id=_int(body, "operatoryId", required=False),
+        limit=min(MAX_LIMIT, max(1, _int(body, "limit", 10))),
+        open_min=_clock(body, "open", schedule.CLINIC_OPEN_MIN),
+        close_min=_clock(body, "close", schedule.CLINIC_CLOSE_MIN),
+        step_min=max(schedule.CELL_MINUTES, _int(body, "stepMin", schedule.DEFAULT_STEP_MIN)),
+    )
+    if starts is None:
+        raise NotIndexed("date not indexed")
+    return {"slots": [schedule.clock(m) for m in starts]}
+
+
+def _ids(body: dict, key: str) -> list[int] | None:
+    value = body.get(key)
+    if value is None:
+        return None
+    if not isinstance(value, list):
+        raise RequestError(f"{key} must be a list")
+    try:
+        return [int(v) for v in value]
+    except (TypeError, ValueError):
+        raise RequestError(f"{key} must be integers") from None
+
+
+def search(body: dict) -> dict:
+    first = _date(body, "from")
+    if body.get("to"):
+        last = _date(body, "to")
+    else:
+        last = first + timedelta(days=max(1, _int(body, "days", 7)) - 1)
+    last = min(last, first + timedelta(days=MAX_SEARCH_DAYS - 1))
+    fixed = _int(body, "durationMin", required=False)
+    kind = body.get("type") or "General"
+
+    def duration_for(doctor_id: int) -> int:
+        if fixed is not None:
+            return max(1, fixed)
+        return durations.MODEL.predict(doctor_id, kind).minutes
+
+    options = schedule.INDEX.search(
+        first,
+        last,
+        duration_for,
+        doctor_ids=_ids(body, "doctorIds"),
+        operatory_ids=_ids(body, "operatoryIds"),
+        limit=min(MAX_LIMIT, max(1, _int(body, "limit", 10))),
+        open_min=_clock(body, "open", schedule.CLINIC_OPEN_MIN),
+        close_min=_clock(body, "close", schedule.CLINIC_CLOSE_MIN),
+        step_min=max(schedule.CELL_MINUTES, _int(body, "stepMin", schedule.DEFAULT_STEP_MIN)),
+        not_before=datetime.now(),
+    )
+    if options is None:
+        raise NotIndexed("dates not indexed")
+    return {
+        "options": [
+            {
+                "date": o.day.isoformat(),
+                "time": schedule.clock(o.start_min),
+                "doctorId": o.doctor_id,
+                "operatoryId": o.operatory_id,
+                "durationMin": o.duration_min,
+            }
+            for o in options
+        ]
+    }
+
+
+def duration(body: dict) -> dict:
+    pred = durations.MODEL.predict(_int(body, "doctorId", required=False), body.get("type"))
+    return {
+        "durationMin": pred.minutes,
+        "median": pred.median,
+        "p80": pred.p80,
+        "samples": pred.samples,
+        "source": pred.source,
+    }
+
+
+def status(_body: dict) -> dict:
+    idx = schedule.INDEX
+    return {
+        "warm": idx.warm,
+        "firstDay": idx.first_day.isoformat() if idx.first_day else None,
+        "lastDay": idx.last_day.isoformat() if idx.last_day else None,
+        "appointments": len(idx),
+        "syncedTo": idx.synced_to.isoformat() if idx.synced_to else None,
+        "durationsWarmedAt": durations.MODEL.warmed_at.isoformat() if durations.MODEL.warmed_at else None,
+    }
+
+
+# path -> fn(body) -> response dict
+POST_ROUTES = {
+    "/schedule/conflict": conflict,
+    "/schedule/suggest": suggest,
+    "/schedule/search": search,
+    "/schedule/duration": duration,
+}
+GET_ROUTES = {
+    "/schedule/status": status,
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _reply(self, code: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, routes, body: dict) -> None:
+        fn = routes.get(self.path.split("?")[0])
+        if fn is None:
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            self._reply(200, fn(body))
+        except RequestError as e:
+            self._reply(400, {"error": str(e)})
+        except NotIndexed as e:
+            self._reply(503, {"error": str(e)})
+
+    def do_GET(self):  # noqa: N802 - http.server API
+        self._dispatch(GET_ROUTES, {})
+
+    def do_POST(self):  # noqa: N802 - http.server API
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            self._reply(413, {"error": "body too large"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._reply(400, {"error": "body must be JSON"})
+            return
+        if not isinstance(body, dict):
+            self._reply(400, {"error": "body must be a JSON object"})
+            return
+        self._dispatch(POST_ROUTES, body)
+
+    def log_message(self, *_args):
+        pass
+
+
+class ScheduleServer:
+    def __init__(self, port: int, sync_interval: float, days: int, host: str = "127.0.0.1"):
+        self.port = port
+        self.host = host
+        self.sync_interval = sync_interval
+        self.days = days
+        self._httpd: ThreadingHTTPServer | None = None
+        self._halt = threading.Event()
+
+    def start(self) -> "ScheduleServer":
+        if not self.port:
+            return self
+        try:
+            self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        except OSError as e:
+            log.warning("schedule port %s:%s unavailable (%s)", self.host, self.port, e)
+            return self
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="agent-schedule", daemon=True).start()
+        threading.Thread(target=self._sync_loop, name="agent-schedule-sync", daemon=True).start()
+        log.info("schedule API on http://%s:%s/schedule/", self.host, self.port)
+        return self
+
+    def _sync_loop(self) -> None:
+        from . import db
+
+        idx = schedule.INDEX
+        model = durations.MODEL
+        durations_due = 0.0
+        while not self._halt.is_set():
+            conn = None
+            try:
+                conn = db.connect()
+                if not idx.warm or idx.first_day != date.today():
+                    idx.warm_up(conn, self.days)
+                else:
+                    idx.sync(conn)
+                if time.monotonic() >= durations_due:
+                    model.warm_up(conn)
+                    durations_due = time.monotonic() + DURATIONS_RELOAD
+                conn.close()
+            except mysql.connector.Error as e:
+                log.error("schedule index sync failed: %s", e)
+                db.discard(conn)
+            self._halt.wait(self.sync_interval)
+
+    def close(self) -> None:
+        self._halt.set()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
@@ -0,0 +1,51 @@
+"""``--profile-startup``: measure the worker's cold-start import cost.
+
+Runs ``python -X importtime`` in a fresh interpreter that imports the worker
+and every handler module, then prints the most expensive imports and checks
+the total against ``AGENT_STARTUP_BUDGET_MS``. A fresh process is the only
+honest measurement: in this one everything is already imported.
+"""
+from __future__ import annotations
+
+import subprocess
+import sys
+
+PROBE = "import dental_agents.worker, dental_agents.handlers as h; h.preload()"
+
+
+def parse_importtime(stderr: str) -> list[tuple[int, int, str]]:
+    """``(self_us, cumulative_us, module)`` for each ``import time:`` line."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            # one separator space, then two more per nesting level
+            rows.append((int(parts[0]), int(parts[1]), parts[2].rstrip()[1:]))
+        except ValueError:
+            continue  # header line
+    return rows
+
+
+def profile_startup(budget_ms: float, top: int = 25) -> int:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True,
+        text=True,
+    )
+    rows = parse_importtime(proc.stderr)
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:], file=sys.stderr)
+        return proc.returncode
+    # top-level entries (no leading spaces) add up to the whole start-up cost
+    total_us = sum(cum for _, cum, name in rows if not name.startswith(" "))
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for self_us, cum_us, name in sorted(rows, key=lambda r: -r[1])[:top]:
+        print(f"{cum_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name.strip()}")
+    total_ms = total_us / 1000
+    verdict = "OK" if total_ms <= budget_ms else "OVER BUDGET"
+    print(f"\ntotal import time {total_ms:.1f} ms (budget {budget_ms:.0f} ms): {verdict}")
+    return 0 if total_ms <= budget_ms else 1
@@ -0,0 +1,124 @@
+"""``--processes N`` mode: run N worker processes under one supervisor.
+
+Each child is a full worker with its own ``locked_by`` identity and its own
+MySQL connection, so CPU-heavy handlers (PDF exports, revenue rollups) spread
+across cores. Children that die are restarted; SIGINT/SIGTERM sets a shared
+stop flag so every child finishes its current batch before exiting.
+
+Uses ``multiprocessing`` rather than ``os.fork`` so it also works on Windows,
+where run_agents.bat is used.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing as mp
+import signal
+import time
+from dataclasses import replace
+
+from .config import WorkerConfig
+from .wakeup import WakeListener
+
+log = logging.getLogger("dental_agents.supervisor")
+
+# A child that dies sooner than this after starting counts as a crash loop
+# and is restarted with exponential delay instead of immediately.
+MIN_HEALTHY_SECONDS = 10.0
+MAX_RESTART_DELAY = 30.0
+SHUTDOWN_GRACE_SECONDS = 60.0
+
+
+def child_config(cfg: WorkerConfig, index: int) -> WorkerConfig:
+    suffix = f"/{index}"
+    return replace(
+        cfg,
+        worker_id=cfg.worker_id[: 64 - len(suffix)] + suffix,
+        # one archiver per pool is enough
+        archive_after_days=cfg.archive_after_days if index == 0 else 0,
+        # queue depth is table-wide, so only child 0 samples it
+        metrics_port=cfg.metrics_port + index if cfg.metrics_port else 0,
+        metrics_sample_interval=cfg.metrics_sample_interval if index == 0 else 0,
+        # one schedule index per pool; the others' updates reach it via sync
+        schedule_port=cfg.schedule_port if index == 0 else 0,
+    )
+
+
+def _child_main(cfg: WorkerConfig, stop, wake) -> None:
+    from . import worker
+
+    worker.setup_logging()
+    # The supervisor owns Ctrl+C; children only react to the shared stop flag
+    # or to a SIGTERM aimed at them directly.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, worker.request_stop)
+    worker.run(cfg, stop=stop, wake=wake)
+
+
+class _Slot:
+    def __init__(self, cfg: WorkerConfig):
+        self.cfg = cfg
+        self.proc: mp.Process | None = None
+        self.started_at = 0.0
+        self.restart_delay = 1.0
+        self.restart_at = 0.0
+
+
+def run(cfg: WorkerConfig, processes: int) -> None:
+    ctx = mp.get_context("spawn")
+    stop = ctx.Event()
+    # One UDP listener for the whole pool; a ping wakes every idle child and
+    # whichever claims first gets the new events.
+    wake = ctx.Event()
+    listener = WakeListener(cfg.wake_port, wake)
+    listener.start()
+
+    def on_signal(signum, _frame):
+        log.info("signal %s received, draining %s workers", signum, processes)
+        stop.set()
+        wake.set()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+
+    slots = [_Slot(child_config(cfg, i)) for i in range(processes)]
+
+    def start(slot: _Slot) -> None:
+        slot.proc = ctx.Process(target=_child_main, args=(slot.cfg, stop, wake), name=slot.cfg.worker_id, daemon=False)
+        slot.proc.start()
+        slot.started_at = time.monotonic()
+        log.info("started %s (pid %s)", slot.cfg.worker_id, slot.proc.pid)
+
+    for slot in slots:
+        start(slot)
+
+    while not stop.is_set():
+        now = time.monotonic()
+        for slot in slots:
+            proc = slot.proc
+            if proc is not None and proc.is_alive():
+                continue
+            if proc is not None:
+                proc.join()
+                uptime = now - slot.started_at
+                log.warning("%s exited with code %s after %.1fs", slot.cfg.worker_id, proc.exitcode, uptime)
+                if uptime < MIN_HEALTHY_SECONDS:
+                    slot.restart_delay = min(slot.restart_delay * 2, MAX_RESTART_DELAY)
+                else:
+                    slot.restart_delay = 1.0
+                slot.restart_at = now + slot.restart_delay
+                slot.proc = None
+            if now >= slot.restart_at:
+                start(slot)
+        stop.wait(0.5)
+
+    deadline = time.monotonic() + SHUTDOWN_GRACE_SECONDS
+    for slot in slots:
+        if slot.proc is not None:
+            slot.proc.join(max(0.0, deadline - time.monotonic()))
+    for slot in slots:
+        if slot.proc is not None and slot.proc.is_alive():
+            log.warning("%s did not stop within %ss; terminating", slot.cfg.worker_id, SHUTDOWN_GRACE_SECONDS)
+            slot.proc.terminate()
+            slot.proc.join()
+    listener.close()
+    log.info("supervisor stopped")
@@ -0,0 +1,497 @@
+"""Synthetic clinic data for load tests: ``python -m dental_agents.synth``.
+
+    python -m dental_agents.synth --doctors 50 --patients 20000 --days 365
+    python -m dental_agents.synth --doctors 2000 --patients 1500000 --days 400 --load-data
+
+Generates doctors, patients, operatories, inventory, cases, appointments,
+visits, visit_procedures, invoices, notifications and agent_events with
+shapes that matter for performance: doctors work Monday to Saturday with a
+day-to-day varying load, a few patients account for most visits, procedure
+mix and durations follow a fixed catalogue with log-normal overruns, most
+past appointments are Completed with a tail of cancellations, and the
+outbox holds one event per state change plus an optional ready backlog.
+
+The same ``--seed`` produces the same rows. Ids are assigned here, starting
+after each table's current ``MAX(id)``, so rows reference each other without
+a round trip and the generator can be pointed at a database that already has
+data. Rows go in with multi-row INSERTs of ``--batch`` rows (FK and unique
+checks off for the session), or with ``--load-data`` via one TSV file per
+table and ``LOAD DATA LOCAL INFILE``, which is several times faster for
+10M+ rows but needs ``local_infile=ON`` on the server.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from . import db
+
+log = logging.getLogger("dental_agents.synth")
+
+# code, appointment type, minutes, price, weight
+PROCEDURES = (
+    ("GENERAL", "General", 30, 500.0, 40),
+    ("SCALING", "Scaling", 45, 1500.0, 20),
+    ("FILLING", "Filling", 45, 2000.0, 18),
+    ("ROOT_CANAL", "Root canal", 90, 6000.0, 8),
+    ("EXTRACTION", "Extraction", 60, 2500.0, 9),
+    ("IMPLANT", "Implant", 120, 30000.0, 5),
+)
+_PROC_WEIGHTS = [p[4] for p in PROCEDURES]
+
+CLINIC_OPEN = 9 * 60
+CLINIC_CLOSE = 18 * 60
+SLOT_MINUTES = 15
+
+CASE_STAGES = ("NEW", "IN_TREATMENT", "WAITING_ON_PATIENT", "READY_TO_CLOSE", "CLOSED", "BLOCKED")
+_CASE_STAGE_WEIGHTS = (10, 30, 15, 10, 30, 5)
+
+# insertion order respects foreign keys even with checks on
+TABLES: dict[str, tuple[str, ...]] = {
+    "users": ("id", "uid", "full_name", "email", "phone", "role", "created_at"),
+    "operatories": ("id", "name", "is_active"),
+    "vendors": ("id", "name", "phone", "email"),
+    "inventory_items": (
+        "id", "item_code", "name", "category", "stock", "reorder_threshold", "expiry_date", "vendor_id", "unit_cost",
+    ),
+    "cases": ("id", "case_uid", "patient_id", "doctor_id", "case_type", "stage", "priority", "created_at"),
+    "appointments": (
+        "id", "appointment_uid", "appointment_code", "patient_id", "doctor_id", "scheduled_date", "scheduled_time",
+        "predicted_duration_min", "scheduled_end_time", "type", "status", "operatory_id", "actual_checkin_at",
+        "actual_start_at", "actual_end_at", "linked_case_id", "created_at",
+    ),
+    "visits": (
+        "id", "visit_uid", "appointment_id", "linked_case_id", "patient_id", "doctor_id", "status", "procedures_json",
+        "started_at", "ended_at", "created_at",
+    ),
+    "visit_procedures": (
+        "id", "visit_id", "procedure_code", "qty", "predicted_duration_min", "actual_duration_min", "unit_price",
+        "amount", "created_at",
+    ),
+    "invoices": ("id", "patient_id", "issue_date", "amount", "status", "paid_date", "appointment_id", "created_at"),
+    "notifications": (
+        "id", "user_id", "user_role", "channel", "type", "title", "message", "status", "created_at", "read_at",
+    ),
+    "agent_events": (
+        "id", "event_type", "payload_json", "status", "priority", "attempts", "max_attempts", "available_at",
+        "correlation_id", "created_at",
+    ),
+}
+
+
+@dataclass(frozen=True)
+class Volumes:
+    doctors: int = 50
+    patients: int = 20000
+    operatories: int = 0  # 0: one per two doctors
+    days: int = 365
+    future_days: int = 30
+    per_doctor_day: float = 10.0
+    case_rate: float = 0.3
+    inventory_items: int = 500
+    backlog_events: int = 0
+
+
+def _ts(d: date, minute: int) -> str:
+    return f"{d.isoformat()} {minute // 60:02d}:{minute % 60:02d}:00"
+
+
+def _hm(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}:00"
+
+
+# -- sinks ---------------------------------------------------------------------
+
+
+class InsertSink:
+    """Buffers rows per table and writes them as multi-row INSERTs."""
+
+    def __init__(self, conn, batch: int):
+        self.conn = conn
+        self.batch = batch
+        self.buffers: dict[str, list[tuple]] = {t: [] for t in TABLES}
+        self.counts: dict[str, int] = {t: 0 for t in TABLES}
+        self._sql = {
+            t: f"INSERT INTO {t} ({', '.join(cols)}) VALUES ({', '.join(['%s'] * len(cols))})"
+            for t, cols in TABLES.items()
+        }
+
+    def add(self, table: str, row: tuple) -> None:
+        buf = self.buffers[table]
+        buf.append(row)
+        if len(buf) >= self.batch:
+            self._flush(table)
+
+    def _flush(self, table: str) -> None:
+        rows = self.buffers[table]
+        if not rows:
+            return
+        cur = self.conn.cursor()
+        try:
+            # mysql-connector rewrites this into one multi-row INSERT
+            cur.executemany(self._sql[table], rows)
+        finally:
+            cur.close()
+        self.conn.commit()
+        self.counts[table] += len(rows)
+        self.buffers[table] = []
+
+    def close(self) -> None:
+        for table in TABLES:
+            self._flush(table)
+
+
+class LoadDataSink:
+    """Writes one TSV per table, then ``LOAD DATA LOCAL INFILE`` each."""
+
+    def __init__(self, conn, workdir: str):
+        self.conn = conn
+        self.workdir = workdir
+        self.counts: dict[str, int] = {t: 0 for t in TABLES}
+        self._files = {t: open(os.path.join(workdir, f"{t}.tsv"), "w", encoding="utf-8", newline="") for t in TABLES}
+        self._writers = {
+            t: csv.writer(f, delimiter="\t", quoting=csv.QUOTE_NONE, escapechar="\\", lineterminator="\n")
+            for t, f in self._files.items()
+        }
+
+    def add(self, table: str, row: tuple) -> None:
+        self._writers[table].writerow(["\\N" if v is None else v for v in row])
+        self.counts[table] += 1
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        cur = self.conn.cursor()
+        try:
+            for table, cols in TABLES.items():
+                if not self.counts[table]:
+                    continue
+                started = time.perf_counter()
+                path = os.path.join(self.workdir, f"{table}.tsv").replace("\\", "/")
+                cur.execute(
+                    f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4 "
+                    f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({', '.join(cols)})",
+                    (path,),
+                )
+                self.conn.commit()
+                log.info("loaded %s rows into %s in %.1fs", self.counts[table], table, time.perf_counter() - started)
+        finally:
+            cur.close()
+
+
+# -- generator -----------------------------------------------------------------
+
+
+def start_ids(conn) -> dict[str, int]:
+    cur = conn.cursor()
+    try:
+        out = {}
+        for table in TABLES:
+            cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+            out[table] = int(cur.fetchone()[0]) + 1
+        return out
+    finally:
+        cur.close()
+
+
+class Generator:
+    def __init__(self, vol: Volumes, seed: int, ids: dict[str, int], today: date | None = None):
+        self.vol = vol
+        self.rng = random.Random(seed)
+        self.ids = dict(ids)
+        self.today = today or date.today()
+        self.tag = f"{seed:x}"
+        self.doctor_ids: list[int] = []
+        self.patient_ids: list[int] = []
+        self.operatory_ids: list[int] = []
+        self.patient_case: dict[int, int] = {}
+
+    def _id(self, table: str) -> int:
+        value = self.ids[table]
+        self.ids[table] = value + 1
+        return value
+
+    def _patient(self) -> int:
+        # a few regulars, a long tail of occasional patients
+        n = len(self.patient_ids)
+        return self.patient_ids[min(n - 1, int(n * self.rng.random() ** 2.5))]
+
+    def run(self, sink) -> None:
+        self._people(sink)
+        self._inventory(sink)
+        self._cases(sink)
+        first = self.today - timedelta(days=self.vol.days)
+        last = self.today + timedelta(days=self.vol.future_days)
+        day = first
+        started = time.perf_counter()
+        while day <= last:
+            if day.weekday() < 6:
+                for i, doctor in enumerate(self.doctor_ids):
+                    self._doctor_day(sink, doctor, self.operatory_ids[i % len(self.operatory_ids)], day)
+            day += timedelta(days=1)
+            if day.day == 1:
+                log.info(
+                    "%s: %s appointments so far (%.0fs)",
+                    day.isoformat(),
+                    self.ids["appointments"] - 1,
+                    time.perf_counter() - started,
+                )
+        self._backlog(sink)
+
+    def _people(self, sink) -> None:
+        rng, vol = self.rng, self.vol
+        joined = datetime.combine(self.today - timedelta(days=vol.days), datetime.min.time())
+        for _ in range(vol.doctors):
+            uid = self._id("users")
+            self.doctor_ids.append(uid)
+            sink.add(
+                "users",
+                (uid, f"SYN{self.tag}-DC-{uid}", f"Dr. Synthetic {uid}", f"dc{uid}.{self.tag}@synth.invalid",
+                 None, "Doctor", joined.strftime("%Y-%m-%d %H:%M:%S")),
+            )
+        span = max(1, vol.days) * 86400
+        for _ in range(vol.patients):
+            uid = self._id("users")
+            self.patient_ids.append(uid)
+            created = joined + timedelta(seconds=int(span * rng.random()))
+            sink.add(
+                "users",
+                (uid, f"SYN{self.tag}-PT-{uid}", f"Patient {uid}", f"pt{uid}.{self.tag}@synth.invalid",
+                 f"+91{rng.randrange(7000000000, 9999999999)}", "Patient", created.strftime("%Y-%m-%d %H:%M:%S")),
+            )
+        for _ in range(vol.operatories or max(1, math.ceil(vol.doctors / 2))):
+            oid = self._id("operatories")
+            self.operatory_ids.append(oid)
+            sink.add("operatories", (oid, f"SYN{self.tag} Room {oid}", 1))
+
+    def _inventory(self, sink) -> None:
+        rng = self.rng
+        vendors = [self._id("vendors") for _ in range(max(1, self.vol.inventory_items // 50))]
+        for vid in vendors:
+            sink.add("vendors", (vid, f"SYN{self.tag} Vendor {vid}", None, None))
+        for _ in range(self.vol.inventory_items):
+            iid = self._id("inventory_items")
+            threshold = rng.randrange(5, 50)
+            expiry = self.today + timedelta(days=rng.randrange(-30, 720))
+            sink.add(
+                "inventory_items",
+                (iid, f"SYN{self.tag}-I{iid}", f"Item {iid}", rng.choice(("Consumable", "Instrument", "Drug")),
+                 max(0, int(rng.gauss(threshold * 3, threshold))), threshold, expiry.isoformat(),
+                 rng.choice(vendors), round(rng.uniform(10, 5000), 2)),
+            )
+
+    def _cases(self, sink) -> None:
+        rng = self.rng
+        for pid in self.patient_ids:
+            if rng.random() >= self.vol.case_rate:
+                continue
+            cid = self._id("cases")
+            self.patient_case[pid] = cid
+            proc = rng.choices(PROCEDURES, weights=_PROC_WEIGHTS)[0]
+            sink.add(
+                "cases",
+                (cid, f"SYN{self.tag}-CASE-{cid}", pid, rng.choice(self.doctor_ids), proc[1],
+                 rng.choices(CASE_STAGES, weights=_CASE_STAGE_WEIGHTS)[0], rng.choice(("LOW", "MEDIUM", "HIGH")),
+                 _ts(self.today - timedelta(days=rng.randrange(0, max(1, self.vol.days))), CLINIC_OPEN)),
+            )
+
+    def _doctor_day(self, sink, doctor: int, operatory: int, day: date) -> None:
+        rng = self.rng
+        # busy days and quiet days
+        wanted = max(0, int(rng.gauss(self.vol.per_doctor_day, self.vol.per_doctor_day / 4)))
+        past = day < self.today
+        minute = CLINIC_OPEN
+        for _ in range(wanted):
+            code, appt_type, minutes, price, _w = rng.choices(PROCEDURES, weights=_PROC_WEIGHTS)[0]
+            minute += SLOT_MINUTES * rng.choices((0, 1, 2, 4), weights=(60, 20, 12, 8))[0]
+            if minute + minutes > CLINIC_CLOSE:
+                break
+            self._appointment(sink, doctor, operatory, day, minute, code, appt_type, minutes, price, past)
+            minute += math.ceil(minutes / SLOT_MINUTES) * SLOT_MINUTES
+
+    def _appointment(self, sink, doctor, operatory, day, minute, code, appt_type, minutes, price, past) -> None:
+        rng = self.rng
+        aid = self._id("appointments")
+        patient = self._patient()
+        case_id = self.patient_case.get(patient) if rng.random() < 0.4 else None
+        booked = _ts(day - timedelta(days=rng.randrange(1, 30)), CLINIC_OPEN + rng.randrange(0, 540))
+        if past:
+            status = rng.choices(("Completed", "Cancelled", "Confirmed"), weights=(88, 9, 3))[0]
+        else:
+            status = rng.choices(("Confirmed", "Cancelled"), weights=(95, 5))[0]
+        checkin = start = end = None
+        actual = None
+        if status == "Completed":
+            late = max(-5, int(rng.gauss(3, 6)))
+            actual = max(5, round(minutes * rng.lognormvariate(0, 0.25)))
+            checkin = _ts(day, minute + late - rng.randrange(0, 15))
+            start = _ts(day, minute + max(0, late))
+            end = _ts(day, min(23 * 60 + 59, minute + max(0, late) + actual))
+        sink.add(
+            "appointments",
+            (aid, f"SYN{self.tag}-A{aid}", f"SYN{self.tag}-AC{aid}", patient, doctor, day.isoformat(), _hm(minute),
+             minutes, _hm(minute + minutes), appt_type, status,
+             operatory if rng.random() < 0.9 else rng.choice(self.operatory_ids), checkin, start, end, case_id,
+             booked),
+        )
+        created = {
+            "appointmentId": aid, "appointmentUid": f"SYN{self.tag}-A{aid}", "patientId": patient,
+            "doctorId": doctor, "date": day.isoformat(), "time": _hm(minute), "type": appt_type,
+            "operatoryId": operatory,
+        }
+        self._event(sink, "AppointmentCreated", created, f"appt:{aid}", booked, done=True)
+        self._notification(sink, patient, "APPOINTMENT_CONFIRMED", f"Appointment on {day.isoformat()}", booked)
+        if status != "Completed":
+            return
+        vid = self._id("visits")
+        sink.add(
+            "visits",
+            (vid, f"SYN{self.tag}-V{vid}", aid, case_id, patient, doctor, "CLOSED",
+             json.dumps([{"code": code}]), start, end, start),
+        )
+        sink.add("visit_procedures", (self._id("visit_procedures"), vid, code, 1, minutes, actual, price, price, end))
+        paid = rng.random() < 0.85
+        issue = day.isoformat()
+        paid_date = (day + timedelta(days=rng.choice((0, 0, 0, 1, 3, 7)))).isoformat() if paid else None
+        status_inv = "Paid" if paid else ("Overdue" if (self.today - day).days > 30 else "Pending")
+        sink.add("invoices", (self._id("invoices"), patient, issue, price, status_inv, paid_date, aid, end))
+        completed = {
+            "appointmentId": aid, "patientId": patient, "doctorId": doctor, "type": appt_type,
+            "linkedCaseId": case_id,
+        }
+        self._event(sink, "AppointmentCompleted", completed, f"appt:{aid}", end, done=True)
+        self._notification(sink, patient, "VISIT_SUMMARY", "Visit summary", end)
+
+    def _notification(self, sink, user_id: int, ntype: str, title: str, at: str) -> None:
+        read = self.rng.random() < 0.7
+        sink.add(
+            "notifications",
+            (self._id("notifications"), user_id, "Patient", "IN_APP", ntype, title, title, "READ" if read else "SENT",
+             at, at if read else None),
+        )
+
+    def _event(self, sink, event_type: str, payload: dict, correlation: str, at: str, done: bool) -> None:
+        sink.add(
+            "agent_events",
+            (self._id("agent_events"), event_type, json.dumps(payload, separators=(",", ":")),
+             "DONE" if done else "NEW", 100, 1 if done else 0, 7, at, correlation, at),
+        )
+
+    def _backlog(self, sink) -> None:
+        """Ready events for the worker to chew on (claim/throughput tests)."""
+        rng = self.rng
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        last_appt = self.ids["appointments"] - 1
+        for _ in range(self.vol.backlog_events):
+            if rng.random() < 0.7 and last_appt > 0:
+                aid = rng.randrange(max(1, last_appt - 100000), last_appt + 1)
+                payload = {"appointmentId": aid, "patientId": self._patient(), "type": "General"}
+                self._event(sink, "AppointmentCompleted", payload, f"appt:{aid}", now, done=False)
+            elif self.patient_case:
+                cid = rng.choice(list(self.patient_case.values())) if len(self.patient_case) < 1000 else (
+                    self.ids["cases"] - 1 - rng.randrange(0, len(self.patient_case))
+                )
+                self._event(sink, "CaseUpdated", {"caseDbId": cid, "stage": "IN_TREATMENT"}, f"case:{cid}", now, False)
+
+
+# -- CLI -----------------------------------------------------------------------
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    d = Volumes()
+    p = argparse.ArgumentParser(prog="python -m dental_agents.synth")
+    p.add_argument("--doctors", type=int, default=d.doctors)
+    p.add_argument("--patients", type=int, default=d.patients)
+    p.add_argument("--operatories", type=int, default=d.operatories, help="0: one per two doctors")
+    p.add_argument("--days", type=int, default=d.days, help="days of history before today")
+    p.add_argument("--future-days", type=int, default=d.future_days, help="days of bookings after today")
+    p.add_argument("--per-doctor-day", type=float, default=d.per_doctor_day, help="mean appointments per doctor per day")
+    p.add_argument("--case-rate", type=float, default=d.case_rate, help="fraction of patients with an open case")
+    p.add_argument("--inventory-items", type=int, default=d.inventory_items)
+    p.add_argument("--backlog-events", type=int, default=d.backlog_events, help="extra NEW agent_events")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--batch", type=int, default=2000, help="rows per INSERT")
+    p.add_argument("--load-data", action="store_true", help="use LOAD DATA LOCAL INFILE (server needs local_infile=ON)")
+    p.add_argument("--workdir", help="--load-data: where to write the TSV files (default: a temp dir)")
+    p.add_argument("--dry-run", action="store_true", help="print the planned volumes and exit")
+    return p.parse_args(argv)
+
+
+def estimate(vol: Volumes) -> dict[str, int]:
+    working_days = (vol.days + vol.future_days + 1) * 6 // 7
+    total = sum(_PROC_WEIGHTS)
+    slot = sum(math.ceil(p[2] / SLOT_MINUTES) * SLOT_MINUTES * p[4] for p in PROCEDURES) / total
+    gap = SLOT_MINUTES * (0.2 * 1 + 0.12 * 2 + 0.08 * 4)
+    # a day stops filling at closing time
+    per_day = min(vol.per_doctor_day, (CLINIC_CLOSE - CLINIC_OPEN) / (slot + gap))
+    appts = int(vol.doctors * working_days * per_day)
+    completed = int(appts * vol.days / max(1, vol.days + vol.future_days) * 0.88)
+    return {
+        "users": vol.doctors + vol.patients,
+        "appointments": appts,
+        "visits": completed,
+        "visit_procedures": completed,
+        "invoices": completed,
+        "notifications": appts + completed,
+        "agent_events": appts + completed + vol.backlog_events,
+    }
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    args = parse_args(argv)
+    vol = Volumes(
+        doctors=max(1, args.doctors),
+        patients=max(1, args.patients),
+        operatories=max(0, args.operatories),
+        days=max(0, args.days),
+        future_days=max(0, args.future_days),
+        per_doctor_day=max(0.0, args.per_doctor_day),
+        case_rate=min(1.0, max(0.0, args.case_rate)),
+        inventory_items=max(0, args.inventory_items),
+        backlog_events=max(0, args.backlog_events),
+    )
+    planned = estimate(vol)
+    print("planned (approx.): " + ", ".join(f"{t}={n:,}" for t, n in planned.items()))
+    if args.dry_run:
+        return 0
+
+    conn = db.connect_unpooled(allow_local_infile=args.load_data)
+    cur = conn.cursor()
+    try:
+        cur.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+        gen = Generator(vol, args.seed, start_ids(conn))
+        started = time.perf_counter()
+        if args.load_data:
+            workdir = args.workdir or tempfile.mkdtemp(prefix="dental_synth_")
+            os.makedirs(workdir, exist_ok=True)
+            sink = LoadDataSink(conn, workdir)
+        else:
+            sink = InsertSink(conn, max(1, args.batch))
+        gen.run(sink)
+        sink.close()
+        elapsed = time.perf_counter() - started
+        total = sum(sink.counts.values())
+        print(f"inserted {total:,} rows in {elapsed:.0f}s ({total / max(elapsed, 0.001):,.0f} rows/s)")
+        for table, n in sink.counts.items():
+            if n:
+                print(f"  {table:<18} {n:>12,}")
+    finally:
+        cur.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+        cur.close()
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
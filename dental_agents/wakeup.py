@@ -0,0 +1,82 @@
+"""Idle backoff and instant wake-up for the poll loop.
+
+When ``agent_events`` is empty the worker sleeps ``poll_min`` seconds, then
+twice as long after every further empty claim, up to ``poll_max``. server.js
+sends a one-byte UDP datagram to ``127.0.0.1:AGENT_WAKE_PORT`` right after it
+enqueues an event (``wakeAgents``); the listener thread sets a wake flag that
+cuts the current sleep short, so a new ``AppointmentCreated`` is claimed
+within milliseconds while an idle worker barely touches MySQL.
+
+The datagram is only a hint. If it is lost, or the port is taken by another
+worker on the same host, the backoff still picks the event up within
+``poll_max`` seconds.
+"""
+from __future__ import annotations
+
+import logging
+import socket
+import threading
+
+log = logging.getLogger("dental_agents.wakeup")
+
+WAKE_HOST = "127.0.0.1"
+
+
+class IdleBackoff:
+    def __init__(self, min_delay: float, max_delay: float, wake):
+        self.min_delay = min_delay
+        self.max_delay = max(min_delay, max_delay)
+        self.delay = min_delay
+        self.wake = wake
+
+    def reset(self) -> None:
+        self.delay = self.min_delay
+
+    def wait(self) -> bool:
+        """Sleep for the current delay; returns True if woken early."""
+        delay = self.delay
+        self.delay = min(self.delay * 2, self.max_delay)
+        woken = self.wake.wait(delay)
+        if woken:
+            self.wake.clear()
+            self.reset()
+        return woken
+
+
+class WakeListener:
+    """Sets ``flag`` whenever a datagram arrives on ``port``."""
+
+    def __init__(self, port: int, flag, host: str = WAKE_HOST):
+        self.port = port
+        self.host = host
+        self.flag = flag
+        self._sock: socket.socket | None = None
+
+    def start(self) -> bool:
+        if not self.port:
+            return False
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.bind((self.host, self.port))
+        except OSError as e:
+            sock.close()
+            log.warning("wake-up port %s:%s unavailable (%s); relying on idle backoff", self.host, self.port, e)
+            return False
+        self._sock = sock
+        threading.Thread(target=self._loop, name="agent-wake", daemon=True).start()
+        log.info("listening for wake-up pings on udp %s:%s", self.host, self.port)
+        return True
+
+    def _loop(self) -> None:
+        sock = self._sock
+        while sock is not None:
+            try:
+                sock.recv(64)
+            except OSError:
+                return
+            self.flag.set()
+
+    def close(self) -> None:
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            sock.close()
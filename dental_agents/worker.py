@@ -0,0 +1,364 @@
+"""Outbox worker: ``python -m dental_agents.worker`` (see run_agents.bat).
+
+Each loop leases a batch of ready ``agent_events`` rows with
+``FOR UPDATE SKIP LOCKED``, runs their handlers, then marks the successful
+ones DONE in a single UPDATE. Several workers can run side by side; each
+only ever sees the rows it leased.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import signal
+import sys
+import threading
+import time
+from dataclasses import replace
+
+import mysql.connector
+
+from . import db, idempotency, metrics, profiling, schedule_api
+from .config import WorkerConfig, env_float, env_int, parse_limits
+from .archive import Archiver
+from .coalesce import coalesce
+from .events import PayloadError
+from .handlers import get_handler, handled_types, is_async, run_async_inline
+from .idempotency import handler_key
+from .lanes import LaneScheduler, parse_lanes
+from .leases import LeaseKeeper
+from .queue import Event, claim_batch, mark_done
+from .retry import fail_event
+from .wakeup import IdleBackoff, WakeListener
+
+log = logging.getLogger("dental_agents.worker")
+
+_stop = threading.Event()
+_wake = threading.Event()
+
+
+def error_text(e: BaseException) -> str:
+    return f"{type(e).__name__}: {e}"
+
+
+class NoHandler(LookupError):
+    """A claimed event's type has no registered handler; the event is retried."""
+
+
+def find_handler(ev: Event):
+    handler = get_handler(ev.event_type)
+    if handler is None:
+        raise NoHandler(f"no handler registered for {ev.event_type}")
+    return handler
+
+
+def run_handler(conn, ev: Event) -> None:
+    """Run ``ev``'s handler and commit.
+
+    On failure the transaction is rolled back and the exception re-raised.
+    """
+    handler = find_handler(ev)
+    try:
+        with profiling.profile_event(ev):
+            if is_async(handler):
+                run_async_inline(handler, conn, ev)
+            else:
+                idempotency.run_once(conn, ev, handler_key(handler), handler, ev)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def drop_invalid(conn, events: list[Event], worker_id: str) -> list[Event]:
+    """Validate freshly claimed events; invalid payloads go straight to DEAD."""
+    valid = []
+    for ev in events:
+        try:
+            ev.validate()
+        except PayloadError as e:
+            log.error("event %s (%s) has an invalid payload: %s", ev.id, ev.event_type, e)
+            try:
+                status = fail_event(conn, ev, worker_id, error_text(e), permanent=True)
+                metrics.record_outcome(ev, status.lower())
+            except mysql.connector.Error as e2:
+                # the lease runs out and the reaper hands it back for another try
+                log.error("could not mark event %s dead: %s", ev.id, e2)
+            continue
+        valid.append(ev)
+    return valid
+
+
+def process_batch(conn, events: list[Event], worker_id: str) -> None:
+    done: list[int] = []
+    for ev in events:
+        started = time.perf_counter()
+        try:
+            run_handler(conn, ev)
+            done.extend(ev.all_ids)
+            metrics.record_outcome(ev, "done", time.perf_counter() - started)
+        except Exception as e:
+            log.exception("event %s (%s) failed", ev.id, ev.event_type)
+            status = fail_event(conn, ev, worker_id, error_text(e), permanent=isinstance(e, PayloadError))
+            metrics.record_outcome(ev, status.lower(), time.perf_counter() - started)
+    mark_done(conn, done, worker_id)
+
+
+def make_scheduler(cfg: WorkerConfig) -> LaneScheduler | None:
+    specs = parse_lanes(cfg.lanes_spec)
+    return LaneScheduler(specs) if specs else None
+
+
+def claim_next(conn, cfg: WorkerConfig, sched: LaneScheduler | None) -> list[Event]:
+    handled = handled_types()
+    if sched is None:
+        events = claim_batch(
+            conn, cfg.worker_id, cfg.batch_size, cfg.lease_seconds, ordered=cfg.ordered, event_types=handled
+        )
+        metrics.CLAIM_BATCH.observe(value=len(events))
+        events = coalesce(conn, cfg.worker_id, cfg.lease_seconds, events, cfg.ordered, handled)
+        return drop_invalid(conn, events, cfg.worker_id)
+    plan = sched.plan(cfg.batch_size)
+    if not plan:
+        return []
+    slices = [sl for _, sl in plan]
+    events = claim_batch(
+        conn,
+        cfg.worker_id,
+        cfg.batch_size,
+        cfg.lease_seconds,
+        slices=slices,
+        ordered=cfg.ordered,
+        event_types=handled,
+    )
+    metrics.CLAIM_BATCH.observe(value=len(events))
+    sched.claimed(plan, events)
+    events = coalesce(conn, cfg.worker_id, cfg.lease_seconds, events, cfg.ordered, handled)
+    return sched.order(drop_invalid(conn, events, cfg.worker_id))
+
+
+def run(cfg: WorkerConfig, once: bool = False, stop=None, wake=None) -> None:
+    """Worker loop.
+
+    ``stop`` and ``wake`` are flags shared by a supervisor; a standalone
+    worker uses its own and listens for wake-up pings itself.
+    """
+    stop = stop or _stop
+    listener = None
+    if wake is None:
+        wake = _wake
+        if not once:
+            listener = WakeListener(cfg.wake_port, wake)
+            listener.start()
+    profiling.configure(cfg.profile_mode, cfg.profile_rate, cfg.profile_slow_ms, cfg.profile_dir)
+    # claim/handler connections plus lease keeper, metrics sampler, schedule sync and archiver
+    db.configure_pool((cfg.db_threads if cfg.engine == "asyncio" else 1) + 4)
+    keeper = LeaseKeeper(cfg.worker_id, cfg.lease_seconds, cfg.reap_interval, cfg.reap_batch, stop).start()
+    archiver = Archiver(cfg, stop).start() if not once else None
+    exporter = metrics.MetricsServer(cfg.metrics_port, cfg.metrics_sample_interval).start() if not once else None
+    scheduler_api = (
+        schedule_api.ScheduleServer(cfg.schedule_port, cfg.schedule_sync_interval, cfg.schedule_days).start()
+        if not once
+        else None
+    )
+    try:
+        if cfg.engine == "asyncio":
+            from . import async_engine
+
+            async_engine.run(cfg, stop=stop, wake=wake, keeper=keeper)
+        else:
+            _run_sync(cfg, once, stop, wake, keeper)
+    finally:
+        if scheduler_api is not None:
+            scheduler_api.close()
+        if exporter is not None:
+            exporter.close()
+        if archiver is not None:
+            archiver.close()
+        keeper.close()
+        if listener is not None:
+            listener.close()
+
+
+def schema_ready() -> bool:
+    """Startup version check; False only if migrations are known to be missing."""
+    from . import migrate
+
+    try:
+        # unpooled: run() sizes the pool after this
+        conn = db.connect_unpooled()
+    except mysql.connector.Error as e:
+        log.error("database unavailable at startup: %s", e)
+        return True
+    try:
+        have, want = migrate.check(conn)
+    except mysql.connector.Error as e:
+        log.error("schema version check failed: %s", e)
+        return True
+    finally:
+        conn.close()
+    if have < want:
+        log.error("schema is at version %s, this worker needs %s: run python -m dental_agents.migrate up", have, want)
+        return False
+    return True
+
+
+def _run_sync(cfg: WorkerConfig, once: bool, stop, wake, keeper: LeaseKeeper) -> None:
+    def stopping() -> bool:
+        return _stop.is_set() or stop.is_set()
+
+    log.info("worker %s started (batch=%s, lease=%ss)", cfg.worker_id, cfg.batch_size, cfg.lease_seconds)
+    idle = IdleBackoff(cfg.poll_min, cfg.poll_max, wake)
+    sched = make_scheduler(cfg)
+    conn = None
+    while not stopping():
+        try:
+            if conn is None:
+                conn = db.connect()
+            events = claim_next(conn, cfg, sched)
+            if events:
+                ids = [i for ev in events for i in ev.all_ids]
+                keeper.track(ids)
+                if sched is not None:
+                    for ev in events:
+                        sched.started(ev)
+                try:
+                    process_batch(conn, events, cfg.worker_id)
+                finally:
+                    keeper.release(ids)
+                    if sched is not None:
+                        for ev in events:
+                            sched.finished(ev)
+        except mysql.connector.Error as e:
+            log.error("database error: %s", e)
+            db.discard(conn)
+            conn = None
+            events = []
+        if once:
+            break
+        if events:
+            idle.reset()
+        else:
+            if conn is not None:
+                # back to the pool while idle; checkout health-checks it
+                conn.close()
+                conn = None
+            idle.wait()
+    if conn is not None:
+        conn.close()
+    log.info("worker %s stopped", cfg.worker_id)
+
+
+def request_stop(signum, _frame) -> None:
+    log.info("signal %s received, finishing current batch", signum)
+    _stop.set()
+    _wake.set()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    env = WorkerConfig.from_env()
+    p = argparse.ArgumentParser(prog="python -m dental_agents.worker")
+    p.add_argument("--worker-id", default=env.worker_id)
+    p.add_argument("--batch-size", type=int, default=env.batch_size)
+    p.add_argument("--lease-seconds", type=int, default=env.lease_seconds)
+    p.add_argument("--poll-min", type=float, default=env.poll_min, help="first idle sleep in seconds")
+    p.add_argument("--poll-max", type=float, default=env.poll_max, help="longest idle sleep in seconds")
+    p.add_argument("--wake-port", type=int, default=env.wake_port, help="UDP port for wake-up pings (0 disables)")
+    p.add_argument(
+        "--metrics-port", type=int, default=env.metrics_port, help="serve /metrics on 127.0.0.1:PORT (0 disables)"
+    )
+    p.add_argument(
+        "--schedule-port",
+        type=int,
+        default=env.schedule_port,
+        help="serve the schedule index API on 127.0.0.1:PORT (0 disables)",
+    )
+    p.add_argument("--once", action="store_true", help="claim and process one batch, then exit")
+    p.add_argument("--engine", choices=("sync", "asyncio"), default=env.engine)
+    p.add_argument("--max-inflight", type=int, default=env.max_inflight, help="asyncio engine: events in flight per process")
+    p.add_argument("--db-threads", type=int, default=env.db_threads, help="asyncio engine: threads for blocking MySQL calls")
+    p.add_argument(
+        "--type-limit",
+        action="append",
+        default=[],
+        metavar="EVENT_TYPE=N",
+        help="asyncio engine: max concurrent events of one type (repeatable)",
+    )
+    p.add_argument(
+        "--lanes",
+        default=env.lanes_spec,
+        help='lane table as JSON, or "off" (see dental_agents/lanes.py)',
+    )
+    p.add_argument(
+        "--ordered",
+        action="store_true",
+        default=env.ordered,
+        help="run events that share a correlation_id strictly in id order",
+    )
+    p.add_argument(
+        "--profile",
+        choices=profiling.MODES,
+        default=env.profile_mode,
+        help="profile handlers and dump events slower than --profile-slow-ms (see dental_agents/profiling.py)",
+    )
+    p.add_argument("--profile-rate", type=float, default=env.profile_rate, help="fraction of events run under the profiler")
+    p.add_argument("--profile-slow-ms", type=float, default=env.profile_slow_ms)
+    p.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="print import timings for a cold start and exit (non-zero if over AGENT_STARTUP_BUDGET_MS)",
+    )
+    p.add_argument(
+        "--processes",
+        type=int,
+        default=env_int("AGENT_PROCESSES", 1),
+        help="run N worker processes under a supervisor (each gets its own locked_by and DB connection)",
+    )
+    return p.parse_args(argv)
+
+
+def setup_logging() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(process)d %(name)s: %(message)s")
+
+
+def main(argv=None) -> None:
+    setup_logging()
+    env = WorkerConfig.from_env()
+    args = parse_args(argv)
+    if args.profile_startup:
+        from .startup import profile_startup
+
+        sys.exit(profile_startup(env_float("AGENT_STARTUP_BUDGET_MS", 500.0)))
+    if not schema_ready():
+        sys.exit(1)
+    cfg = replace(
+        env,
+        worker_id=args.worker_id,
+        batch_size=max(1, args.batch_size),
+        lease_seconds=max(1, args.lease_seconds),
+        poll_min=max(0.001, args.poll_min),
+        poll_max=max(0.001, args.poll_max),
+        wake_port=args.wake_port,
+        engine=args.engine,
+        max_inflight=max(1, args.max_inflight),
+        db_threads=max(1, args.db_threads),
+        type_limits={**env.type_limits, **parse_limits(",".join(args.type_limit))},
+        lanes_spec=args.lanes,
+        ordered=args.ordered,
+        metrics_port=max(0, args.metrics_port),
+        schedule_port=max(0, args.schedule_port),
+        profile_mode=args.profile,
+        profile_rate=args.profile_rate,
+        profile_slow_ms=max(0.0, args.profile_slow_ms),
+    )
+    if args.processes > 1 and not args.once:
+        from . import supervisor
+
+        supervisor.run(cfg, args.processes)
+        return
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    run(cfg, once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@
 REM Switch to the directory where this script is located
 cd /d "%~dp0"
 
-echo [1/2] Checking dependencies...
+echo [1/3] Checking dependencies...
 pip install -r requirements.txt
 if %errorlevel% neq 0 (
     echo Failed to install dependencies.
@@ -10,7 +10,15 @@ if %errorlevel% neq 0 (
     exit /b %errorlevel%
 )
 
-echo [2/2] Starting Dental Agents Worker...
+echo [2/3] Applying database migrations...
+python -m dental_agents.migrate up
+if %errorlevel% neq 0 (
+    echo Database migration failed.
+    pause
+    exit /b %errorlevel%
+)
+
+echo [3/3] Starting Dental Agents Worker...
 REM Run the worker module. We are in the parent directory of 'dental_agents' package.
 python -m dental_agents.worker
 
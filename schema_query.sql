@@ -134,6 +134,7 @@ CREATE TABLE IF NOT EXISTS appointments (
   KEY idx_appt_status (status),
   KEY idx_appt_operatory (operatory_id),
   KEY idx_appt_linked_case (linked_case_id),
+  KEY idx_appt_updated (updated_at),
 
   CONSTRAINT fk_appt_patient
     FOREIGN KEY (patient_id) REFERENCES users(id)
@@ -462,7 +463,7 @@ CREATE TABLE IF NOT EXISTS agent_events (
   id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
   event_type VARCHAR(64) NOT NULL,
   payload_json LONGTEXT NULL,
-  status ENUM('NEW','PROCESSING','DONE','FAILED','DEAD') NOT NULL DEFAULT 'NEW',
+  status ENUM('NEW','PROCESSING','DONE','FAILED','DEAD','PENDING') NOT NULL DEFAULT 'NEW',
   priority INT NOT NULL DEFAULT 50,
   attempts INT NOT NULL DEFAULT 0,
   max_attempts INT NOT NULL DEFAULT 5,
@@ -472,14 +473,22 @@ CREATE TABLE IF NOT EXISTS agent_events (
   correlation_id VARCHAR(64) NULL,
   created_by_user_id BIGINT UNSIGNED NULL,
   last_error TEXT NULL,
+  expires_at DATETIME NULL,
+  next_retry_at DATETIME NULL,
   created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
 
   PRIMARY KEY (id),
   KEY idx_status_available (status, available_at, priority, id),
+  KEY idx_claim (status, priority, available_at),
+  KEY idx_status_type (status, event_type),
+  KEY idx_status_retry (status, next_retry_at),
+  KEY idx_status_updated (status, updated_at),
   KEY idx_locked_by (locked_by),
+  KEY idx_locked_until (locked_until),
   KEY idx_correlation (correlation_id),
-  KEY idx_event_type (event_type)
+  KEY idx_event_type (event_type),
+  KEY idx_created_at (created_at)
 ) ENGINE=InnoDB;
 
 CREATE TABLE IF NOT EXISTS notifications (
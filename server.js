@@ -252,82 +252,129 @@ async function safeQuery(label, sql, params = []) {
 }
 
 // ===================================
-// ✅ ADDITIVE SCHEMA FIXES (won’t remove/change existing data)
+// ✅ SCHEMA VERSION CHECK
 // ===================================
-async function ensureUsersResetSchema() {
-  // Your forgot/reset uses users.reset_code + users.reset_expires
-  const alterSafe = async (sql) => {
-    try {
-      await pool.query(sql);
-    } catch (_) {}
-  };
-  await alterSafe(`ALTER TABLE users ADD COLUMN reset_code VARCHAR(12) NULL`);
-  await alterSafe(`ALTER TABLE users ADD COLUMN reset_expires DATETIME NULL`);
+// Schema changes are versioned migrations in dental_agents/migrations, applied
+// with `python -m dental_agents.migrate up` (run_agents.bat does it before
+// starting the worker). Boot only compares schema_migrations with the newest
+// migration file instead of re-running ALTERs.
+const MIGRATIONS_DIR = path.join(__dirname, "dental_agents", "migrations");
+
+function expectedSchemaVersion() {
+  try {
+    return fs
+      .readdirSync(MIGRATIONS_DIR)
+      .map((f) => /^(\d{4})_\w+\.(sql|py)$/.exec(f))
+      .filter(Boolean)
+      .reduce((max, m) => Math.max(max, Number(m[1])), 0);
+  } catch (_) {
+    return 0;
+  }
 }
-ensureUsersResetSchema().catch((e) => console.error("ensureUsersResetSchema failed:", e?.message || e));
 
-async function ensureAgentEventsSchema() {
+async function checkSchemaVersion() {
+  const expected = expectedSchemaVersion();
+  let current = 0;
   try {
-    await pool.query(`
-      CREATE TABLE IF NOT EXISTS agent_events (
-        id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
-        event_type VARCHAR(64) NOT NULL,
-        payload_json LONGTEXT NULL,
-        status ENUM('NEW','PENDING','PROCESSING','DONE','FAILED') NOT NULL DEFAULT 'NEW',
-        available_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        locked_by VARCHAR(64) NULL,
-        locked_until DATETIME NULL,
-        attempts INT NOT NULL DEFAULT 0,
-        max_attempts INT NOT NULL DEFAULT 7,
-        priority INT NOT NULL DEFAULT 100,
-        last_error TEXT NULL,
-        expires_at DATETIME NULL,
-        next_retry_at DATETIME NULL,
-        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-        PRIMARY KEY (id),
-        KEY idx_status_available (status, available_at),
-        KEY idx_status_retry (status, next_retry_at),
-        KEY idx_event_type (event_type),
-        KEY idx_locked_until (locked_until),
-        KEY idx_created_at (created_at)
-      ) ENGINE=InnoDB;
-    `);
-
-    // Backward-compatible ALTERs (ignore if already exists)
-    const alterSafe = async (sql) => {
-      try {
-        await pool.query(sql);
-      } catch (_) {}
-    };
-
-    await alterSafe(`ALTER TABLE agent_events MODIFY COLUMN status ENUM('NEW','PENDING','PROCESSING','DONE','FAILED') NOT NULL DEFAULT 'NEW'`);
-    await alterSafe(`ALTER TABLE agent_events ADD COLUMN available_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP AFTER status`);
-    await alterSafe(`ALTER TABLE agent_events ADD COLUMN locked_by VARCHAR(64) NULL AFTER available_at`);
-    await alterSafe(`ALTER TABLE agent_events ADD COLUMN locked_until DATETIME NULL AFTER locked_by`);
-    await alterSafe(`ALTER TABLE agent_events ADD COLUMN attempts INT NOT NULL DEFAULT 0 AFTER locked_until`);
-    await alterSafe(`ALTER TABLE agent_events ADD COLUMN max_attempts INT NOT NULL DEFAULT 7 AFTER attempts`);
-    await alterSafe(`ALTER TABLE agent_events ADD COLUMN priority INT NOT NULL DEFAULT 100 AFTER max_attempts`);
-    await alterSafe(`ALTER TABLE agent_events ADD COLUMN last_error TEXT NULL AFTER priority`);
-    await alterSafe(`ALTER TABLE agent_events ADD COLUMN expires_at DATETIME NULL AFTER last_error`);
-    await alterSafe(`ALTER TABLE agent_events ADD COLUMN next_retry_at DATETIME NULL AFTER expires_at`);
-    await alterSafe(`ALTER TABLE agent_events ADD COLUMN updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP`);
-
-    await alterSafe(`ALTER TABLE agent_events ADD KEY idx_status_available (status, available_at)`);
-    await alterSafe(`ALTER TABLE agent_events ADD KEY idx_status_retry (status, next_retry_at)`);
-    await alterSafe(`ALTER TABLE agent_events ADD KEY idx_event_type (event_type)`);
-    await alterSafe(`ALTER TABLE agent_events ADD KEY idx_locked_until (locked_until)`);
-
-    console.log("✅ agent_events schema ready (Python worker queue)");
+    const [rows] = await pool.query(`SELECT COALESCE(MAX(version), 0) AS v FROM schema_migrations`);
+    current = Number(rows?.[0]?.v || 0);
   } catch (e) {
-    console.error("ensureAgentEventsSchema failed:", e?.message || e);
+    if (e?.code !== "ER_NO_SUCH_TABLE") {
+      console.error("checkSchemaVersion failed:", e?.message || e);
+      return;
+    }
+  }
+  if (current < expected) {
+    console.error(
+      `❌ Database schema is at version ${current}, server expects ${expected}. Run: python -m dental_agents.migrate up`
+    );
+  } else {
+    console.log(`✅ Database schema at version ${current}`);
   }
 }
-ensureAgentEventsSchema();
+checkSchemaVersion();
 
 // ===================================
 // ✅ COMPAT HELPERS (works even if ./agents is missing)
 // ===================================
+
+// ✅ Wake-up ping for the Python worker (dental_agents/wakeup.py).
+// Fire-and-forget UDP datagram so a new event is claimed immediately instead of
+// after the worker's idle backoff. Set AGENT_WAKE_PORT=0 to disable.
+const AGENT_WAKE_PORT = Number(process.env.AGENT_WAKE_PORT ?? 47800);
+let agentWakeSocket = null;
+function wakeAgents() {
+  if (!AGENT_WAKE_PORT) return;
+  try {
+    if (!agentWakeSocket) {
+      agentWakeSocket = require("dgram").createSocket("udp4");
+      agentWakeSocket.on("error", () => {});
+      agentWakeSocket.unref();
+    }
+    agentWakeSocket.send("w", AGENT_WAKE_PORT, "127.0.0.1", () => {});
+  } catch (_) {}
+}
+
+// ✅ Schedule index in the Python worker (dental_agents/schedule_api.py).
+// Slot and conflict lookups answered from memory; resolves null when the
+// worker is down, the date is outside its window or it is still warming,
+// and callers then run their SQL. Set AGENT_SCHEDULE_PORT=0 to disable.
+const AGENT_SCHEDULE_PORT = Number(process.env.AGENT_SCHEDULE_PORT ?? 9470);
+function askScheduleAgent(path, body) {
+  if (!AGENT_SCHEDULE_PORT) return Promise.resolve(null);
+  return new Promise((resolve) => {
+    try {
+      const data = JSON.stringify(body || {});
+      const req = require("http").request(
+        {
+          host: "127.0.0.1",
+          port: AGENT_SCHEDULE_PORT,
+          path,
+          method: "POST",
+          timeout: 300,
+          headers: { "Content-Type": "application/json", "Content-Length": Buffer.byteLength(data) },
+        },
+        (res) => {
+          let buf = "";
+          res.setEncoding("utf8");
+          res.on("data", (chunk) => (buf += chunk));
+          res.on("end", () => {
+            if (res.statusCode !== 200) return resolve(null);
+            try {
+              resolve(JSON.parse(buf));
+            } catch (_) {
+              resolve(null);
+            }
+          });
+        }
+      );
+      req.on("timeout", () => req.destroy());
+      req.on("error", () => resolve(null));
+      req.end(data);
+    } catch (_) {
+      resolve(null);
+    }
+  });
+}
+
+// Predicted minutes for a booking (dental_agents/durations.py: per-doctor p80
+// of recent completions); 30 when the worker cannot answer.
+async function predictDurationFromAgent({ doctorId, type }) {
+  const p = await askScheduleAgent("/schedule/duration", { doctorId, type: type || "General" });
+  const minutes = Number(p?.durationMin);
+  return Number.isFinite(minutes) && minutes > 0 ? minutes : 30;
+}
+
+// Entity key for ordered processing in the Python worker (--ordered):
+// events about the same case (or else the same appointment) run in order.
+function correlationIdFor(payload) {
+  const p = payload || {};
+  const caseId = p.caseDbId ?? p.caseId ?? p.linkedCaseId;
+  if (caseId != null && caseId !== "") return `case:${caseId}`;
+  if (p.appointmentId != null && p.appointmentId !== "") return `appt:${p.appointmentId}`;
+  return null;
+}
+
 async function enqueueEventDb(eventType, payload, createdByUserId = null) {
   const safePayload = {
     ...(payload || {}),
@@ -339,10 +386,10 @@ async function enqueueEventDb(eventType, payload, createdByUserId = null) {
 
   await pool.query(
     `
-    INSERT INTO agent_events (event_type, payload_json, status, available_at)
-    VALUES (?, ?, 'PENDING', NOW())
+    INSERT INTO agent_events (event_type, payload_json, status, available_at, correlation_id)
+    VALUES (?, ?, 'PENDING', NOW(), ?)
     `,
-    [String(eventType), JSON.stringify(safePayload)]
+    [String(eventType), JSON.stringify(safePayload), correlationIdFor(payload)]
   );
 }
 
@@ -365,6 +412,7 @@ async function enqueueEventCompat({ eventType, payload, createdByUserId }) {
   // ✅ Current architecture: DB outbox for Python worker
   try {
     await enqueueEventDb(eventType, payload, createdByUserId || null);
+    wakeAgents();
   } catch (e) {
     console.error("enqueueEventCompat -> enqueueEventDb failed:", e?.message || e);
   }
@@ -400,170 +448,22 @@ async function retryFailedCompat(limit = 100) {
            available_at=NOW(),
            locked_by=NULL,
            locked_until=NULL,
+           next_retry_at=NULL,
            last_error=NULL
        WHERE status='FAILED'
        ORDER BY id ASC
        LIMIT ?`,
       [Number(limit) || 100]
     );
-    return r?.affectedRows || 0;
+    const n = r?.affectedRows || 0;
+    if (n) wakeAgents();
+    return n;
   } catch (e) {
     console.error("retryFailedCompat fallback failed:", e?.message || e);
     return 0;
   }
 }
 
-// ===================================
-// ✅ NOTIFICATIONS SCHEMA (safe, additive)
-// ===================================
-async function ensureNotificationsSchema() {
-  try {
-    await pool.query(`
-      CREATE TABLE IF NOT EXISTS notifications (
-        id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
-        user_id BIGINT NULL,
-        user_role VARCHAR(16) NULL,
-        channel ENUM('IN_APP','EMAIL','SMS','WHATSAPP','CALL') NOT NULL DEFAULT 'IN_APP',
-        type VARCHAR(64) NULL,
-        title VARCHAR(200) NULL,
-        message TEXT NOT NULL,
-        status ENUM('NEW','PENDING','SENT','FAILED','READ') NOT NULL DEFAULT 'NEW',
-        scheduled_at DATETIME NULL,
-        read_at DATETIME NULL,
-        priority INT NOT NULL DEFAULT 100,
-        related_entity_type VARCHAR(40) NULL,
-        related_entity_id BIGINT NULL,
-        template_key VARCHAR(64) NULL,
-        template_vars_json LONGTEXT NULL,
-        meta_json LONGTEXT NULL,
-        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        sent_at DATETIME NULL,
-        updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-        PRIMARY KEY (id),
-        KEY idx_user (user_id),
-        KEY idx_role (user_role),
-        KEY idx_status (status),
-        KEY idx_created_at (created_at),
-        KEY idx_scheduled_at (scheduled_at)
-      ) ENGINE=InnoDB;
-    `);
-
-    const alterSafe = async (sql) => {
-      try {
-        await pool.query(sql);
-      } catch (_) {}
-    };
-
-    await alterSafe(`ALTER TABLE notifications MODIFY COLUMN status ENUM('NEW','PENDING','SENT','FAILED','READ') NOT NULL DEFAULT 'NEW'`);
-    await alterSafe(`ALTER TABLE notifications ADD COLUMN user_role VARCHAR(16) NULL AFTER user_id`);
-    await alterSafe(`ALTER TABLE notifications ADD COLUMN type VARCHAR(64) NULL AFTER channel`);
-    await alterSafe(`ALTER TABLE notifications ADD COLUMN title VARCHAR(200) NULL AFTER type`);
-    await alterSafe(`ALTER TABLE notifications ADD COLUMN scheduled_at DATETIME NULL AFTER status`);
-    await alterSafe(`ALTER TABLE notifications ADD COLUMN read_at DATETIME NULL AFTER scheduled_at`);
-    await alterSafe(`ALTER TABLE notifications ADD COLUMN priority INT NOT NULL DEFAULT 100 AFTER read_at`);
-    await alterSafe(`ALTER TABLE notifications ADD COLUMN related_entity_type VARCHAR(40) NULL AFTER priority`);
-    await alterSafe(`ALTER TABLE notifications ADD COLUMN related_entity_id BIGINT NULL AFTER related_entity_type`);
-    await alterSafe(`ALTER TABLE notifications ADD COLUMN template_key VARCHAR(64) NULL AFTER related_entity_id`);
-    await alterSafe(`ALTER TABLE notifications ADD COLUMN template_vars_json LONGTEXT NULL AFTER template_key`);
-    await alterSafe(`ALTER TABLE notifications ADD COLUMN meta_json LONGTEXT NULL AFTER template_vars_json`);
-    await alterSafe(`ALTER TABLE notifications ADD COLUMN updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP`);
-
-    await alterSafe(`ALTER TABLE notifications ADD KEY idx_role (user_role)`);
-    await alterSafe(`ALTER TABLE notifications ADD KEY idx_scheduled_at (scheduled_at)`);
-
-    console.log("✅ Notifications schema ready");
-  } catch (e) {
-    console.error("ensureNotificationsSchema failed:", e?.message || e);
-  }
-}
-ensureNotificationsSchema();
-
-// ===================================
-// ✅ CASE ATTACHMENTS SCHEMA (safe, additive)
-// ===================================
-async function ensureCaseAttachmentsSchema() {
-  try {
-    await pool.query(`
-      CREATE TABLE IF NOT EXISTS case_attachments (
-        id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
-        case_id BIGINT NOT NULL,
-        file_name VARCHAR(255) NOT NULL,
-        file_path TEXT NOT NULL,
-        mime_type VARCHAR(120) NULL,
-        uploaded_by_user_id BIGINT NULL,
-        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        PRIMARY KEY (id),
-        KEY idx_case (case_id),
-        KEY idx_created_at (created_at)
-      ) ENGINE=InnoDB;
-    `);
-  } catch (e) {
-    console.error("ensureCaseAttachmentsSchema failed:", e?.message || e);
-  }
-}
-ensureCaseAttachmentsSchema();
-
-// ===================================
-// ✅ CLINIC SETUP + ROLES/PERMISSIONS (safe, additive)
-// ===================================
-async function ensureClinicSetupSchema() {
-  try {
-    await pool.query(`
-      CREATE TABLE IF NOT EXISTS clinic_settings (
-        id TINYINT NOT NULL,
-        clinic_name VARCHAR(120) NULL,
-        clinic_phone VARCHAR(40) NULL,
-        clinic_email VARCHAR(190) NULL,
-        clinic_address TEXT NULL,
-        timezone VARCHAR(64) NOT NULL DEFAULT 'Asia/Kolkata',
-        working_hours_json LONGTEXT NULL,
-        treatment_catalog_json LONGTEXT NULL,
-        note_templates_json LONGTEXT NULL,
-        ai_preferences_json LONGTEXT NULL,
-        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-        PRIMARY KEY (id)
-      ) ENGINE=InnoDB;
-    `);
-
-    await pool.query(`INSERT IGNORE INTO clinic_settings (id, timezone) VALUES (1, 'Asia/Kolkata')`);
-
-    await pool.query(`
-      CREATE TABLE IF NOT EXISTS role_permissions (
-        role ENUM('Admin','Doctor','Assistant','Patient') NOT NULL,
-        permissions_json LONGTEXT NULL,
-        updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-        PRIMARY KEY (role)
-      ) ENGINE=InnoDB;
-    `);
-
-    // Seed defaults (idempotent)
-    await pool.query(
-      `INSERT IGNORE INTO role_permissions (role, permissions_json) VALUES
-        ('Admin', '{"admin_all":true}'),
-        ('Doctor', '{"doctor_portal":true,"cases":true,"appointments":true}'),
-        ('Assistant', '{"assistant_portal":true,"inventory":true,"appointments":true}'),
-        ('Patient', '{"patient_portal":true,"appointments":true,"billing":true}')`
-    );
-
-    await pool.query(`
-      CREATE TABLE IF NOT EXISTS patient_profiles (
-        user_id BIGINT UNSIGNED NOT NULL,
-        medical_history TEXT NULL,
-        allergies TEXT NULL,
-        notes TEXT NULL,
-        updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-        PRIMARY KEY (user_id)
-      ) ENGINE=InnoDB;
-    `);
-
-    console.log('✅ clinic_settings + role_permissions + patient_profiles ready');
-  } catch (e) {
-    console.error('ensureClinicSetupSchema failed:', e?.message || e);
-  }
-}
-ensureClinicSetupSchema();
-
 // ===================================
 // ✅ Schema capability detection (to keep conflict logic robust across DB versions)
 // ===================================
@@ -1660,6 +1560,20 @@ async function fallbackSuggestSlots({ doctorId, operatoryId, dateStr, durationMi
   const endM = toMin(clinicEnd);
   const dur = Math.max(5, Number(durationMin) || 30);
 
+  const indexed = await askScheduleAgent("/schedule/suggest", {
+    doctorId,
+    operatoryId: operatoryId || null,
+    date: dateStr,
+    durationMin: dur,
+    stepMin,
+    open: clinicStart,
+    close: clinicEnd,
+    limit: 10,
+  });
+  if (indexed && Array.isArray(indexed.slots)) {
+    return indexed.slots.map((t) => ({ time: t.slice(0, 5), timeStr: t }));
+  }
+
   // Pull existing appointments for doctor (and operatory if provided)
   let rows = [];
   try {
@@ -1758,7 +1672,7 @@ app.post(
 
       // ✅ If Node agent not present / returned empty => fallback suggestions (server-side deterministic)
       if (!Array.isArray(slots) || slots.length === 0) {
-        const durationMin = 30;
+        const durationMin = await predictDurationFromAgent({ doctorId: drows[0].id, type });
         const fb = await fallbackSuggestSlots({
           doctorId: drows[0].id,
           operatoryId: operatoryId || null,
@@ -1776,6 +1690,69 @@ app.post(
   }
 );
 
+// ✅ NEW: batch slot search across doctors, operatories and days (Python schedule index)
+app.post(
+  `${ADMIN_BASE}/appointments/search-slots`,
+  authMiddleware,
+  requireRole("Admin"),
+  async (req, res) => {
+    try {
+      const { doctorUids, operatoryIds, type, from, to, days, limit, durationMin } = req.body || {};
+      if (!from) {
+        return res.status(400).json({ message: "from (YYYY-MM-DD) required" });
+      }
+
+      let doctorIds = null;
+      if (Array.isArray(doctorUids) && doctorUids.length) {
+        const [drows] = await pool.query(`SELECT id FROM users WHERE role = 'Doctor' AND uid IN (?)`, [doctorUids]);
+        if (drows.length === 0) {
+          return res.status(400).json({ message: "No doctors found for doctorUids" });
+        }
+        doctorIds = drows.map((r) => r.id);
+      }
+
+      const found = await askScheduleAgent("/schedule/search", {
+        from: toDateStr(from),
+        to: to ? toDateStr(to) : null,
+        days: days || null,
+        type: type || "General",
+        durationMin: durationMin || null,
+        doctorIds,
+        operatoryIds: Array.isArray(operatoryIds) && operatoryIds.length ? operatoryIds : null,
+        limit: Math.min(Number(limit) || 10, 200),
+        stepMin: 15,
+        open: process.env.CLINIC_START || "09:00:00",
+        close: process.env.CLINIC_END || "18:00:00",
+      });
+      if (!found || !Array.isArray(found.options)) {
+        return res.status(503).json({ message: "Schedule index unavailable (is the Python worker running?)", options: [] });
+      }
+
+      // one lookup for the doctors that came back
+      const ids = [...new Set(found.options.map((o) => o.doctorId))];
+      const byId = new Map();
+      if (ids.length) {
+        const [rows] = await pool.query(`SELECT id, uid, full_name FROM users WHERE id IN (?)`, [ids]);
+        for (const r of rows) byId.set(Number(r.id), r);
+      }
+
+      return res.json({
+        options: found.options.map((o) => ({
+          date: o.date,
+          time: String(o.time).slice(0, 5),
+          doctorUid: byId.get(Number(o.doctorId))?.uid || null,
+          doctorName: byId.get(Number(o.doctorId))?.full_name || null,
+          operatoryId: o.operatoryId,
+          durationMin: o.durationMin,
+        })),
+      });
+    } catch (err) {
+      console.error("SEARCH SLOTS ERROR:", err);
+      return res.status(500).json({ message: "Server error", options: [] });
+    }
+  }
+);
+
 // APPOINTMENTS LIST (UNCHANGED)
 app.get(
   `${ADMIN_BASE}/appointments`,
@@ -1861,7 +1838,7 @@ app.post(
       const timeStr = toTimeStr(time); // HH:MM:SS
 
       // ✅ Predict duration + suggestSlots + hasConflict (guard require)
-      let predictDurationMinutes = async () => 30;
+      let predictDurationMinutes = async (_pool, args) => predictDurationFromAgent(args || {});
       let suggestSlots = async () => [];
       let hasConflictFn = null;
 
@@ -1885,6 +1862,18 @@ app.post(
       // ✅ Conflict check (uses Node agent if available; fallback is DB-safe)
       let conflict = false;
 
+      // In-memory schedule index next. It lags new bookings by a sync
+      // interval, so it may only reject; "free" is always confirmed in SQL.
+      const indexedConflict = hasConflictFn
+        ? null
+        : await askScheduleAgent("/schedule/conflict", {
+            doctorId,
+            operatoryId: operatoryId || null,
+            date: dateStr,
+            time: timeStr,
+            durationMin,
+          });
+
       if (hasConflictFn) {
         conflict = await hasConflictFn(pool, {
           doctorId,
@@ -1893,6 +1882,8 @@ app.post(
           startTime: timeStr,
           durationMin,
         });
+      } else if (indexedConflict?.conflict === true) {
+        conflict = true;
       } else {
         try {
           // Compute end time